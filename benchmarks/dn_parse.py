@@ -0,0 +1,74 @@
+"""
+'对象' 字段解析基准：逐行 split_field、多次 str.extract 与 supermo.dn.parse_dn 对比。
+
+用法:
+python benchmarks/dn_parse.py [行数]
+
+默认生成一百万行 DT_RRU功耗 报表的 '对象' 列（约两万个 BBU、每个 BBU 若干 RRU、按天重复）。
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supermo.dn import parse_dn  # noqa: E402
+
+
+def make_rru_objects(rows, bbus=20000, rrus_per_bbu=6, seed=0):
+    """生成 RRU 报表的 '对象' 列。"""
+    rng = np.random.default_rng(seed)
+    gnb = rng.integers(0, bbus, rows) + 100000
+    rru = rng.integers(1, rrus_per_bbu + 1, rows)
+    kind = np.array(['D5H', 'D5M', 'D5S'])[gnb % 3]
+    band = np.where(gnb % 4 == 0, '700M', '26G')
+    names = pd.Series(kind).radd('BBU-') + '-' + band + '-' + pd.Series(gnb).astype(str)
+    return names + '(gNB=' + pd.Series(gnb).astype(str) + ',invRRU=' + pd.Series(rru).astype(str) + ')'
+
+
+def split_field(field, is_rru):
+    """PowerLossV1 原来的逐行解析。"""
+    if is_rru:
+        match = re.match(r'(.+)\(gNB=(\d+),invRRU=(\d+)\)', field)
+        return (match.group(2), match.group(3)) if match else (None, None)
+    else:
+        match = re.match(r'(.+)\(gNB=(\d+)\)', field)
+        return (match.group(1), match.group(2)) if match else (None, None)
+
+
+def rowwise(objects):
+    df = pd.DataFrame({'对象': objects})
+    df[['BBUID', 'RRUID']] = df['对象'].apply(lambda x: pd.Series(split_field(x, True)))
+    return df[['BBUID', 'RRUID']]
+
+
+def extract(objects):
+    """Data_org_v1 原来的逐字段 str.extract。"""
+    return pd.DataFrame({'NB': objects.str.extract(r'gNB=(\d+)')[0].astype(str),
+                         'RRUID': objects.str.extract(r'invRRU=(\d+)')[0].astype(str)})
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<28}{time.perf_counter() - start:>10.2f} s")
+    return result
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    objects = make_rru_objects(rows)
+    print(f"{rows} rows, {objects.nunique()} distinct objects")
+
+    expected = timed('row-wise split_field', rowwise, objects)
+    timed('str.extract per field', extract, objects)
+    parsed = timed('parse_dn (strings)', parse_dn, objects, ['gNB', 'invRRU'], False)
+    timed('parse_dn (Int32)', parse_dn, objects, ['gNB', 'invRRU'])
+
+    assert (parsed['gNB'].to_numpy() == expected['BBUID'].to_numpy()).all()
+    assert (parsed['invRRU'].to_numpy() == expected['RRUID'].to_numpy()).all()
+    print("results match")
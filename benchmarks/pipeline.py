@@ -0,0 +1,376 @@
+"""
+看板与数据整理流水线基准：在合成数据上逐阶段计时，结果保存为 JSON，便于对比不同版本。
+
+用法:
+python benchmarks/pipeline.py [--cells N] [--days N] [--counters N] [--repeat N] [--data 目录]
+                              [--only ingest,onePixel,TwoPixel,ThreePixel,pages] [--label 名称]
+python benchmarks/pipeline.py --compare 基准.json 新结果.json [--threshold 0.1]
+
+未指定 --data 时在临时目录中生成数据（见 benchmarks/synthetic.py）；指定的目录不存在时生成后保留，
+下次直接复用。各阶段：
+
+- ingest: Data_org_v1 的报表读取与清洗、功耗计算、小区键映射、分区写出和汇总立方体；
+- onePixel / TwoPixel / ThreePixel: 按页面的步骤（读取、层级索引、筛选、合并、聚合、图表）
+  在不筛选和筛选一个地市两种情况下分别计时，查询后端（汇总立方体、DuckDB）单独计时；
+- pages: 用 streamlit.testing 无界面运行各页面，分别记录冷启动（清空缓存）和再次运行的耗时。
+
+每个阶段重复 --repeat 次，记录每次耗时、最短和中位数。结果写入 benchmarks/results/<label>.json，
+--compare 按最短耗时比较两份结果，变慢超过阈值的阶段标记为回归，存在回归时退出码为 1。
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import threading
+import warnings
+from contextlib import contextmanager
+from datetime import datetime
+from importlib import metadata
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from supermo import sql  # noqa: E402
+from supermo.cells import build_cell_dimension, cell_keys, take_cells, to_fact  # noqa: E402
+from supermo.chartcache import ChartSpecCache  # noqa: E402
+from supermo.cleaning import process_bbu_power, process_df_kpi, process_rru_power  # noqa: E402
+from supermo.datasets import DatasetService  # noqa: E402
+from supermo.downsample import downsample  # noqa: E402
+from supermo.hierarchy import HierarchyIndex  # noqa: E402
+from supermo.ingest import read_and_process_files  # noqa: E402
+from supermo.kpi import aggregate_kpis, counters_for, evaluate_kpis  # noqa: E402
+from supermo.power import calculate_antenna_and_power  # noqa: E402
+from supermo.powerdist import PowerDistribution  # noqa: E402
+from supermo.rollup import ALL, GRANULARITIES, LEVELS, build_rollup_cube, has_rollup_cube, query_rollup_cube  # noqa: E402
+from supermo.store import DATA_DIR_ENV, load_table, partition_date_bounds, save_partitioned, save_table  # noqa: E402
+from supermo.zerotraffic import ZeroTrafficBitmap  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PIPELINES = ['ingest', 'onePixel', 'TwoPixel', 'ThreePixel', 'pages']
+PACKAGES = ['numpy', 'pandas', 'pyarrow', 'duckdb', 'altair', 'streamlit', 'matplotlib']
+
+ONE_PIXEL_KPIS = ['数据业务流量', 'VoNR语音话务量', '无线接通率', '无线掉线率', '系统内切换成功率',
+                  'VoNR无线接通率', 'VoNR语音掉线率', 'VoNR系统内切换成功率']
+TWO_PIXEL_KPIS = ['数据业务流量', 'VoNR语音话务量']
+SESSIONS = 8  # 同时打开同一视图的会话数
+
+
+class Timer:
+    """按阶段名累计每次运行的耗时（秒）。"""
+
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.times.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        return {name: {'best': min(runs), 'median': statistics.median(runs), 'runs': runs}
+                for name, runs in self.times.items()}
+
+
+def selections(rac, levels):
+    """不筛选和筛选小区最多的地市两种情况。"""
+    city = rac['地市'].value_counts().index[0]
+    everything = {level: ALL for level in levels}
+    return {'all': everything, 'city': dict(everything, 地市=city)}
+
+
+def concurrent_sessions(cache, key, build, sessions=SESSIONS):
+    """模拟 sessions 个会话同时请求同一组图表规格。"""
+    threads = [threading.Thread(target=cache.get_or_build, args=(key, build)) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def line_chart_spec(data, field):
+    """与页面相同方式降采样后构建折线图并序列化。"""
+    import altair as alt
+    data = downsample(data[['开始时间', field]], '开始时间', field)
+    line = alt.Chart(data).mark_line().encode(x='开始时间:T', y=f'{field}:Q', tooltip=['开始时间:T', f'{field}:Q'])
+    points = alt.Chart(data.loc[[data[field].idxmax(), data[field].idxmin()]]).mark_point().encode(x='开始时间:T', y=f'{field}:Q')
+    return (line + points).to_dict()
+
+
+def run_ingest(timer, exports, directory):
+    """Data_org_v1 的读取、清洗、计算和写出步骤，写入临时目录。"""
+    with tempfile.TemporaryDirectory() as out:
+        with timer.stage('ingest/read_kpi'):
+            kpi = read_and_process_files(exports, 'DT_PowerBI指标通报计数器', process=process_df_kpi)
+        with timer.stage('ingest/read_bbu_power'):
+            bbu = read_and_process_files(exports, 'DT_BBU功耗', process=process_bbu_power)
+        with timer.stage('ingest/read_rru_power'):
+            rru = read_and_process_files(exports, 'DT_RRU功耗', process=process_rru_power)
+        with timer.stage('ingest/power'):
+            brp = calculate_antenna_and_power(bbu, rru, kpi)
+        with timer.stage('ingest/cell_keys'):
+            rac = load_table(directory, 'gdf_RAC').drop(columns='cell_key')
+            dim = build_cell_dimension(rac['ID'], kpi['ID'])
+            rac['cell_key'] = cell_keys(dim, rac['ID'])
+            fact = to_fact(kpi, dim)
+        with timer.stage('ingest/save'):
+            save_table(dim, out, 'dim_cell')
+            save_partitioned(fact, out, 'df_KPI')
+            save_table(brp, out, 'df_BRP')
+        with timer.stage('ingest/rollup_cube'):
+            build_rollup_cube(fact, rac)
+
+
+def run_one_pixel(timer, directory):
+    """onePixel 的读取、筛选、合并、聚合和图表步骤。"""
+    counters = counters_for(ONE_PIXEL_KPIS)
+    datasets = DatasetService(directory)
+    with timer.stage('onePixel/load'):
+        rac = datasets.frame('gdf_RAC', ['cell_key'] + LEVELS)
+        kpi = datasets.frame('df_KPI', ['cell_key', '开始时间'] + counters)
+    with timer.stage('onePixel/hierarchy'):
+        hierarchy = HierarchyIndex(rac, LEVELS, id_column='cell_key')
+    date_range = partition_date_bounds(directory, 'df_KPI')
+
+    for case, selection in selections(rac, LEVELS).items():
+        with timer.stage(f'onePixel/filter[{case}]'):
+            keys = rac['cell_key'].to_numpy()[hierarchy.rows(selection)]
+            dates = kpi['开始时间']
+            kpi_range = kpi[(dates >= pd.Timestamp(date_range[0])) & (dates <= pd.Timestamp(date_range[1]))]
+        with timer.stage(f'onePixel/merge[{case}]'):
+            merged = take_cells(kpi_range, keys)
+        with timer.stage(f'onePixel/aggregate[{case}]'):
+            agg = aggregate_kpis(merged, '开始时间', ONE_PIXEL_KPIS)
+        if has_rollup_cube(directory):
+            with timer.stage(f'onePixel/rollup_cube[{case}]'):
+                evaluate_kpis(query_rollup_cube(directory, selection, date_range, counters=counters), ONE_PIXEL_KPIS)
+            for granularity in GRANULARITIES[1:]:
+                with timer.stage(f'onePixel/rollup_cube/{granularity}[{case}]'):
+                    evaluate_kpis(query_rollup_cube(directory, selection, date_range, counters=counters,
+                                                    granularity=granularity), ONE_PIXEL_KPIS)
+        if sql.available():
+            with timer.stage(f'onePixel/duckdb[{case}]'):
+                evaluate_kpis(sql.query_counter_sums(directory, selection, date_range, counters=counters), ONE_PIXEL_KPIS)
+        with timer.stage(f'onePixel/charts[{case}]'):
+            for name in ONE_PIXEL_KPIS:
+                line_chart_spec(agg, name)
+        with timer.stage(f'onePixel/shared_charts[{case}]'):
+            concurrent_sessions(ChartSpecCache(max_workers=4), case, lambda: [line_chart_spec(agg, name) for name in ONE_PIXEL_KPIS])
+
+
+def run_two_pixel(timer, directory):
+    """TwoPixel 的合并、逐行计算、分组和零流量小区统计步骤（逐行统计与零流量位图两种做法）。"""
+    levels = ['工作频段', '地市', '县区']
+    counters = counters_for(TWO_PIXEL_KPIS)
+    datasets = DatasetService(directory)
+    with timer.stage('TwoPixel/load'):
+        rac = datasets.frame('gdf_RAC', ['cell_key', '工作频段', '地市', '县区', '基站名称'])
+        kpi = datasets.frame('df_KPI', ['cell_key', '开始时间'] + counters)
+    with timer.stage('TwoPixel/hierarchy'):
+        hierarchy = HierarchyIndex(rac, levels, id_column='cell_key')
+    with timer.stage('TwoPixel/zero_bitmap/build'):
+        bitmap = ZeroTrafficBitmap.from_kpi(kpi)
+
+    for case, selection in selections(rac, levels).items():
+        how = 'inner' if hierarchy.is_filtered(selection) else 'left'
+        keys = rac['cell_key'].to_numpy()[hierarchy.rows(selection)] if how == 'inner' else None
+        with timer.stage(f'TwoPixel/zero_bitmap[{case}]'):
+            bitmap.daily_counts(keys)
+        with timer.stage(f'TwoPixel/zero_runs[{case}]'):
+            bitmap.zero_runs(3, keys)
+        with timer.stage(f'TwoPixel/merge[{case}]'):
+            merged = take_cells(kpi, rac['cell_key'].to_numpy()[hierarchy.rows(selection)], how=how)
+        with timer.stage(f'TwoPixel/aggregate[{case}]'):
+            merged = evaluate_kpis(merged, ['数据业务流量'], decimals=None)
+            grouped = aggregate_kpis(merged, '开始时间', TWO_PIXEL_KPIS, extra={'cell_key': 'nunique'}, decimals=None)
+        with timer.stage(f'TwoPixel/zero_traffic[{case}]'):
+            zero = merged[merged['数据业务流量'] == 0].groupby('开始时间')['cell_key'].nunique().reset_index()
+            pd.merge(zero, grouped[['开始时间', 'cell_key']], on='开始时间', suffixes=('_zero', '_total'))
+        if sql.available():
+            with timer.stage(f'TwoPixel/duckdb[{case}]'):
+                aggregates = {'cell_key': 'COUNT(DISTINCT k.cell_key)',
+                              'cell_key_zero': f'COUNT(DISTINCT CASE WHEN {sql.kpi_expression("数据业务流量")} = 0 THEN k.cell_key END)'}
+                sql.query_counter_sums(directory, selection, counters=counters, aggregates=aggregates, how=how)
+
+
+def run_three_pixel(timer, directory):
+    """ThreePixel 的清洗、统计和箱线图步骤（逐行计算与合并功耗分布草图两种做法）。"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')  # 无中文字体的环境
+
+    datasets = DatasetService(directory)
+    with timer.stage('ThreePixel/load'):
+        df = datasets.frame('df_BRP')
+    with timer.stage('ThreePixel/clean'):
+        df = df[~df['Model'].str.contains('D5S')]
+        df = df[(df['BBU功耗(R1054_001)[W]'] != 0) & (df['RRU总功耗'] != 0)]
+        df = df.assign(设备功耗=df['BBU功耗[千瓦时]'] + (df['RRU总功耗'] / df['天线数量']) * 3)
+    with timer.stage('ThreePixel/stats'):
+        df.groupby('Model')['设备功耗'].agg(['mean', 'max', 'min'])
+    with timer.stage('ThreePixel/boxplot'):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        df.boxplot(column='设备功耗', by='BBU名称', grid=False, ax=ax)
+        fig.savefig(io.BytesIO(), format='png')
+        plt.close(fig)
+
+    with timer.stage('ThreePixel/sketch/build'):
+        distribution = PowerDistribution.from_power(datasets.frame('df_BRP'))
+    models = distribution.models()
+    with timer.stage('ThreePixel/sketch/stats'):
+        distribution.model_stats(models)
+    with timer.stage('ThreePixel/sketch/boxplot'):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.bxp(distribution.box_stats(models))
+        fig.savefig(io.BytesIO(), format='png')
+        plt.close(fig)
+
+
+def run_pages(timer, directory):
+    """无界面运行各页面：先清空缓存运行一次（冷启动），再运行一次（缓存命中）。"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from supermo import datasets
+
+    os.environ[DATA_DIR_ENV] = directory
+    for page in ['onePixel', 'TwoPixel', 'ThreePixel']:
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        datasets._services.clear()  # 丢弃进程内已加载的列，模拟新启动的服务
+        app = AppTest.from_file(os.path.join(ROOT, 'pages', page + '.py'), default_timeout=600)
+        for case in ['cold', 'warm']:
+            with timer.stage(f'pages/{page}[{case}]'):
+                app.run()
+            if app.exception:
+                raise RuntimeError(f'{page}: {app.exception[0].value}')
+
+
+def run(directory, exports, only, repeat):
+    timer = Timer()
+    runners = {
+        'ingest': lambda: run_ingest(timer, exports, directory),
+        'onePixel': lambda: run_one_pixel(timer, directory),
+        'TwoPixel': lambda: run_two_pixel(timer, directory),
+        'ThreePixel': lambda: run_three_pixel(timer, directory),
+        'pages': lambda: run_pages(timer, directory),
+    }
+    for name in only:
+        for _ in range(repeat):
+            runners[name]()
+        print(f'{name} done')
+    return timer.summary()
+
+
+def environment():
+    """解释器、依赖版本和当前提交，写入结果便于对比。"""
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'packages': versions}
+
+
+def save_results(results, label):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{label}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare(base_path, new_path, threshold):
+    """
+    按最短耗时比较两份结果。
+
+    返回值:
+    pd.DataFrame: 各阶段的耗时、比值和是否回归。
+    """
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    if base['scale'] != new['scale']:
+        print(f"warning: different scale {base['scale']} vs {new['scale']}")
+    rows = []
+    for stage in dict.fromkeys(list(base['stages']) + list(new['stages'])):
+        before = base['stages'].get(stage, {}).get('best')
+        after = new['stages'].get(stage, {}).get('best')
+        ratio = after / before if before and after else None
+        rows.append({'stage': stage, 'base_s': before, 'new_s': after, 'ratio': ratio,
+                     'regression': ratio is not None and ratio > 1 + threshold})
+    return pd.DataFrame(rows)
+
+
+def print_summary(stages):
+    width = max(len(name) for name in stages)
+    for name, summary in stages.items():
+        print(f"{name:<{width}}  best {summary['best']:>9.4f} s  median {summary['median']:>9.4f} s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='看板与数据整理流水线基准')
+    parser.add_argument('--cells', type=int, default=6000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--counters', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data', help='合成数据目录，不存在时生成并保留')
+    parser.add_argument('--only', default=','.join(PIPELINES), help='逗号分隔的阶段组')
+    parser.add_argument('--label', help='结果文件名，默认为提交号和规模')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='比较两份结果')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定回归的变慢比例')
+    return parser.parse_args(argv)
+
+
+def main(args):
+    if args.compare:
+        table = compare(*args.compare, args.threshold)
+        print(table.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+        return 1 if table['regression'].any() else 0
+
+    only = [name for name in args.only.split(',') if name]
+    unknown = set(only) - set(PIPELINES)
+    if unknown:
+        raise SystemExit(f'unknown stage group: {", ".join(sorted(unknown))}')
+    scale = {'cells': args.cells, 'days': args.days, 'counters': args.counters, 'seed': args.seed}
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.data or os.path.join(scratch, 'data')
+        exports = os.path.join(directory, 'exports')
+        if not os.path.isdir(directory):
+            tables = synthetic.generate(args.cells, args.days, args.counters, args.seed)
+            synthetic.write_store(tables, directory)
+            synthetic.write_exports(tables, exports)
+            print(f"synthetic data written to {directory}")
+        stages = run(directory, exports, only, args.repeat)
+
+    env = environment()
+    label = args.label or f"{env['commit'] or 'local'}-c{args.cells}-d{args.days}"
+    results = {'label': label, 'created': datetime.now().isoformat(timespec='seconds'), 'scale': scale,
+               'repeat': args.repeat, **env, 'stages': stages}
+    print_summary(stages)
+    print(f'results saved to {save_results(results, label)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parse_args()))
@@ -0,0 +1,93 @@
+"""
+df_BRP 计算基准：原逐行 apply 版本与 supermo.power.calculate_antenna_and_power 对比。
+
+用法:
+python benchmarks/power_pipeline.py [BBU数] [天数] [--skip-old]
+
+默认 2000 个 BBU、365 天的日报：BBU 表约 73 万行，RRU 表和 KPI 表约 220 万行。
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supermo.power import calculate_antenna_and_power  # noqa: E402
+
+
+def make_tables(bbus, days, rrus_per_bbu=3, seed=0):
+    """生成 df_BUP、df_RUP、df_KPI 结构的日报数据。"""
+    rng = np.random.default_rng(seed)
+    dates = [date(2024, 1, 1) + timedelta(days=i) for i in range(days)]
+    nb = np.arange(bbus) + 100000
+    kind = np.array(['D5H', 'D5M', 'D5S'])[nb % 3]
+    band = np.where(nb % 4 == 0, '700M', '26G')
+    names = pd.Series(['BBU-%s-%s-Z%d' % t for t in zip(kind, band, nb % 50)])
+
+    bbu = pd.DataFrame({'BBU名称': np.tile(names, days), 'NB': np.tile(nb.astype(str), days),
+                        '站型': '宏站', '开始时间': np.repeat(dates, bbus)})
+    bbu['BBU功耗[千瓦时]'] = rng.random(len(bbu)).round(4) * 10
+    bbu['gNB基站CPU平均负荷(R1056_001)[%]'] = rng.integers(0, 100, len(bbu))
+    bbu['gNB基站CPU峰值负荷(R1056_002)[%]'] = rng.integers(0, 100, len(bbu))
+    bbu['BBU功耗(R1054_001)[W]'] = rng.random(len(bbu)).round(4) * 500
+
+    rru = bbu[['NB', '开始时间']].loc[bbu.index.repeat(rrus_per_bbu)].reset_index(drop=True)
+    rru['RRUID'] = np.tile(np.arange(1, rrus_per_bbu + 1).astype(str), len(bbu))
+    rru['AAU功耗[千瓦时]'] = rng.random(len(rru)).round(4) * 5
+
+    kpi = rru[['NB', '开始时间']].copy()
+    for counter in ['R1012_001', 'R1012_002', 'K1009_001']:
+        kpi[counter] = rng.random(len(kpi)) * 1e6
+    return bbu, rru, kpi
+
+
+def calculate_antenna_and_power_rowwise(bbu_df, rru_df, kpi_df):
+    """Data_org_v1 原来的实现：两次分组、三次合并，频段和 Model 逐行计算。"""
+    antenna_count = rru_df.groupby(['NB', '开始时间'])['RRUID'].nunique().reset_index(name='天线数量')
+    total_rru_power = rru_df.groupby(['NB', '开始时间'])['AAU功耗[千瓦时]'].sum().reset_index(name='RRU总功耗')
+    bbu_df = pd.merge(bbu_df, antenna_count, on=['NB', '开始时间'], how='left')
+    bbu_df = pd.merge(bbu_df, total_rru_power, on=['NB', '开始时间'], how='left')
+    bbu_df['天线数量'] = bbu_df['天线数量'].fillna(0).astype(int)
+    bbu_df['频段'] = bbu_df['BBU名称'].apply(lambda x: '700M' if '700M' in x else '2.6G')
+    kpi_df = kpi_df.assign(数据业务流量=(kpi_df['R1012_001'] + kpi_df['R1012_002']).astype(float).round(2),
+                           VoNR语音话务量=(kpi_df['K1009_001'] / 4).astype(float).round(2))
+    traffic_data = kpi_df.groupby(['NB', '开始时间'])[['数据业务流量', 'VoNR语音话务量']].sum().reset_index()
+    traffic_data['数据业务流量'] = (traffic_data['数据业务流量'] / 1000000).astype(float).round(2)
+    bbu_df = pd.merge(bbu_df, traffic_data, on=['NB', '开始时间'], how='left')
+    bbu_df['BBU功耗[千瓦时]'] = bbu_df['BBU功耗[千瓦时]'].round(4)
+    bbu_df['RRU总功耗'] = bbu_df['RRU总功耗'].round(4)
+    bbu_df['总功耗'] = (bbu_df['BBU功耗[千瓦时]'] + bbu_df['RRU总功耗']).round(4)
+    frequency_map = {'700M': 'L', '2.6G': 'H', '4.9G': 'HH'}
+
+    def extract_model(row):
+        parts = pd.Series(row['BBU名称']).str.split('[-–]', expand=True)
+        last_part = parts.iloc[0, -1] if parts.shape[1] > 1 else ''
+        return f"{last_part}-{frequency_map.get(row['频段'], '')}-S{int(row['天线数量'])}"
+
+    bbu_df['Model'] = bbu_df.apply(extract_model, axis=1)
+    return bbu_df.drop_duplicates()
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<28}{time.perf_counter() - start:>10.2f} s")
+    return result
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    bbus = int(args[0]) if len(args) > 0 else 2000
+    days = int(args[1]) if len(args) > 1 else 365
+    bbu, rru, kpi = make_tables(bbus, days)
+    print(f"BBU {len(bbu)} rows, RRU {len(rru)} rows, KPI {len(kpi)} rows")
+
+    result = timed('supermo.power', calculate_antenna_and_power, bbu, rru, kpi)
+    if '--skip-old' not in sys.argv:
+        expected = timed('row-wise (original)', calculate_antenna_and_power_rowwise, bbu, rru, kpi)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+        print("results match")
@@ -0,0 +1,266 @@
+"""
+合成数据生成：按指定规模生成 gdf_RAC、df_KPI、df_BRP 结构的数据，不依赖生产导出。
+
+用法:
+python benchmarks/synthetic.py 输出目录 [--cells 小区数] [--days 天数] [--counters 计数器数] [--exports] [--no-cube]
+
+输出目录按 Data_org_v1 的输出格式写入列式表（gdf_RAC、dim_cell、按月分区的 df_KPI、df_BRP
+和汇总立方体），页面可通过环境变量 SUPERMO_DATA_DIR 直接读取。--exports 时另在 exports/ 下
+按天写出 DT_PowerBI指标通报计数器、DT_BBU功耗、DT_RRU功耗 报表（GBK 编码，带两行说明），
+用于测试 Data_org_v1 的读取和清洗。
+
+地域层级的基数按湖北省的实际规模设定（17 个地市、约 100 个县区、1200 个镇区、2.6 万个村区），
+小区数较少时按比例缩小，保证每个村区平均有若干个小区。
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supermo.cells import build_cell_dimension, cell_keys, to_fact  # noqa: E402
+from supermo.kpi import KPIS, counters_for  # noqa: E402
+from supermo.power import calculate_antenna_and_power  # noqa: E402
+from supermo.powerdist import save_power_distribution  # noqa: E402
+from supermo.rollup import save_rollup_cube  # noqa: E402
+from supermo.store import begin_write, load_table, publish_version, save_partitioned, save_table  # noqa: E402
+from supermo.zerotraffic import save_zero_traffic  # noqa: E402
+
+# 各地域层级的实际数量上限，以及每个下级单元平均包含的小区数
+REGION_SIZES = {'地市': 17, '县区': 103, '镇区': 1235, '村区': 26000}
+CELLS_PER_VILLAGE = 6
+CELLS_PER_SITE = 3
+RRUS_PER_SITE = 3
+ZERO_TRAFFIC_SHARE = 0.03
+START = date(2024, 1, 1)
+
+
+def counter_names(count=None):
+    """KPI 公式用到的计数器，不足 count 个时补充 R9xxx_xxx 形式的其他计数器。"""
+    counters = counters_for(KPIS)
+    extra = max(0, (count or 0) - len(counters))
+    return counters + [f'R9{i // 1000:03d}_{i % 1000:03d}' for i in range(extra)]
+
+
+def make_cells(cells, seed=0):
+    """
+    生成小区表：每个站点 3 个小区，站点随机分布在各村区，地域层级逐级嵌套。
+
+    返回值:
+    pd.DataFrame: 与 gdf_RAC 结构一致的小区表（不含几何列）。
+    """
+    rng = np.random.default_rng(seed)
+    sites = -(-cells // CELLS_PER_SITE)
+    sizes = {}
+    finer = max(1, cells // CELLS_PER_VILLAGE)
+    for level in reversed(list(REGION_SIZES)):
+        sizes[level] = min(REGION_SIZES[level], finer)
+        finer = max(1, sizes[level] // 6)
+
+    # 站点所在村区，上级单元由村区编号按块划分得到，保证层级嵌套
+    village = np.sort(rng.integers(0, sizes['村区'], sites))
+    codes = {level: village * sizes[level] // sizes['村区'] for level in REGION_SIZES}
+    names = {}
+    parent = None
+    for level, suffix in zip(REGION_SIZES, ['市', '县', '镇', '村']):
+        own = pd.Series(codes[level]).map(lambda i, s=suffix: f'{s}{i:05d}')
+        names[level] = own if parent is None else parent + own
+        parent = names[level]
+
+    nb = np.arange(sites) + 100000
+    site = np.arange(cells) // CELLS_PER_SITE
+    local_id = np.arange(cells) % CELLS_PER_SITE + 1
+    band = np.where(nb % 10 < 3, 'band28', 'band41')[site]
+    rac = pd.DataFrame({
+        'ID': [f'{n}_{c}' for n, c in zip(nb[site], local_id)],
+        '网元标识': nb[site],
+        '小区本地ID': local_id,
+        'BBU机房': pd.Series(nb[site]).map('BBU{}'.format).to_numpy(),
+        '基站名称': pd.Series(nb[site]).map('站{}'.format).to_numpy(),
+        '小区名称': [f'站{n}-{"07" if b == "band28" else "26"}-{c}' for n, b, c in zip(nb[site], band, local_id)],
+        '工作频段': band,
+        'Longitude': 113 + rng.random(cells) * 3,
+        'Latitude': 29.5 + rng.random(cells) * 3,
+        '省份': '湖北省',
+    })
+    for level in REGION_SIZES:
+        rac[level] = names[level].to_numpy()[site]
+    return rac
+
+
+def make_kpi(rac, days, counters, seed=0):
+    """
+    生成小区日报计数器：R 计数器为整数、K 计数器保留两位小数，约 3% 的小区-天流量为零。
+
+    返回值:
+    pd.DataFrame: 清洗后的 df_KPI 结构（ID、NB、nrCellCfg、开始时间、结束时间和计数器）。
+    """
+    rng = np.random.default_rng(seed + 1)
+    dates = [START + timedelta(days=i) for i in range(days)]
+    cells = len(rac)
+    rows = cells * days
+    kpi = pd.DataFrame({
+        'ID': np.tile(rac['ID'].to_numpy(), days),
+        'NB': np.tile(rac['网元标识'].astype(str).to_numpy(), days),
+        'nrCellCfg': np.tile(rac['小区本地ID'].astype(str).to_numpy(), days),
+        '开始时间': np.repeat(np.array(dates, dtype=object), cells),
+    })
+    kpi['结束时间'] = kpi['开始时间']
+    scale = rng.lognormal(6, 1, cells)  # 小区之间的业务量差异
+    for counter in counters:
+        if counter.startswith('K'):
+            kpi[counter] = (rng.random(rows) * np.tile(scale, days) / 100).round(2)
+        else:
+            kpi[counter] = rng.poisson(np.tile(scale, days)).astype(np.int64)
+    zero = rng.random(rows) < ZERO_TRAFFIC_SHARE
+    kpi.loc[zero, ['R1012_001', 'R1012_002']] = 0
+    return kpi
+
+
+def make_power(rac, days, seed=0):
+    """
+    生成 BBU 与 RRU 功耗日报。
+
+    返回值:
+    tuple: (df_BUP, df_RUP)，与 process_bbu_power、process_rru_power 的输出结构一致。
+    """
+    rng = np.random.default_rng(seed + 2)
+    dates = [START + timedelta(days=i) for i in range(days)]
+    sites = rac.drop_duplicates('网元标识')
+    nb = sites['网元标识'].to_numpy()
+    kind = np.array(['D5H', 'D5M', 'D5S'])[nb % 3]
+    band = np.where(sites['工作频段'] == 'band28', '700M', '26G')
+    names = [f'BBU-{k}-{b}-Z{n % 50}' for k, b, n in zip(kind, band, nb)]
+
+    bbu = pd.DataFrame({'BBU名称': np.tile(names, days), 'NB': np.tile(nb.astype(str), days),
+                        '站型': np.tile(pd.Series(kind).map({'D5H': '宏站', 'D5M': '微站', 'D5S': '室分'}), days),
+                        '开始时间': np.repeat(np.array(dates, dtype=object), len(nb))})
+    bbu['BBU功耗[千瓦时]'] = (rng.random(len(bbu)) * 10).round(4)
+    bbu['gNB基站CPU平均负荷(R1056_001)[%]'] = rng.integers(0, 100, len(bbu))
+    bbu['gNB基站CPU峰值负荷(R1056_002)[%]'] = rng.integers(0, 100, len(bbu))
+    bbu['BBU功耗(R1054_001)[W]'] = (rng.random(len(bbu)) * 500).round(4)
+
+    rru = bbu[['NB', '开始时间']].loc[bbu.index.repeat(RRUS_PER_SITE)].reset_index(drop=True)
+    rru['RRUID'] = np.tile(np.arange(1, RRUS_PER_SITE + 1).astype(str), len(bbu))
+    rru['AAU功耗[千瓦时]'] = (rng.random(len(rru)) * 5).round(4)
+    return bbu, rru
+
+
+def generate(cells=6000, days=60, counters=None, seed=0):
+    """
+    生成一套合成数据。
+
+    参数:
+    cells (int): 小区数。
+    days (int): 天数（日报，从 2024-01-01 开始）。
+    counters (int): 计数器列数，默认只包含 KPI 公式用到的计数器。
+    seed (int): 随机种子。
+
+    返回值:
+    dict: rac、kpi、bbu、rru 四张表。
+    """
+    rac = make_cells(cells, seed)
+    kpi = make_kpi(rac, days, counter_names(counters), seed)
+    bbu, rru = make_power(rac, days, seed)
+    return {'rac': rac, 'kpi': kpi, 'bbu': bbu, 'rru': rru}
+
+
+def write_store(tables, directory, cube=True):
+    """按 Data_org_v1 的输出格式写入列式表，返回各表行数。"""
+    os.makedirs(directory, exist_ok=True)
+    begin_write(directory)
+    rac, kpi = tables['rac'].copy(), tables['kpi']
+    brp = calculate_antenna_and_power(tables['bbu'], tables['rru'], kpi)
+    dim = build_cell_dimension(rac['ID'], kpi['ID'])
+    rac['cell_key'] = cell_keys(dim, rac['ID'])
+    fact = to_fact(kpi, dim)
+
+    save_table(dim, directory, 'dim_cell')
+    save_table(rac, directory, 'gdf_RAC')
+    save_partitioned(fact, directory, 'df_KPI')
+    save_table(brp, directory, 'df_BRP')
+    rows = {'gdf_RAC': len(rac), 'df_KPI': len(fact), 'df_BRP': len(brp),
+            'zero_traffic': save_zero_traffic(fact, directory),
+            'power_sketch': save_power_distribution(load_table(directory, 'df_BRP'), directory)}
+    if cube:
+        rows.update(save_rollup_cube(fact, rac, directory))
+    publish_version(directory)
+    return rows
+
+
+def _write_export(df, path):
+    """写出一份网管报表：GBK 编码，正文前有两行说明。"""
+    with open(path, 'w', encoding='gbk', newline='') as f:
+        f.write('报表\n说明\n')
+        df.to_csv(f, index=False)
+
+
+def write_exports(tables, directory):
+    """
+    按天写出 Data_org_v1 读取的原始报表。
+
+    返回值:
+    int: 写出的文件数。
+    """
+    os.makedirs(directory, exist_ok=True)
+    rac, kpi, bbu, rru = tables['rac'], tables['kpi'], tables['bbu'], tables['rru']
+    names = pd.Series(rac['小区名称'].to_numpy(), index=rac['ID'])
+    counters = [col for col in kpi.columns if col[0] in 'RK' and col[1:2].isdigit()]
+
+    files = 0
+    for day, part in kpi.groupby('开始时间', sort=True):
+        tag = day.strftime('%Y%m%d')
+        export = pd.DataFrame({
+            '开始时间': day.strftime('%Y-%m-%d 00:00:00'),
+            '结束时间': day.strftime('%Y-%m-%d 23:59:59'),
+            '对象': names.reindex(part['ID']).to_numpy() + '(gNB=' + part['NB'].to_numpy() + ',nrCellCfg=' + part['nrCellCfg'].to_numpy() + ')',
+            'Nr小区工作频段': 'band41',
+            '带宽(MHz)': 100,
+            '逻辑小区id': part['nrCellCfg'].to_numpy(),
+        })
+        for counter in counters:
+            export[f'计数{counter}({counter})'] = part[counter].to_numpy()
+        _write_export(export, os.path.join(directory, f'DT_PowerBI指标通报计数器_{tag}.csv'))
+
+        bbu_day = bbu[bbu['开始时间'] == day]
+        _write_export(pd.DataFrame({
+            '开始时间': day.strftime('%Y-%m-%d 00:00:00'),
+            '对象': bbu_day['BBU名称'] + '(gNB=' + bbu_day['NB'] + ')',
+            **{col: bbu_day[col] for col in bbu.columns[4:]},
+        }), os.path.join(directory, f'DT_BBU功耗_{tag}.csv'))
+
+        rru_day = rru[rru['开始时间'] == day]
+        _write_export(pd.DataFrame({
+            '开始时间': day.strftime('%Y-%m-%d 00:00:00'),
+            '对象': 'RRU(gNB=' + rru_day['NB'] + ',invRRU=' + rru_day['RRUID'] + ')',
+            'AAU功耗[千瓦时]': rru_day['AAU功耗[千瓦时]'],
+        }), os.path.join(directory, f'DT_RRU功耗_{tag}.csv'))
+        files += 3
+    return files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='生成合成的 gdf_RAC / df_KPI / df_BRP 数据')
+    parser.add_argument('directory', help='输出目录')
+    parser.add_argument('--cells', type=int, default=6000, help='小区数')
+    parser.add_argument('--days', type=int, default=60, help='天数')
+    parser.add_argument('--counters', type=int, default=None, help='计数器列数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--exports', action='store_true', help='同时写出原始报表到 exports/')
+    parser.add_argument('--no-cube', action='store_true', help='不生成汇总立方体')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    start = time.perf_counter()
+    tables = generate(args.cells, args.days, args.counters, args.seed)
+    print(f"generated {len(tables['rac'])} cells, {len(tables['kpi'])} KPI rows in {time.perf_counter() - start:.1f} s")
+    print(write_store(tables, args.directory, cube=not args.no_cube))
+    if args.exports:
+        print(f"{write_exports(tables, os.path.join(args.directory, 'exports'))} export files written")
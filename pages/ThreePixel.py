@@ -1,32 +1,45 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
-import os
+from supermo.store import data_directory
+from supermo.datasets import dataset_service
+from supermo.powerdist import PowerDistribution
+from supermo.profiling import page_profiler, report
+from supermo.refresh import data_refresher, show_status, stop_on_update
 
-# 设置文件路径
-directory = r'C:\Data\data'
-file = 'df_BRP.csv'
+# 设置数据目录和表名
+directory = data_directory(r'C:\Data\data')
+table = 'df_BRP'
 
-# 缓存读取 CSV 文件的函数
-@st.cache_data
-def load_data():
-    df_PBR = pd.read_csv(os.path.join(directory, file), encoding='utf-8')
-    return df_PBR
+# 进程内共享的只读数据集服务，各页面和会话共用同一份列数据
+datasets = dataset_service(directory)
 
-# 读取数据
-df_PBR = load_data()
+# 读取整张功耗表（共享列视图，不复制数据）
+def load_data(version):
+    return datasets.frame(table, version=version)
 
-# 删除包含 'D5S' 的行
-df_PBR = df_PBR[~df_PBR['Model'].str.contains('D5S')]
+# 按 Model 和 BBU 汇总的设备功耗分布草图（由 Data_org_v1 预先保存），每个数据版本只读取一次；
+# 旧数据没有草图时由功耗表构建一次。页面对所选 Model 合并草图，不再逐行清洗和统计功耗记录
+@st.cache_resource(max_entries=2)
+def load_distribution(version):
+    distribution = PowerDistribution.load(directory, version)
+    return distribution if distribution is not None else PowerDistribution.from_power(load_data(version))
 
-# 删除 'BBU功耗(R1054_001)[W]' 或 'RRU总功耗' 等于 0 的行
-df_PBR = df_PBR[(df_PBR['BBU功耗(R1054_001)[W]'] != 0) & (df_PBR['RRU总功耗'] != 0)]
+# 后台刷新：数据目录出现新版本时，在后台读取新的功耗分布，完成后才切换版本并释放旧版本
+refresher = data_refresher(directory)
+refresher.register('datasets', retire=datasets.retire)
+refresher.register('ThreePixel', load_distribution, load_distribution.clear)
 
-# 计算新的功耗值
-df_PBR['设备功耗'] = df_PBR['BBU功耗[千瓦时]'] + (df_PBR['RRU总功耗'] / df_PBR['天线数量']) * 3
+# 分阶段计时（?profile=1 或侧边栏开关开启），关闭时没有额外开销
+profiler = page_profiler('ThreePixel')
+show_status(refresher)
+
+# 读取数据；数据目录正在更新时提示并停止本次运行
+with profiler.span('load_data') as span, stop_on_update():
+    distribution = load_distribution(refresher.version())
+    span.rows_out = len(distribution.summary)
 
 # 获取清洗后的 Model 列表
-model_list = df_PBR['Model'].unique().tolist()
+model_list = distribution.models()
 
 # Streamlit 部分
 st.title("主设备功耗分析")
@@ -35,36 +48,44 @@ st.title("主设备功耗分析")
 st.sidebar.subheader("模型选择")
 selected_models = st.sidebar.multiselect("选择模型", model_list, default=model_list)
 
-# 过滤数据根据选择的模型
-filtered_df = df_PBR[df_PBR['Model'].isin(selected_models)]
-
-# 计算平均值、最大值和最小值
-result = filtered_df.groupby('Model')['设备功耗'].agg(['mean', 'max', 'min']).reset_index()
+# 计算所选模型的平均值、最大值和最小值
+with profiler.span('stats', rows_in=len(distribution.summary)) as span:
+    result = distribution.model_stats(selected_models)
+    span.rows_out = len(result)
 
 # 显示计算结果
 st.subheader("设备功耗统计")
 st.dataframe(result)
 
 # 显示每个 Model 的平均值和与最大值和最小值的比值
-for index, row in result.iterrows():
-    mean_val = row['mean']
-    max_val = row['max']
-    min_val = row['min']
-    max_ratio = (max_val - mean_val) / mean_val * 100
-    min_ratio = (mean_val - min_val) / mean_val * 100
-
+max_ratio = (result['max'] - result['mean']) / result['mean'] * 100
+min_ratio = (result['mean'] - result['min']) / result['mean'] * 100
+for model, mean_val, high, low in zip(result['Model'], result['mean'], max_ratio, min_ratio):
     st.metric(
-        label=f"{row['Model']} 平均功耗",
+        label=f"{model} 平均功耗",
         value=f"{mean_val:.2f} kWh",
-        delta=f"最大值比率: {max_ratio:.2f}%, 最小值比率: {min_ratio:.2f}%"
+        delta=f"最大值比率: {high:.2f}%, 最小值比率: {low:.2f}%"
     )
 
 # 以箱线图呈现
 st.subheader("功耗分布箱线图")
-fig, ax = plt.subplots(figsize=(10, 6))
-filtered_df.boxplot(column='设备功耗', by='BBU名称', grid=False, ax=ax)
-plt.title('功耗分布箱线图')
-plt.suptitle('')  # 去掉默认的子标题
-plt.xlabel('BBU名称')
-plt.ylabel('设备功耗')
-st.pyplot(fig)
\ No newline at end of file
+with profiler.span('boxplot') as span:
+    # 合并所选 Model 下各 BBU 的草图得到四分位数、须线和异常点
+    box_stats = distribution.box_stats(selected_models)
+    span.rows_out = len(box_stats)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if box_stats:
+        ax.bxp(box_stats, boxprops={'color': 'k'}, whiskerprops={'color': 'k'}, medianprops={'color': '0.7'})
+    plt.title('功耗分布箱线图')
+    plt.suptitle('')  # 去掉默认的子标题
+    plt.xlabel('BBU名称')
+    plt.ylabel('设备功耗')
+with profiler.span('render'):
+    st.pyplot(fig)
+
+# 显示各表在数据集服务中的内存占用
+with st.sidebar.expander('数据集内存占用'):
+    st.dataframe(datasets.memory_report(), hide_index=True)
+
+# 显示本次运行的阶段耗时
+report(profiler)
@@ -1,76 +1,106 @@
 import streamlit as st
 import pandas as pd
-import os
 import altair as alt
-
-# 设置文件路径
-directory = r'C:\Data\data'
-file = 'gdf_RAC.csv'
-file2 = 'df_KPI.csv'
-
-# 缓存读取 CSV 文件的函数
-@st.cache_data
-def load_data():
-    df = pd.read_csv(os.path.join(directory, file), encoding='utf-8', usecols=['ID', '工作频段', '地市', '县区', '基站名称'])
-    df_KPI = pd.read_csv(os.path.join(directory, file2), encoding='utf-8', usecols=[
-        'ID', '开始时间', 'R1012_001', 'R1012_002', 'K1009_001', 'K1009_002'
-    ])
+from supermo.store import data_directory
+from supermo.datasets import dataset_service
+from supermo.hierarchy import HierarchyIndex
+from supermo.cells import take_cells
+from supermo.kpi import counters_for, aggregate_kpis, evaluate_kpis
+from supermo.downsample import downsample
+from supermo import sql
+from supermo.zerotraffic import ZeroTrafficBitmap
+from supermo.profiling import page_profiler, report
+from supermo.refresh import VersionKeys, data_refresher, show_status, stop_on_update
+
+# 设置数据目录和表名
+directory = data_directory(r'C:\Data\data')
+table = 'gdf_RAC'
+table2 = 'df_KPI'
+
+# 页面展示的指标，需要读取的计数器由公式自动推导
+kpi_names = ['数据业务流量', 'VoNR语音话务量']
+
+# 查询后端：'duckdb' 把筛选、连接、求和与小区计数下推为一条 SQL，未安装 duckdb 时回退到 'pandas'
+query_backend = 'duckdb' if sql.available() else 'pandas'
+
+# 每个开始时间的小区数和零流量小区数
+cell_counts = {
+    'cell_key': 'COUNT(DISTINCT k.cell_key)',
+    'cell_key_zero': f'COUNT(DISTINCT CASE WHEN {sql.kpi_expression("数据业务流量")} = 0 THEN k.cell_key END)',
+}
+
+# 进程内共享的只读数据集服务，各页面和会话共用同一份列数据
+datasets = dataset_service(directory)
+
+# 读取所需的列（共享列视图，不复制数据）
+def load_data(version):
+    df = datasets.frame(table, ['cell_key', '工作频段', '地市', '县区', '基站名称'], version)
+    df_KPI = datasets.frame(table2, ['cell_key', '开始时间'] + counters_for(kpi_names), version)
     return df, df_KPI
 
-# 读取数据
-df, df_KPI = load_data()
-
-# 获取不重复的工作频段和地市
-unique_bands = df['工作频段'].unique().tolist()
-unique_cities = df['地市'].unique().tolist()
-
-# 显示筛选项
+# 层级筛选索引，每个数据版本只构建一次
+@st.cache_resource(max_entries=2)
+def load_hierarchy(version):
+    return HierarchyIndex(load_data(version)[0], ['工作频段', '地市', '县区'], id_column='cell_key')
+
+# 逐小区逐日的零流量位图（由 Data_org_v1 维护），每个数据版本只读取一次；不存在时返回 None
+@st.cache_resource(max_entries=2)
+def load_zero_traffic(version):
+    return ZeroTrafficBitmap.load(directory, version)
+
+# 以数据版本为参数的缓存条目，切换版本后只清除旧版本的条目
+@st.cache_resource
+def load_version_keys():
+    return VersionKeys()
+
+# 用 DuckDB 直接在 Arrow 文件上筛选、连接并按开始时间求和；没有零流量位图时同时计数小区
+@st.cache_data(max_entries=64)
+def query_grouped(selection, how, version, count_cells=True):
+    load_version_keys().add(version, query_grouped.clear, selection, how, version, count_cells)
+    return sql.query_counter_sums(directory, selection, counters=counters_for(kpi_names),
+                                  aggregates=cell_counts if count_cells else None, how=how, version=version)
+
+# 后台刷新：数据目录出现新版本时，在后台读取新数据、构建层级索引和零流量位图，
+# 完成后才切换版本，再只清除旧版本的缓存（新版本的条目保留）；页面运行从不等待新数据加载
+refresher = data_refresher(directory)
+
+def warm(version):
+    load_data(version)
+    load_hierarchy(version)
+    load_zero_traffic(version)
+
+def retire(version):
+    load_hierarchy.clear(version)
+    load_zero_traffic.clear(version)
+    load_version_keys().clear(version)
+
+refresher.register('datasets', retire=datasets.retire)
+refresher.register('TwoPixel', warm, retire)
+
+# 分阶段计时（?profile=1 或侧边栏开关开启），关闭时没有额外开销
+profiler = page_profiler('TwoPixel')
+show_status(refresher)
+
+# 读取数据；数据目录正在更新时提示并停止本次运行
+with profiler.span('load_data') as span, stop_on_update():
+    version = refresher.version()
+    df, df_KPI = load_data(version)
+    hierarchy = load_hierarchy(version)
+    zero_bitmap = load_zero_traffic(version)
+    span.rows_out = len(df_KPI)
+
+# 显示筛选项，每一级的选项由层级索引根据上级选择直接查出
 with st.container():
     col1, col2, col3 = st.columns(3)
-    selected_band = col1.selectbox('选择工作频段', ['全部'] + unique_bands)
-    
-    if selected_band != '全部':
-        filtered_cities = df[df['工作频段'] == selected_band]['地市'].unique().tolist()
-    else:
-        filtered_cities = unique_cities
-    
-    selected_city = col2.selectbox('选择地市', ['全部'] + filtered_cities)
-    
-    if selected_city != '全部':
-        if selected_band != '全部':
-            unique_counties = df[(df['工作频段'] == selected_band) & (df['地市'] == selected_city)]['县区'].unique().tolist()
-        else:
-            unique_counties = df[df['地市'] == selected_city]['县区'].unique().tolist()
-    else:
-        if selected_band != '全部':
-            unique_counties = df[df['工作频段'] == selected_band]['县区'].unique().tolist()
-        else:
-            unique_counties = df['县区'].unique().tolist()
-    
-    selected_county = col3.selectbox('选择县区', ['全部'] + unique_counties)
+    selection = {}
+    selection['工作频段'] = col1.selectbox('选择工作频段', ['全部'] + hierarchy.options('工作频段', selection))
+    selection['地市'] = col2.selectbox('选择地市', ['全部'] + hierarchy.options('地市', selection))
+    selection['县区'] = col3.selectbox('选择县区', ['全部'] + hierarchy.options('县区', selection))
 
 # 根据筛选项过滤数据
-if selected_band != '全部':
-    df = df[df['工作频段'] == selected_band]
-
-if selected_city != '全部':
-    df = df[df['地市'] == selected_city]
-
-if selected_county != '全部':
-    df = df[df['县区'] == selected_county]
-
-# 合并数据框
-merged_df = pd.merge(df_KPI, df, on='ID', how='left')
-
-# 根据筛选项过滤merged_df
-if selected_band != '全部':
-    merged_df = merged_df[merged_df['工作频段'] == selected_band]
-
-if selected_city != '全部':
-    merged_df = merged_df[merged_df['地市'] == selected_city]
-
-if selected_county != '全部':
-    merged_df = merged_df[merged_df['县区'] == selected_county]
+with profiler.span('filter', rows_in=len(df)) as span:
+    df = df.iloc[hierarchy.rows(selection)]
+    span.rows_out = len(df)
 
 # 计算基站数量
 BS_num = df['基站名称'].nunique()
@@ -86,30 +116,58 @@ col1.metric('5G网络基站数', BS_num, 0.1)
 col2.metric('5G网络700M基站数', BS_num_1, 0.15)
 col3.metric('5G网络2.6G基站数', BS_num_2, 0.25)
 
-# 计算新列
-def calculate_columns(df):
-    df["数据业务流量"] = df["R1012_001"] + df["R1012_002"]
-    df["VoNR语音话务量"] = df["K1009_001"] / 4
-    return df
-
-merged_df = calculate_columns(merged_df)
-
-# 将开始时间列转换为datetime类型并进行分组计算
-merged_df['开始时间'] = pd.to_datetime(merged_df['开始时间'])
-merged_df_grouped = merged_df.groupby('开始时间').agg({
-    '数据业务流量': 'sum',
-    'VoNR语音话务量': 'sum',
-    'ID': 'nunique'
-}).reset_index()
-
-# 在展示数据时进行单位转换
-merged_df_grouped['数据业务流量_TB'] = (merged_df_grouped['数据业务流量'] / 1000000000).round(2)
-merged_df_grouped['VoNR语音话务量_千Erl'] = (merged_df_grouped['VoNR语音话务量'] / 1000).round(2)
+# 未筛选时保留全部KPI小区，筛选后只保留所选小区
+how = 'inner' if hierarchy.is_filtered(selection) else 'left'
+
+# 零流量位图中所选小区的 cell_key，未筛选时为全部小区
+zero_keys = df['cell_key'].to_numpy() if how == 'inner' else None
+
+if query_backend == 'duckdb':
+    # 一条 SQL 得到每个开始时间的计数器之和；没有零流量位图时同时得到小区数和零流量小区数
+    with profiler.span('duckdb') as span, stop_on_update():
+        merged_df_grouped = evaluate_kpis(query_grouped(selection, how, version, zero_bitmap is None), kpi_names, decimals=None)
+        if zero_bitmap is None:
+            zero_traffic_counts = merged_df_grouped.loc[merged_df_grouped['cell_key_zero'] > 0, ['开始时间', 'cell_key_zero']]
+            merged_df_grouped = merged_df_grouped.drop(columns='cell_key_zero')
+        span.rows_out = len(merged_df_grouped)
+else:
+    # 按小区键筛选KPI数据；没有零流量位图时计算逐行数据业务流量，用于统计零流量小区
+    with profiler.span('merge', rows_in=len(df_KPI)) as span:
+        merged_df = take_cells(df_KPI, df['cell_key'].to_numpy(), how=how)
+        if zero_bitmap is None:
+            merged_df = evaluate_kpis(merged_df, ['数据业务流量'], decimals=None)
+        span.rows_out = len(merged_df)
+
+    # 按开始时间一次求和所需计数器并计算指标，没有零流量位图时同时统计小区数
+    with profiler.span('aggregate', rows_in=len(merged_df)) as span:
+        extra = {'cell_key': 'nunique'} if zero_bitmap is None else None
+        merged_df_grouped = aggregate_kpis(merged_df, '开始时间', kpi_names, extra=extra, decimals=None)
+        span.rows_out = len(merged_df_grouped)
+
+    # 计算零流量小区数据
+    if zero_bitmap is None:
+        with profiler.span('zero_traffic', rows_in=len(merged_df)) as span:
+            zero_traffic_counts = merged_df[merged_df["数据业务流量"] == 0].groupby('开始时间')['cell_key'].nunique().reset_index()
+            span.rows_out = len(zero_traffic_counts)
+
+# 有零流量位图时，每天的零流量小区数和小区数是所选小区位上的 popcount
+if zero_bitmap is not None:
+    with profiler.span('zero_traffic_bitmap', rows_in=len(zero_bitmap.dates)) as span:
+        zero_traffic_trend = zero_bitmap.daily_counts(zero_keys).set_axis(['开始时间', 'cell_key_zero', 'cell_key_total'], axis=1)
+        zero_traffic_trend = zero_traffic_trend[zero_traffic_trend['cell_key_zero'] > 0].reset_index(drop=True)
+        span.rows_out = len(zero_traffic_trend)
+
+# 构建趋势图
+chart_span = profiler.span('build_charts', rows_in=len(merged_df_grouped)).start()
+
+# 在展示数据时保留两位小数
+merged_df_grouped['数据业务流量_TB'] = merged_df_grouped['数据业务流量'].round(2)
+merged_df_grouped['VoNR语音话务量_千Erl'] = merged_df_grouped['VoNR语音话务量'].round(2)
 
 # 计算最近一个月的日平均值
 last_month_data = merged_df_grouped[merged_df_grouped['开始时间'] >= (merged_df_grouped['开始时间'].max() - pd.DateOffset(months=1))]
-avg_traffic = (last_month_data['数据业务流量'] / 1000000000).mean().round(2)
-avg_vonr = (last_month_data['VoNR语音话务量'] / 1000).mean().round(2)
+avg_traffic = last_month_data['数据业务流量'].mean().round(2)
+avg_vonr = last_month_data['VoNR语音话务量'].mean().round(2)
 
 # 找到最高和最低值
 max_value_traffic = merged_df_grouped['数据业务流量_TB'].max()
@@ -122,8 +180,12 @@ min_value_vonr = merged_df_grouped['VoNR语音话务量_千Erl'].min()
 max_time_vonr = merged_df_grouped[merged_df_grouped['VoNR语音话务量_千Erl'] == max_value_vonr]['开始时间'].iloc[0]
 min_time_vonr = merged_df_grouped[merged_df_grouped['VoNR语音话务量_千Erl'] == min_value_vonr]['开始时间'].iloc[0]
 
+# 趋势图只嵌入绘图需要的列，点数较多时降采样（保留最大最小值点）
+traffic_chart_data = downsample(merged_df_grouped[['开始时间', '数据业务流量_TB']], '开始时间', '数据业务流量_TB')
+vonr_chart_data = downsample(merged_df_grouped[['开始时间', 'VoNR语音话务量_千Erl']], '开始时间', 'VoNR语音话务量_千Erl')
+
 # 使用 Altair 绘制话务量的曲线趋势图
-line_chart_traffic = alt.Chart(merged_df_grouped).mark_line().encode(
+line_chart_traffic = alt.Chart(traffic_chart_data).mark_line().encode(
     x='开始时间:T',
     y=alt.Y('数据业务流量_TB:Q', title='数据业务流量 (TB)'),
     tooltip=['开始时间:T', '数据业务流量_TB:Q']
@@ -164,8 +226,8 @@ min_annotation_traffic = alt.Chart(pd.DataFrame({
 
 # 添加平均线
 avg_line_traffic = alt.Chart(pd.DataFrame({
-    '开始时间': merged_df_grouped['开始时间'],
-    '平均数据业务流量': [avg_traffic] * len(merged_df_grouped)
+    '开始时间': traffic_chart_data['开始时间'],
+    '平均数据业务流量': [avg_traffic] * len(traffic_chart_data)
 })).mark_line(
     color='green',
     strokeDash=[5, 5]
@@ -191,7 +253,7 @@ avg_annotation_traffic = alt.Chart(pd.DataFrame({
 line_chart_traffic = line_chart_traffic + max_annotation_traffic + min_annotation_traffic + avg_line_traffic + avg_annotation_traffic
 
 # 使用 Altair 绘制VoNR语音话务量趋势图
-line_chart_vonr = alt.Chart(merged_df_grouped).mark_line().encode(
+line_chart_vonr = alt.Chart(vonr_chart_data).mark_line().encode(
     x='开始时间:T',
     y=alt.Y('VoNR语音话务量_千Erl:Q', title='VoNR语音话务量 (千Erl)'),
     tooltip=['开始时间:T', 'VoNR语音话务量_千Erl:Q']
@@ -232,8 +294,8 @@ min_annotation_vonr = alt.Chart(pd.DataFrame({
 
 # 添加平均线
 avg_line_vonr = alt.Chart(pd.DataFrame({
-    '开始时间': merged_df_grouped['开始时间'],
-    '平均VoNR语音话务量': [avg_vonr] * len(merged_df_grouped)
+    '开始时间': vonr_chart_data['开始时间'],
+    '平均VoNR语音话务量': [avg_vonr] * len(vonr_chart_data)
 })).mark_line(
     color='green',
     strokeDash=[5, 5]
@@ -258,32 +320,34 @@ avg_annotation_vonr = alt.Chart(pd.DataFrame({
 
 line_chart_vonr = line_chart_vonr + max_annotation_vonr + min_annotation_vonr + avg_line_vonr + avg_annotation_vonr
 
-# 计算零流量小区数据
-zero_traffic_counts = merged_df[merged_df["数据业务流量"] == 0].groupby('开始时间')['ID'].nunique().reset_index()
-
-# 合并零流量小区数量和总小区数量
-zero_traffic_trend = pd.merge(zero_traffic_counts, merged_df_grouped[['开始时间', 'ID']], 
-                            on='开始时间', suffixes=('_zero', '_total'))
-zero_traffic_trend['零流量小区比例'] = (zero_traffic_trend['ID_zero'] / zero_traffic_trend['ID_total'] * 100).round(2)
+# 合并零流量小区数量和总小区数量（零流量位图已直接给出两者）
+if zero_bitmap is None:
+    zero_traffic_counts = zero_traffic_counts.set_axis(['开始时间', 'cell_key'], axis=1)
+    zero_traffic_trend = pd.merge(zero_traffic_counts, merged_df_grouped[['开始时间', 'cell_key']], 
+                                on='开始时间', suffixes=('_zero', '_total'))
+zero_traffic_trend['零流量小区比例'] = (zero_traffic_trend['cell_key_zero'] / zero_traffic_trend['cell_key_total'] * 100).round(2)
 
 # 找到零流量小区数量和比例的最大值和最小值
-max_value_zero = zero_traffic_trend['ID_zero'].max()
-min_value_zero = zero_traffic_trend['ID_zero'].min()
-max_time_zero = zero_traffic_trend[zero_traffic_trend['ID_zero'] == max_value_zero]['开始时间'].iloc[0]
-min_time_zero = zero_traffic_trend[zero_traffic_trend['ID_zero'] == min_value_zero]['开始时间'].iloc[0]
+max_value_zero = zero_traffic_trend['cell_key_zero'].max()
+min_value_zero = zero_traffic_trend['cell_key_zero'].min()
+max_time_zero = zero_traffic_trend[zero_traffic_trend['cell_key_zero'] == max_value_zero]['开始时间'].iloc[0]
+min_time_zero = zero_traffic_trend[zero_traffic_trend['cell_key_zero'] == min_value_zero]['开始时间'].iloc[0]
 
 max_ratio = zero_traffic_trend['零流量小区比例'].max()
 min_ratio = zero_traffic_trend['零流量小区比例'].min()
 max_ratio_time = zero_traffic_trend[zero_traffic_trend['零流量小区比例'] == max_ratio]['开始时间'].iloc[0]
 min_ratio_time = zero_traffic_trend[zero_traffic_trend['零流量小区比例'] == min_ratio]['开始时间'].iloc[0]
 
+# 零流量小区数量和比例共用一张图，降采样时两列的保留点取并集
+zero_chart_data = downsample(zero_traffic_trend[['开始时间', 'cell_key_zero', '零流量小区比例']], '开始时间', ['cell_key_zero', '零流量小区比例'])
+
 # 绘制零流量小区趋势图
-bar_chart_zero_traffic = alt.Chart(zero_traffic_trend).mark_bar().encode(
+bar_chart_zero_traffic = alt.Chart(zero_chart_data).mark_bar().encode(
     x='开始时间:T',
-    y=alt.Y('ID_zero:Q', 
+    y=alt.Y('cell_key_zero:Q', 
             title='零流量小区数量',
             scale=alt.Scale(domain=[0, max_value_zero * 2])),
-    tooltip=['开始时间:T', 'ID_zero:Q']
+    tooltip=['开始时间:T', 'cell_key_zero:Q']
 ).properties(
     title='零流量小区趋势图',
     width=800,
@@ -291,7 +355,7 @@ bar_chart_zero_traffic = alt.Chart(zero_traffic_trend).mark_bar().encode(
 )
 
 # 绘制零流量小区比例趋势线
-line_chart_zero_traffic_ratio = alt.Chart(zero_traffic_trend).mark_line(color='orange').encode(
+line_chart_zero_traffic_ratio = alt.Chart(zero_chart_data).mark_line(color='orange').encode(
     x='开始时间:T',
     y=alt.Y('零流量小区比例:Q', 
             title='零流量小区比例 (%)',
@@ -305,7 +369,7 @@ line_chart_zero_traffic_ratio = alt.Chart(zero_traffic_trend).mark_line(color='o
 # 添加数量标注
 max_annotation_zero = alt.Chart(pd.DataFrame({
     '开始时间': [max_time_zero],
-    'ID_zero': [max_value_zero]
+    'cell_key_zero': [max_value_zero]
 })).mark_text(
     text=f'{max_value_zero}',
     align='left',
@@ -314,12 +378,12 @@ max_annotation_zero = alt.Chart(pd.DataFrame({
     color='red'
 ).encode(
     x='开始时间:T',
-    y=alt.Y('ID_zero:Q', scale=alt.Scale(domain=[0, max_value_zero * 2]))
+    y=alt.Y('cell_key_zero:Q', scale=alt.Scale(domain=[0, max_value_zero * 2]))
 )
 
 min_annotation_zero = alt.Chart(pd.DataFrame({
     '开始时间': [min_time_zero],
-    'ID_zero': [min_value_zero]
+    'cell_key_zero': [min_value_zero]
 })).mark_text(
     text=f'{min_value_zero}',
     align='left',
@@ -328,7 +392,7 @@ min_annotation_zero = alt.Chart(pd.DataFrame({
     color='blue'
 ).encode(
     x='开始时间:T',
-    y=alt.Y('ID_zero:Q', scale=alt.Scale(domain=[0, max_value_zero * 2]))
+    y=alt.Y('cell_key_zero:Q', scale=alt.Scale(domain=[0, max_value_zero * 2]))
 )
 
 # 添加比例标注
@@ -368,15 +432,43 @@ combined_chart_zero_traffic = alt.layer(
     y='independent'
 )
 
-# 使用 Streamlit 显示图表
-st.subheader('话务量和业务量趋势图')
+chart_span.stop()
 
-# 创建两列布局并显示图表
-with st.container():
-    col1, col2 = st.columns(2)
-    col1.altair_chart(line_chart_traffic, use_container_width=True)
-    col2.altair_chart(line_chart_vonr, use_container_width=True)
+# 序列化图表规格；数据已降采样，不需要 Altair 的行数限制
+with profiler.span('serialize'), alt.data_transformers.enable('default', max_rows=None):
+    spec_traffic = line_chart_traffic.to_dict()
+    spec_vonr = line_chart_vonr.to_dict()
+    spec_zero_traffic = combined_chart_zero_traffic.to_dict()
 
-# 显示零流量小区趋势图
-st.subheader('零流量小区趋势图')
-st.altair_chart(combined_chart_zero_traffic, use_container_width=True)
\ No newline at end of file
+# 使用 Streamlit 显示图表
+with profiler.span('render'):
+    st.subheader('话务量和业务量趋势图')
+
+    # 创建两列布局并显示图表
+    with st.container():
+        col1, col2 = st.columns(2)
+        col1.vega_lite_chart(spec_traffic, use_container_width=True)
+        col2.vega_lite_chart(spec_vonr, use_container_width=True)
+
+    # 显示零流量小区趋势图
+    st.subheader('零流量小区趋势图')
+    st.vega_lite_chart(spec_zero_traffic, use_container_width=True)
+
+# 连续多天零流量的小区，在零流量位图上逐日扫描得到
+if zero_bitmap is not None:
+    st.subheader('连续零流量小区')
+    min_days = st.number_input('连续零流量天数不少于', min_value=1, value=3, step=1)
+    with profiler.span('zero_runs', rows_in=len(df)) as span:
+        zero_runs = zero_bitmap.zero_runs(int(min_days), zero_keys)
+        cell_info = df.drop_duplicates('cell_key')[['cell_key', '基站名称', '工作频段', '地市', '县区']]
+        zero_runs = zero_runs.merge(cell_info, on='cell_key', how='left')
+        span.rows_out = len(zero_runs)
+    st.metric('连续零流量小区数', len(zero_runs))
+    st.dataframe(zero_runs, hide_index=True)
+
+# 显示各表在数据集服务中的内存占用
+with st.sidebar.expander('数据集内存占用'):
+    st.dataframe(datasets.memory_report(), hide_index=True)
+
+# 显示本次运行的阶段耗时
+report(profiler)
@@ -1,169 +1,119 @@
 import streamlit as st
 import pandas as pd
-import os
 import altair as alt
+from datetime import date
+from supermo.store import partition_date_bounds, data_directory, load_partitioned, read_partition_meta, select_partitions, versioned
+from supermo.datasets import dataset_service
+from supermo.rollup import LEVELS, choose_granularity, has_rollup_cube, query_rollup_cube, resample_counters
+from supermo.hierarchy import HierarchyIndex
+from supermo.cells import take_cells
+from supermo.kpi import counters_for, evaluate_kpis
+from supermo.downsample import MAX_POINTS, downsample
+from supermo.chartcache import ChartSpecCache, fingerprint
+from supermo import sql
+from supermo.profiling import page_profiler, fragment_profiler, report
+from supermo.refresh import VersionKeys, data_refresher, show_status, stop_on_update
+from supermo.singleflight import flight_report
 
-# 设置文件路径
-directory = r'C:\Data\data'
-file = 'gdf_RAC.csv'
-file2 = 'df_KPI.csv'
-
-# 缓存读取 CSV 文件的函数
-@st.cache_data
-def load_data():
-    df = pd.read_csv(os.path.join(directory, file), encoding='utf-8', usecols=['ID', '工作频段', '地市', '县区', '镇区', '村区'])
-    df_KPI = pd.read_csv(os.path.join(directory, file2), encoding='utf-8', usecols=[
-        'ID', '开始时间', 'R1012_001', 'R1012_002', 'K1009_001', 'R1001_012', 'R1001_001', 'R1034_012', 'R1034_001', 
-        'R1039_002', 'R1039_001', 'R1004_003', 'R1004_004', 'R1004_002', 'R1004_007', 'R1005_012', 'R1006_012', 
-        'R2007_002', 'R2007_004', 'R2006_004', 'R2006_008', 'R2005_004', 'R2005_008', 'R2007_001', 'R2007_003', 
-        'R2006_001', 'R2006_005', 'R2005_001', 'R2005_005', 'R1034_013', 'R1034_002', 'R1001_018', 'R1001_015', 
-        'R1001_007', 'R1001_004', 'R2035_003', 'R2035_013', 'R2035_026', 'R2005_063', 'R2005_067', 'R2006_071', 
-        'R2006_075', 'R2007_036', 'R2007_040', 'R2005_060', 'R2005_064', 'R2006_068', 'R2006_072', 'R2007_033', 
-        'R2007_037','R2004_003','R2004_004','R2004_003','R2004_006'
-    ])
-    return df, df_KPI
-
-# 读取数据
-df, df_KPI = load_data()
-
-# 显示筛选项
-with st.container():
-    cols = st.columns(5)  # 创建五列布局
-
-    # 频段选择框
-    selected_band = cols[0].selectbox('选择工作频段', ['全部'] + df['工作频段'].unique().tolist())
-
-    # 地市选择框，基于频段选择进行过滤
-    if selected_band == '全部':
-        city_options = df['地市'].unique().tolist()
-    else:
-        city_options = df[df['工作频段'] == selected_band]['地市'].unique().tolist()
-    selected_city = cols[1].selectbox('选择地市', ['全部'] + city_options)
+# 设置数据目录和表名
+directory = data_directory(r'C:\Data\data')
+table = 'gdf_RAC'
+table2 = 'df_KPI'
 
-    # 县区选择框，基于频段和地市选择进行过滤
-    if selected_city == '全部':
-        county_options = df[df['工作频段'] == selected_band]['县区'].unique().tolist() if selected_band != '全部' else df['县区'].unique().tolist()
-    else:
-        county_options = df[(df['工作频段'] == selected_band) & (df['地市'] == selected_city)]['县区'].unique().tolist()
-    selected_county = cols[2].selectbox('选择县区', ['全部'] + county_options)
+# 页面展示的指标，需要读取的计数器由公式自动推导
+kpi_names = ['数据业务流量', 'VoNR语音话务量', '无线接通率', '无线掉线率', '系统内切换成功率',
+             'VoNR无线接通率', 'VoNR语音掉线率', 'VoNR系统内切换成功率']
+kpi_counters = counters_for(kpi_names)
+kpi_columns = ['cell_key', '开始时间'] + kpi_counters
 
-    # 镇区选择框，基于频段、地市和县区选择进行过滤
-    if selected_county == '全部':
-        town_options = df[(df['工作频段'] == selected_band) & (df['地市'] == selected_city)]['镇区'].unique().tolist() if selected_city != '全部' else df['镇区'].unique().tolist()
-    else:
-        town_options = df[(df['工作频段'] == selected_band) & (df['地市'] == selected_city) & (df['县区'] == selected_county)]['镇区'].unique().tolist()
-    selected_town = cols[3].selectbox('选择镇区', ['全部'] + town_options)
+# 没有汇总立方体时的查询后端：'duckdb' 把筛选、连接和求和下推为一条 SQL，未安装 duckdb 时回退到 'pandas'
+query_backend = 'duckdb' if sql.available() else 'pandas'
 
-    # 村区选择框，基于频段、地市、县区和镇区选择进行过滤
-    if selected_town == '全部':
-        village_options = df[(df['工作频段'] == selected_band) & (df['地市'] == selected_city) & (df['县区'] == selected_county)]['村区'].unique().tolist() if selected_county != '全部' else df['村区'].unique().tolist()
-    else:
-        village_options = df[(df['工作频段'] == selected_band) & (df['地市'] == selected_city) & (df['县区'] == selected_county) & (df['镇区'] == selected_town)]['村区'].unique().tolist()
-    selected_village = cols[4].selectbox('选择村区', ['全部'] + village_options)
-
-# 根据选择更新数据筛选
-final_df = df.copy()
-if selected_band != '全部':
-    final_df = final_df[final_df['工作频段'] == selected_band]
-if selected_city != '全部':
-    final_df = final_df[final_df['地市'] == selected_city]
-if selected_county != '全部':
-    final_df = final_df[final_df['县区'] == selected_county]
-if selected_town != '全部':
-    final_df = final_df[final_df['镇区'] == selected_town]
-if selected_village != '全部':
-    final_df = final_df[final_df['村区'] == selected_village]
-
-# 合并数据框
-merged_df = pd.merge(df_KPI, final_df, on='ID', how='inner')
-
-# 时间范围选择
-min_date = pd.to_datetime(merged_df['开始时间']).min().date()
-max_date = pd.to_datetime(merged_df['开始时间']).max().date()
-selected_date_range = st.slider('选择时间范围', min_value=min_date, max_value=max_date, value=(min_date, max_date))
-
-# 时间范围筛选
-merged_df['开始时间'] = pd.to_datetime(merged_df['开始时间'])
-merged_df = merged_df[(merged_df['开始时间'].dt.date >= selected_date_range[0]) & (merged_df['开始时间'].dt.date <= selected_date_range[1])]
-
-# 数据聚合函数
-def aggregate_data(df):
-    df['开始时间'] = pd.to_datetime(df['开始时间'])
-    
-    agg_df = df.groupby('开始时间').agg({
-        'R1012_001': 'sum',
-        'R1012_002': 'sum',
-        'R1001_012': 'sum',
-        'R1001_001': 'sum',
-        'R1034_012': 'sum',
-        'R1034_001': 'sum',
-        'R1039_002': 'sum',
-        'R1039_001': 'sum',
-        'R1004_003': 'sum',
-        'R1004_004': 'sum',
-        'R1004_002': 'sum',
-        'R1004_007': 'sum',
-        'R1005_012': 'sum',
-        'R1006_012': 'sum',
-        'R2007_002': 'sum',
-        'R2007_004': 'sum',
-        'R2006_004': 'sum',
-        'R2006_008': 'sum',
-        'R2005_004': 'sum',
-        'R2005_008': 'sum',
-        'R2007_001': 'sum',
-        'R2007_003': 'sum',
-        'R2006_001': 'sum',
-        'R2006_005': 'sum',
-        'R2005_001': 'sum',
-        'R2005_005': 'sum',
-        'K1009_001': 'sum',
-        'R1034_013': 'sum',
-        'R1034_002': 'sum',
-        'R1001_018': 'sum',
-        'R1001_015': 'sum',
-        'R1001_007': 'sum',
-        'R1001_004': 'sum',
-        'R2035_003': 'sum',
-        'R2035_013': 'sum',
-        'R2035_026': 'sum',
-        'R2005_063': 'sum',
-        'R2005_067': 'sum',
-        'R2006_071': 'sum',
-        'R2006_075': 'sum',
-        'R2007_036': 'sum',
-        'R2007_040': 'sum',
-        'R2005_060': 'sum',
-        'R2005_064': 'sum',
-        'R2006_068': 'sum',
-        'R2006_072': 'sum',
-        'R2007_033': 'sum',
-        'R2007_037': 'sum',
-        'R2004_003': 'sum',
-        'R2004_004': 'sum',
-        'R2004_003': 'sum',
-        'R2004_006': 'sum'
-    }).reset_index()
-    
-    # 使用聚合后的数据计算指标，并调整单位
-    agg_df["数据业务流量"] = (agg_df["R1012_001"] + agg_df["R1012_002"]) / 1000000000  # 转换为TB
-    agg_df["VoNR语音话务量"] = (agg_df["K1009_001"] / 4) / 1000  # 转换为千Erl
-    agg_df["无线接通率"] = (agg_df["R1001_012"] / agg_df["R1001_001"]) * (agg_df["R1034_012"] / agg_df["R1034_001"]) * (agg_df["R1039_002"] / agg_df["R1039_001"]) * 100
-    agg_df["无线掉线率"] = 100 * ((agg_df["R2004_003"] - agg_df["R2004_004"]) / (agg_df["R2004_003"] + agg_df["R2004_006"]))
-    agg_df["系统内切换成功率"] = 100 * ((agg_df["R2007_002"] + agg_df["R2007_004"] + agg_df["R2006_004"] + agg_df["R2006_008"] + agg_df["R2005_004"] + agg_df["R2005_008"]) / (agg_df["R2007_001"] + agg_df["R2007_003"] + agg_df["R2006_001"] + agg_df["R2006_005"] + agg_df["R2005_001"] + agg_df["R2005_005"]))
-    agg_df["VoNR无线接通率"] = 100 * (agg_df["R1034_013"] / agg_df["R1034_002"]) * (agg_df["R1001_018"] + agg_df["R1001_015"]) / (agg_df["R1001_007"] + agg_df["R1001_004"])
-    agg_df["VoNR语音掉线率"] = 100 * ((agg_df["R2035_003"] - agg_df["R2035_013"]) / (agg_df["R2035_003"] + agg_df["R2035_026"]))
-    agg_df["VoNR系统内切换成功率"] = 100 * (agg_df["R2005_063"] + agg_df["R2005_067"] + agg_df["R2006_071"] + agg_df["R2006_075"] + agg_df["R2007_036"] + agg_df["R2007_040"]) / (agg_df["R2005_060"] + agg_df["R2005_064"] + agg_df["R2006_068"] + agg_df["R2006_072"] + agg_df["R2007_033"] + agg_df["R2007_037"])
-    
-    # 四舍五入到2位小数以减少数据量
-    for col in agg_df.columns:
-        if col != '开始时间':
-            agg_df[col] = agg_df[col].round(2)
-    
-    return agg_df
+# 进程内共享的只读数据集服务，各页面和会话共用同一份列数据
+datasets = dataset_service(directory)
+
+# 读取小区表所需的列（共享列视图，不复制数据）
+def load_data(version):
+    return datasets.frame(table, ['cell_key', '工作频段', '地市', '县区', '镇区', '村区'], version)
+
+# 层级筛选索引，每个数据版本只构建一次
+@st.cache_resource(max_entries=2)
+def load_hierarchy(version):
+    return HierarchyIndex(load_data(version), LEVELS, id_column='cell_key')
+
+# 以数据版本为参数的缓存条目，切换版本后只清除旧版本的条目
+@st.cache_resource
+def load_version_keys():
+    return VersionKeys()
+
+# 页面按 筛选项 → 小区集合 → 每日计数器之和 → 时间窗口内的 KPI 比值 → 图表 分阶段计算，
+# 每个阶段只以自己的输入为缓存键：拖动时间滑块只切片已缓存的计数器之和并重新计算比值和图表，
+# 不会重新筛选小区或求和
+
+# 所选小区的 cell_key，只取决于筛选项
+@st.cache_data(max_entries=64)
+def load_cell_keys(selection, version):
+    load_version_keys().add(version, load_cell_keys.clear, selection, version)
+    return load_data(version)['cell_key'].to_numpy()[load_hierarchy(version).rows(selection)]
+
+# pandas 后端：所选小区在一个KPI分区内每个开始时间的计数器之和，只读取这个分区，
+# 按分区缓存，移动时间窗口时只读取新涉及的分区
+@st.cache_data(max_entries=256)
+def load_partition_sums(selection, partition, version):
+    load_version_keys().add(version, load_partition_sums.clear, selection, partition, version)
+    with versioned(directory, version):
+        info = read_partition_meta(directory, table2)['partitions'][partition]
+        df_KPI = load_partitioned(directory, table2, kpi_columns, (date.fromisoformat(info['min']), date.fromisoformat(info['max'])))
+    merged_df = take_cells(df_KPI, load_cell_keys(selection, version))
+    return merged_df.groupby('开始时间', sort=True)[kpi_counters].sum().reset_index()
+
+# pandas 后端需要读取的KPI分区：与时间范围相交的分区，None 表示全部分区；
+# 汇总立方体和 DuckDB 后端不按分区读取，返回 None
+def window_partitions(date_range, version):
+    if has_rollup_cube(directory) or query_backend == 'duckdb':
+        return None
+    with versioned(directory, version):
+        meta = read_partition_meta(directory, table2)
+    return tuple(select_partitions(meta, date_range)) if meta is not None else ()
+
+# 所选小区每个开始时间的计数器之和，只取决于筛选项：
+# 优先读取汇总立方体（全部日期），否则由查询后端求和（全部日期），
+# 或在 pandas 中逐分区合并小区级数据后求和（只读取 partitions 中的分区，None 表示全部分区）
+@st.cache_data(max_entries=64)
+def load_counter_sums(selection, version, partitions=None):
+    load_version_keys().add(version, load_counter_sums.clear, selection, version, partitions)
+    if has_rollup_cube(directory):
+        return query_rollup_cube(directory, selection, counters=kpi_counters, version=version)
+    if query_backend == 'duckdb':
+        return sql.query_counter_sums(directory, selection, counters=kpi_counters, version=version)
+    if partitions is None:
+        partitions = window_partitions(None, version)
+    if not partitions:
+        return pd.DataFrame({'开始时间': pd.Series(dtype='datetime64[ns]'), **{c: pd.Series(dtype='int64') for c in kpi_counters}})
+    return pd.concat([load_partition_sums(selection, partition, version) for partition in partitions], ignore_index=True)
+
+# 时间窗口内每个开始时间的计数器之和
+def window_sums(sums, date_range):
+    dates = sums['开始时间']
+    return sums[(dates >= pd.Timestamp(date_range[0])) & (dates <= pd.Timestamp(date_range[1]))].reset_index(drop=True)
+
+# 时间窗口内按周或按月的计数器之和：汇总立方体直接读取周、月汇总（首尾不完整的周期只计范围内的日期），
+# 否则把已缓存的每日计数器之和切片后按周期求和
+@st.cache_data(max_entries=64)
+def load_period_sums(selection, date_range, granularity, version):
+    load_version_keys().add(version, load_period_sums.clear, selection, date_range, granularity, version)
+    if has_rollup_cube(directory):
+        return query_rollup_cube(directory, selection, date_range, counters=kpi_counters, granularity=granularity, version=version)
+    partitions = window_partitions(date_range, version)
+    return resample_counters(window_sums(load_counter_sums(selection, version, partitions), date_range), granularity)
+
+# 时间粒度；“自动”时选择时间范围内仍有足够点数的最粗粒度
+GRANULARITY_NAMES = {'day': '日', 'week': '周', 'month': '月'}
+# 各粒度横坐标的时间格式
+TIME_FORMATS = {'day': '%m-%d', 'week': '%m-%d', 'month': '%Y-%m'}
 
 # 创建带最大最小值的图表的函数
-def create_chart_with_extremes(data, y_field, title, y_title, is_full_width=False):
+def create_chart_with_extremes(data, y_field, title, y_title, is_full_width=False, max_points=MAX_POINTS, time_format='%m-%d'):
     # 设置图表基础配置
     config = {
         "view": {"strokeWidth": 0},  # 移除图表边框
@@ -190,15 +140,18 @@ def create_chart_with_extremes(data, y_field, title, y_title, is_full_width=Fals
     width = 1200 if is_full_width else 380
     height = 400 if is_full_width else 320
     
+    # 只嵌入绘图需要的两列，点数超过 max_points 时降采样（保留最大最小值点）
+    line_data = downsample(data[['开始时间', y_field]], '开始时间', y_field, max_points)
+    
     # 创建基础图表
-    base = alt.Chart(data).mark_line(
+    base = alt.Chart(line_data).mark_line(
         color='#5276A7',  # 线条颜色
         strokeWidth=2  # 线条宽度
     ).encode(
         x=alt.X('开始时间:T', 
                 title='时间',
                 axis=alt.Axis(
-                    format='%m-%d',  # 时间格式
+                    format=time_format,  # 时间格式
                     labelAngle=-45,  # 标签角度
                     titleFontSize=12,  # 横坐标标题字体大小
                     labelFontSize=10,  # 横坐标标签字体大小
@@ -281,86 +234,229 @@ def create_chart_with_extremes(data, y_field, title, y_title, is_full_width=Fals
     # 组合所有图层并配置
     return (base + max_point + min_point + max_text + min_text).configure(**config)
 
-# 处理和聚合数据
-agg_df = aggregate_data(merged_df)
-
-# 创建图表
-chart_traffic = create_chart_with_extremes(
-    agg_df,
-    '数据业务流量',
-    '数据业务流量',
-    '数据业务流量 (TB)',
-    is_full_width=True
-)
-
-chart_vonr_traffic = create_chart_with_extremes(
-    agg_df,
-    'VoNR语音话务量',
-    'VoNR语音话务量',
-    'VoNR语音话务量 (千Erl)',
-    is_full_width=True
-)
-
-chart_connection = create_chart_with_extremes(
-    agg_df,
-    '无线接通率',
-    '无线接通率',
-    '无线接通率 (%)'
-)
-
-chart_drop = create_chart_with_extremes(
-    agg_df,
-    '无线掉线率',
-    '无线掉线率',
-    '无线掉线率 (%)'
-)
-
-chart_handover = create_chart_with_extremes(
-    agg_df,
-    '系统内切换成功率',
-    '系统内切换',
-    '系统内切换成功率 (%)'
-)
-
-chart_vonr_connection = create_chart_with_extremes(
-    agg_df,
-    'VoNR无线接通率',
-    'VoNR无线接通率',
-    'VoNR无线接通率 (%)'
-)
-
-chart_vonr_drop = create_chart_with_extremes(
-    agg_df,
-    'VoNR语音掉线率',
-    'VoNR语音掉线率',
-    'VoNR语音掉线率 (%)'
-)
-
-chart_vonr_handover = create_chart_with_extremes(agg_df,
-    'VoNR系统内切换成功率',
-    'VoNR系统内切换',
-    'VoNR系统内切换成功率 (%)'
-)
-
-# 使用streamlit显示图表
-st.subheader('数据业务流量及性能指标')
-st.altair_chart(chart_traffic, use_container_width=True)
-
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.altair_chart(chart_connection, use_container_width=True)
-with col2:
-    st.altair_chart(chart_drop, use_container_width=True)
-with col3:
-    st.altair_chart(chart_handover, use_container_width=True)
-
-st.subheader('VoNR语音话务量及性能指标')
-st.altair_chart(chart_vonr_traffic, use_container_width=True)
-
-col4, col5, col6 = st.columns(3)
-with col4:
-    st.altair_chart(chart_vonr_connection, use_container_width=True)
-with col5:
-    st.altair_chart(chart_vonr_drop, use_container_width=True)
-with col6:
-    st.altair_chart(chart_vonr_handover, use_container_width=True)
\ No newline at end of file
+# 创建全部图表，返回各图表序列化后的 Vega-Lite 规格
+def build_chart_specs(agg_df, profiler, time_format='%m-%d'):
+    # 创建图表
+    with profiler.span('build_charts', rows_in=len(agg_df)):
+        chart_traffic = create_chart_with_extremes(
+            agg_df,
+            '数据业务流量',
+            '数据业务流量',
+            '数据业务流量 (TB)',
+            is_full_width=True,
+            time_format=time_format
+        )
+
+        chart_vonr_traffic = create_chart_with_extremes(
+            agg_df,
+            'VoNR语音话务量',
+            'VoNR语音话务量',
+            'VoNR语音话务量 (千Erl)',
+            is_full_width=True,
+            time_format=time_format
+        )
+
+        chart_connection = create_chart_with_extremes(
+            agg_df,
+            '无线接通率',
+            '无线接通率',
+            '无线接通率 (%)',
+            time_format=time_format
+        )
+
+        chart_drop = create_chart_with_extremes(
+            agg_df,
+            '无线掉线率',
+            '无线掉线率',
+            '无线掉线率 (%)',
+            time_format=time_format
+        )
+
+        chart_handover = create_chart_with_extremes(
+            agg_df,
+            '系统内切换成功率',
+            '系统内切换',
+            '系统内切换成功率 (%)',
+            time_format=time_format
+        )
+
+        chart_vonr_connection = create_chart_with_extremes(
+            agg_df,
+            'VoNR无线接通率',
+            'VoNR无线接通率',
+            'VoNR无线接通率 (%)',
+            time_format=time_format
+        )
+
+        chart_vonr_drop = create_chart_with_extremes(
+            agg_df,
+            'VoNR语音掉线率',
+            'VoNR语音掉线率',
+            'VoNR语音掉线率 (%)',
+            time_format=time_format
+        )
+
+        chart_vonr_handover = create_chart_with_extremes(agg_df,
+            'VoNR系统内切换成功率',
+            'VoNR系统内切换',
+            'VoNR系统内切换成功率 (%)',
+            time_format=time_format
+        )
+
+    # 序列化图表规格；数据已降采样，不需要 Altair 的行数限制
+    charts = {
+        'chart_traffic': chart_traffic,
+        'chart_vonr_traffic': chart_vonr_traffic,
+        'chart_connection': chart_connection,
+        'chart_drop': chart_drop,
+        'chart_handover': chart_handover,
+        'chart_vonr_connection': chart_vonr_connection,
+        'chart_vonr_drop': chart_vonr_drop,
+        'chart_vonr_handover': chart_vonr_handover,
+    }
+    with profiler.span('serialize'), alt.data_transformers.enable('default', max_rows=None):
+        return {name: chart.to_dict() for name, chart in charts.items()}
+
+# 图表规格缓存，所有会话共享；按筛选条件、时间范围和数据版本命中。
+# 多个会话同时请求同一组图表时只构建一次，同时构建的会话数不超过 4 个
+@st.cache_resource
+def load_chart_cache():
+    return ChartSpecCache(max_bytes=64 * 1024 * 1024, max_workers=4)
+
+# 后台刷新：数据目录出现新版本时，在后台读取新数据、构建层级索引和默认视图的计数器之和，
+# 完成后才切换版本，再只清除旧版本的缓存（新版本已预热的条目保留）；页面运行从不等待新数据加载
+refresher = data_refresher(directory)
+
+def warm(version):
+    load_hierarchy(version)
+    load_counter_sums(dict.fromkeys(LEVELS, '全部'), version)
+
+def retire(version):
+    load_hierarchy.clear(version)
+    load_version_keys().clear(version)
+
+refresher.register('datasets', retire=datasets.retire)
+refresher.register('onePixel', warm, retire)
+
+# 分阶段计时（?profile=1 或侧边栏开关开启），关闭时没有额外开销
+profiler = page_profiler('onePixel')
+
+# 读取数据；数据目录正在更新时提示并停止本次运行
+with profiler.span('load_data') as span, stop_on_update():
+    version = refresher.version()
+    df = load_data(version)
+    hierarchy = load_hierarchy(version)
+    span.rows_out = len(df)
+
+# 后台加载新数据时在侧边栏提示
+show_status(refresher)
+
+# 显示各表在数据集服务中的内存占用
+with st.sidebar.expander('数据集内存占用'):
+    st.dataframe(datasets.memory_report(), hide_index=True)
+
+# 显示跨会话共享计算的命中、等待和计算次数
+with st.sidebar.expander('共享计算'):
+    st.dataframe(flight_report({'图表规格': load_chart_cache()}), hide_index=True)
+
+# 时间范围和图表：拖动滑块时只有这个片段重新运行
+@st.fragment
+def chart_panel(selection, profiler):
+    # 后台已切换数据版本时重新运行整个页面，不在片段中继续使用旧版本的数据和层级索引
+    if refresher.version() != version:
+        st.rerun(scope='app')
+
+    run_profiler = fragment_profiler(profiler)
+
+    # 时间范围选择，范围取自分区元数据；还没有KPI分区时不显示图表
+    with stop_on_update():
+        bounds = partition_date_bounds(directory, table2, version)
+    if bounds is None:
+        st.info('暂无KPI数据')
+        return
+    min_date, max_date = bounds
+    selected_date_range = st.slider('选择时间范围', min_value=min_date, max_value=max_date, value=(min_date, max_date))
+
+    # 时间粒度，默认按时间范围自动选择
+    choice = st.radio('时间粒度', ['自动'] + list(GRANULARITY_NAMES.values()), horizontal=True)
+    if choice == '自动':
+        granularity = choose_granularity(selected_date_range)
+        st.caption(f'按{GRANULARITY_NAMES[granularity]}汇总')
+    else:
+        granularity = {name: key for key, name in GRANULARITY_NAMES.items()}[choice]
+
+    # 图表规格按筛选条件、时间范围、粒度和数据版本缓存；未命中时取时间窗口内的计数器之和，计算比值并构建图表
+    key = fingerprint(selection, selected_date_range, granularity, version)
+
+    def build():
+        load_version_keys().add(version, load_chart_cache().discard, key)
+        with run_profiler.span('counter_sums') as span:
+            if granularity == 'day':
+                sums = window_sums(load_counter_sums(selection, version, window_partitions(selected_date_range, version)), selected_date_range)
+            else:
+                sums = load_period_sums(selection, selected_date_range, granularity, version)
+            span.rows_out = len(sums)
+        with run_profiler.span('kpis', rows_in=len(sums)) as span:
+            agg_df = evaluate_kpis(sums, kpi_names)
+            span.rows_out = len(agg_df)
+        return build_chart_specs(agg_df, run_profiler, TIME_FORMATS[granularity])
+
+    with run_profiler.span('chart_specs'), stop_on_update():
+        specs = load_chart_cache().get_or_build(key, build)
+
+    # 使用streamlit显示图表
+    with run_profiler.span('render'):
+        st.subheader('数据业务流量及性能指标')
+        st.vega_lite_chart(specs['chart_traffic'], use_container_width=True)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.vega_lite_chart(specs['chart_connection'], use_container_width=True)
+        with col2:
+            st.vega_lite_chart(specs['chart_drop'], use_container_width=True)
+        with col3:
+            st.vega_lite_chart(specs['chart_handover'], use_container_width=True)
+
+        st.subheader('VoNR语音话务量及性能指标')
+        st.vega_lite_chart(specs['chart_vonr_traffic'], use_container_width=True)
+
+        col4, col5, col6 = st.columns(3)
+        with col4:
+            st.vega_lite_chart(specs['chart_vonr_connection'], use_container_width=True)
+        with col5:
+            st.vega_lite_chart(specs['chart_vonr_drop'], use_container_width=True)
+        with col6:
+            st.vega_lite_chart(specs['chart_vonr_handover'], use_container_width=True)
+
+    if run_profiler is not profiler:
+        report(run_profiler, st)
+
+# 筛选项：改变选择时只有这个片段（及其中的图表片段）重新运行
+@st.fragment
+def filter_panel(profiler):
+    # 后台已切换数据版本时重新运行整个页面，不在片段中继续使用旧版本的数据和层级索引
+    if refresher.version() != version:
+        st.rerun(scope='app')
+
+    run_profiler = fragment_profiler(profiler)
+
+    # 每一级的选项由层级索引根据上级选择直接查出
+    with run_profiler.span('filter_options', rows_in=len(df)), st.container():
+        cols = st.columns(5)  # 创建五列布局
+
+        selection = {}
+        selection['工作频段'] = cols[0].selectbox('选择工作频段', ['全部'] + hierarchy.options('工作频段', selection))
+        selection['地市'] = cols[1].selectbox('选择地市', ['全部'] + hierarchy.options('地市', selection))
+        selection['县区'] = cols[2].selectbox('选择县区', ['全部'] + hierarchy.options('县区', selection))
+        selection['镇区'] = cols[3].selectbox('选择镇区', ['全部'] + hierarchy.options('镇区', selection))
+        selection['村区'] = cols[4].selectbox('选择村区', ['全部'] + hierarchy.options('村区', selection))
+
+    chart_panel(selection, run_profiler)
+
+    if run_profiler is not profiler:
+        report(run_profiler, st)
+
+filter_panel(profiler)
+
+# 显示本次运行的阶段耗时
+report(profiler)
@@ -1,25 +1,27 @@
-import os
 import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from scipy.interpolate import make_interp_spline
 import numpy as np
+from supermo.store import data_directory
+from supermo.datasets import dataset_service
+from supermo.kpi import evaluate_kpis
 
-# 定义数据目录和文件名
-Datadir = r'C:\Users\Administrator\Documents\MnewData'
-gdf_filename = 'gdf_RAC.csv'
-KPI_filename = 'df_KPI.csv'
+# 定义数据目录和表名
+Datadir = data_directory(r'C:\Users\Administrator\Documents\MnewData')
+gdf_table = 'gdf_RAC'
+KPI_table = 'df_KPI'
 
-# 构建文件路径
-file_path1 = os.path.join(Datadir, gdf_filename)
-file_path2 = os.path.join(Datadir, KPI_filename)
+# 进程内共享的只读数据集服务
+datasets = dataset_service(Datadir)
 
-@st.cache_data
+# 合并后的宽表在所有会话间共享一份，不再为每次调用复制
+@st.cache_resource
 def load_data():
-    # 读取CSV文件
-    gdf_RAC = pd.read_csv(file_path1, encoding='utf8')
-    df_KPI = pd.read_csv(file_path2, encoding='utf8')
+    # 读取列式表文件（共享列视图）
+    gdf_RAC = datasets.frame(gdf_table)
+    df_KPI = datasets.frame(KPI_table)
 
     # 将[开始时间]和[结束时间]列定义为日期格式
     df_KPI['开始时间'] = pd.to_datetime(df_KPI['开始时间'], errors='coerce')
@@ -34,7 +36,7 @@ def load_data():
     df_KPI['K1009_002'] = pd.to_numeric(df_KPI['K1009_002'], errors='coerce').fillna(0).round(2)
 
     # 合并数据框
-    merged_df = pd.merge(df_KPI, gdf_RAC, on='ID', how='left')
+    merged_df = pd.merge(df_KPI, gdf_RAC, on='cell_key', how='left')
 
     # 构建新的列顺序
     desired_columns = ['ID', '开始时间', '工作频段', '网元标识', '小区本地ID', '小区名称', 'Longitude', 'Latitude', '省份', '地市', '县区', '镇区', '村区']
@@ -47,12 +49,7 @@ def load_data():
     return merged_df
 
 def calculate_all_metrics(df):
-    df["最大RRC连接用户数"] = df["R1504_002"]
-    df["平均RRC连接用户数"] = df["R1504_001"] / df["R1504_029"]
-    df["下行PDCP层业务流量"] = df["R2032_012"] / 1000 / 1000
-    df["上行PDCP层业务流量"] = df["R2032_001"] / 1000 / 1000
-    df["总流量"] = (df["R1012_001"] + df["R1012_002"]) / 1000000
-    return df
+    return evaluate_kpis(df, ['最大RRC连接用户数', '平均RRC连接用户数', '下行PDCP层业务流量', '上行PDCP层业务流量', '总流量'], decimals=None)
 
 def custom_grouping(df):
     # 按时间分组，统计不重复的['网元标识']和['小区名称']的数量
@@ -69,7 +66,7 @@ st.title("KPI Data Analysis")
 # 加载数据
 data_load_state = st.text('Loading data...')
 merged_df = load_data()
-data_load_state.text("Done! (using st.cache_data)")
+data_load_state.text("Done! (using st.cache_resource)")
 
 # 提取并打印列名列表
 list1 = merged_df.columns.to_list()
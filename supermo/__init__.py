@@ -0,0 +1,4 @@
+"""SuperMo 数据处理与看板共享模块。
+
+Data_org_v1 等整理脚本通过本包写出数据，pages 下的看板页面通过本包读取数据。
+"""
@@ -0,0 +1,131 @@
+"""村级边界的二进制多分辨率存储。
+
+湖北省村级边界.geojson 只在文件变化时解析一次，转换为 GeoParquet（WKB 几何）保存在
+输出目录的 boundaries/ 下：full 为原始精度的村级边界，供空间连接使用；
+省份、地市、县区、村区各一份按层级合并并预先简化的边界，供地图按缩放级别读取。
+各层独立成文件，读取时只加载需要的分辨率和列。
+"""
+import json
+import os
+
+import geopandas as gpd
+
+BOUNDARY_DIR = 'boundaries'
+SOURCE_META = '_source.json'
+FULL = 'full'
+
+# 边界文件字段到区域层级的映射
+REGION_FIELDS = {'SJGZQYMC': '省份', 'DSJGZQYMC': '地市', 'QXJGZQYMC': '县区', 'XZJGZQYMC': '镇区', 'CJGZQYMC': '村区'}
+REGIONS = list(REGION_FIELDS.values())
+
+# 各缩放级别的简化容差（度，EPSG:4326 下 0.001 度约 100 米）
+LAYERS = {
+    '省份': 0.01,
+    '地市': 0.003,
+    '县区': 0.001,
+    '村区': 0.0002,
+}
+
+
+def source_signature(path):
+    """边界文件的大小和修改时间，用于判断存储是否过期。"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def boundary_path(directory, layer=FULL):
+    """边界层文件路径。"""
+    return os.path.join(directory, BOUNDARY_DIR, f'{layer}.parquet')
+
+
+def read_source_signature(directory):
+    """读取存储对应的边界文件签名，不存在时返回 None。"""
+    path = os.path.join(directory, BOUNDARY_DIR, SOURCE_META)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['source']
+
+
+def dissolve_levels(boundaries):
+    """
+    逐级合并村级边界：每一级由下一级合并得到，避免每层都从村级多边形重新合并。
+
+    村级边界互不重叠，先按覆盖（coverage）方式快速合并；结果存在无效几何时
+    （边界数据有重叠）再用一般的 union 重新合并该级。
+
+    返回值:
+    dict: {层级: 未简化的 GeoDataFrame}，包含该层级及以上的区域列。
+    """
+    dissolved = {REGIONS[-1]: boundaries}
+    finer = boundaries
+    for level in reversed(REGIONS[:-1]):
+        columns = REGIONS[:REGIONS.index(level) + 1]
+        layer = finer[columns + ['geometry']]
+        merged = layer.dissolve(by=columns, as_index=False, method='coverage')
+        if not merged.geometry.is_valid.all():
+            merged = layer.dissolve(by=columns, as_index=False)
+        finer = merged
+        dissolved[level] = finer
+    return dissolved
+
+
+def simplify_layer(layer, tolerance):
+    """简化一层边界。"""
+    layer = layer.copy()
+    layer['geometry'] = layer.geometry.simplify(tolerance, preserve_topology=True)
+    return layer
+
+
+def build_boundary_store(path, directory):
+    """
+    解析边界 GeoJSON，写入原始精度层和各缩放级别的简化层。
+
+    参数:
+    path (str): 边界 GeoJSON 文件路径。
+    directory (str): 输出目录。
+
+    返回值:
+    dict: 每层的多边形数量。
+    """
+    boundaries = gpd.read_file(path)
+    boundaries = boundaries[list(REGION_FIELDS) + ['geometry']].rename(columns=REGION_FIELDS)
+    os.makedirs(os.path.join(directory, BOUNDARY_DIR), exist_ok=True)
+
+    dissolved = dissolve_levels(boundaries)
+    layers = {FULL: boundaries}
+    for level, tolerance in LAYERS.items():
+        layers[level] = simplify_layer(dissolved[level], tolerance)
+    for layer, gdf in layers.items():
+        gdf.to_parquet(boundary_path(directory, layer), index=False)
+
+    with open(os.path.join(directory, BOUNDARY_DIR, SOURCE_META), 'w', encoding='utf-8') as f:
+        json.dump({'source': source_signature(path)}, f)
+    return {layer: len(gdf) for layer, gdf in layers.items()}
+
+
+def ensure_boundary_store(path, directory):
+    """边界文件未转换或已变化时重新转换，返回当前边界文件签名。"""
+    signature = source_signature(path)
+    if read_source_signature(directory) != signature:
+        rows = build_boundary_store(path, directory)
+        print(f"Boundary store rebuilt ({rows})")
+    return signature
+
+
+def load_boundaries(directory, layer=FULL, columns=None, filters=None):
+    """
+    读取一层边界。
+
+    参数:
+    directory (str): 输出目录。
+    layer (str): FULL 或 LAYERS 中的层级。
+    columns (list): 需要的区域列，几何列总会读取。
+    filters (list): pyarrow 行过滤条件，例如 [('地市', '==', '武汉市')]。
+
+    返回值:
+    gpd.GeoDataFrame: 边界及其区域列。
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ['geometry']))
+    return gpd.read_parquet(boundary_path(directory, layer), columns=columns, filters=filters)
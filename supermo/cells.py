@@ -0,0 +1,91 @@
+"""小区维表与整数代理键。
+
+数据整理时为每个小区ID（'NB_nrCellCfg'）分配稠密整数键 cell_key，
+df_KPI 只保存 cell_key，页面用整数数组索引代替字符串ID的哈希合并。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from supermo.store import load_table, table_path
+
+KEY = 'cell_key'
+DIM_NAME = 'dim_cell'
+ID_COLUMNS = ['ID', 'NB', 'nrCellCfg']
+
+
+def load_cell_dimension(directory):
+    """读取已有的小区维表，不存在时返回 None。"""
+    if not os.path.exists(table_path(directory, DIM_NAME)):
+        return None
+    return load_table(directory, DIM_NAME)
+
+
+def build_cell_dimension(*ids, existing=None):
+    """
+    构建小区维表。
+
+    已有维表中的小区保持原来的键，新出现的小区ID按出现顺序追加新键，
+    保证增量整理时键值稳定。
+
+    参数:
+    *ids (pd.Series): 一个或多个小区ID序列。
+    existing (pd.DataFrame): 已有的小区维表，可为 None。
+
+    返回值:
+    pd.DataFrame: 小区维表，包含 cell_key、ID、NB、nrCellCfg，按 cell_key 排序且 cell_key 等于行号。
+    """
+    known = existing['ID'].astype(str) if existing is not None else pd.Series([], dtype=object)
+    candidates = pd.unique(pd.concat([pd.Series(s, dtype=object).dropna().astype(str) for s in ids], ignore_index=True))
+    new_ids = pd.Index(candidates).difference(pd.Index(known), sort=False)
+    all_ids = pd.concat([known, pd.Series(new_ids, dtype=object)], ignore_index=True)
+
+    dim = pd.DataFrame({KEY: np.arange(len(all_ids), dtype=np.int32), 'ID': all_ids.to_numpy()})
+    parts = dim['ID'].str.split('_', n=1, expand=True).reindex(columns=[0, 1])
+    dim['NB'] = parts[0]
+    dim['nrCellCfg'] = parts[1]
+    return dim
+
+
+def cell_keys(dim, ids):
+    """将小区ID序列映射为 cell_key 数组，未知ID为 -1。"""
+    return pd.Index(dim['ID']).get_indexer(pd.Series(ids, dtype=object).astype(str)).astype(np.int32)
+
+
+def to_fact(df, dim):
+    """为 df_KPI 添加 cell_key 并去掉字符串ID列，cell_key 放在第一列。"""
+    keys = cell_keys(dim, df['ID'])
+    df = df.drop(columns=[col for col in ID_COLUMNS if col in df.columns])
+    df.insert(0, KEY, keys)
+    return df
+
+
+def take_cells(kpi, keys, how='inner'):
+    """
+    按所选小区的 cell_key 筛选 KPI 行。
+
+    结果与 pd.merge(kpi, 所选小区行, on=KEY, how=how) 的行一致：
+    同一小区在所选行中出现多次时，其KPI行重复相应次数；how='left' 时保留未匹配的KPI行。
+    cell_key 为 -1（小区维表中没有的ID）的KPI行不会被任何小区选中。
+
+    参数:
+    kpi (pd.DataFrame): 包含 cell_key 列的KPI数据。
+    keys (np.ndarray): 所选小区行的 cell_key。
+    how (str): 'inner' 或 'left'。
+
+    返回值:
+    pd.DataFrame: 筛选后的KPI数据。
+    """
+    kpi_keys = kpi[KEY].to_numpy()
+    keys = np.asarray(keys, dtype=np.int64)
+    keys = keys[keys >= 0]
+    size = int(max(kpi_keys.max(initial=-1), keys.max(initial=-1))) + 1
+    weight = np.bincount(keys, minlength=size)[kpi_keys]
+    # 不在小区维表中的KPI行（cell_key 为 -1）不属于任何小区；不能按 -1 取到最后一个小区的计数
+    weight[kpi_keys < 0] = 0
+    if how == 'left':
+        weight = np.maximum(weight, 1)
+    if weight.max(initial=0) <= 1:
+        return kpi[weight.astype(bool)]
+    return kpi.take(np.repeat(np.arange(len(kpi)), weight))
@@ -0,0 +1,100 @@
+"""已序列化图表规格的 LRU 缓存。
+
+页面按筛选条件、时间范围和数据版本的指纹缓存 Vega-Lite 规格（chart.to_dict() 的结果），
+命中时直接渲染，不再聚合数据和构建 Altair 图层。缓存按最近使用顺序淘汰，
+总大小（规格序列化为 JSON 后的字节数）不超过 max_bytes。
+未命中时的构建经 SingleFlight 合并：多个会话同时请求同一个指纹时只构建一次，
+同时进行的构建数不超过 max_workers。
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from supermo.singleflight import SingleFlight
+
+
+def fingerprint(*parts):
+    """根据筛选条件等参数计算缓存键；字典按键排序，保证同样的条件得到同样的键。"""
+    normalized = [sorted(part.items()) if isinstance(part, dict) else part for part in parts]
+    return hashlib.sha1(repr(normalized).encode('utf-8')).hexdigest()
+
+
+def spec_size(specs):
+    """规格序列化为 JSON 后的字节数。"""
+    return len(json.dumps(specs, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+class ChartSpecCache:
+    """
+    图表规格 LRU 缓存，可在多个会话间共享。
+
+    参数:
+    max_bytes (int): 缓存总大小上限。
+    max_entries (int): 缓存条目数上限，None 表示只按大小限制。
+    max_workers (int): 同时构建规格的会话数上限，None 表示不限制。
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=None, max_workers=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.flight = SingleFlight(max_workers)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回缓存的规格并标记为最近使用；不存在时返回 None。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, specs):
+        """缓存规格，超出上限时淘汰最久未使用的条目；单个规格超过 max_bytes 时不缓存。"""
+        size = spec_size(specs)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return specs
+            self._entries[key] = (specs, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+        return specs
+
+    def get_or_build(self, key, build):
+        """命中时返回缓存的规格，否则调用 build() 生成并缓存；多个会话同时请求同一个键时只调用一次 build()。"""
+        specs = self.get(key)
+        if specs is None:
+            specs = self.flight.run(key, lambda: self._build(key, build))
+        return specs
+
+    def _build(self, key, build):
+        # 排队期间其他会话可能已经构建并缓存了同一个键
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else self.put(key, build())
+
+    def discard(self, key):
+        """删除一个条目，不存在时不做任何事。"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def clear(self):
+        """清空缓存（数据版本切换后旧版本的规格不会再命中）。"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,103 @@
+"""网管导出报表的逐文件清洗。
+
+这些函数在 read_and_process_files 的子进程中对单个文件执行，
+返回已转换好类型的 DataFrame，主进程合并后无需再做清洗。
+"""
+import re
+
+import pandas as pd
+
+from supermo.dn import parse_dn
+from supermo.schema import apply_schema
+
+KPI_ID_COLUMNS = ['ID', 'NB', 'nrCellCfg', '开始时间']
+BBU_POWER_COLUMNS = ['BBU名称', 'NB', '站型', '开始时间', 'BBU功耗[千瓦时]',
+                     'gNB基站CPU平均负荷(R1056_001)[%]', 'gNB基站CPU峰值负荷(R1056_002)[%]', 'BBU功耗(R1054_001)[W]']
+RRU_POWER_COLUMNS = ['NB', 'RRUID', '开始时间', 'AAU功耗[千瓦时]']
+
+
+def parse_dates(values):
+    """取每个值的日期部分（第一个空格之前）转换为日期，无法解析的值为空值。"""
+    return pd.to_datetime(values.astype(str).str.split().str[0], errors='coerce').dt.date
+
+
+def process_df_kpi(df):
+    """清洗 DT_PowerBI指标通报计数器 报表：生成小区ID，列名取括号中的计数器编号，并把日期和计数器转换为登记的紧凑类型。"""
+    # 提取 NB 和 nrCellCfg 并创建 ID 列
+    dn = parse_dn(df['对象'], ['gNB', 'nrCellCfg'], numeric=False)
+    df['NB'] = dn['gNB']
+    df['nrCellCfg'] = dn['nrCellCfg']
+    df['ID'] = df['NB'] + '_' + df['nrCellCfg']
+
+    # 重新排列列顺序
+    new_order = ['ID', 'NB', 'nrCellCfg'] + [col for col in df.columns if col not in ['ID', 'NB', 'nrCellCfg']]
+    df = df[new_order].copy()  # 使用 .copy() 创建一个新的 DataFrame 副本
+
+    # 提取括号中的内容作为新的列名
+    df.columns = [re.search(r'\((.*?)\)', col).group(1) if re.search(r'\((.*?)\)', col) else col for col in df.columns]
+
+    # 删除指定的列
+    columns_to_drop = ['对象', 'Nr小区工作频段', 'MHz', '逻辑小区id']
+    df.drop(columns=columns_to_drop, inplace=True)
+
+    # 转换开始时间和结束时间为日期格式
+    df.loc[:, '开始时间'] = pd.to_datetime(df['开始时间']).dt.date
+    df.loc[:, '结束时间'] = pd.to_datetime(df['结束时间']).dt.date
+
+    # 将 R 开头的列转换为整数类型
+    r_columns = [col for col in df.columns if col.startswith('R')]
+    df[r_columns] = df[r_columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+
+    # 将 K 开头的列转换为带两位小数的浮点类型
+    k_columns = [col for col in df.columns if col.startswith('K')]
+    df[k_columns] = df[k_columns].apply(pd.to_numeric, errors='coerce').fillna(0).round(2)
+
+    # 计数器按登记类型收窄（uint32 / float32，超出范围时保留宽类型），减少传回主进程和合并时的内存
+    df = apply_schema(df, 'df_KPI')
+
+    # 检查并删除重复数据
+    df = df.drop_duplicates()
+
+    return df
+
+
+def process_bbu_power(df_bup):
+    """清洗 DT_BBU功耗 报表：提取 BBU名称、NB 和站型，并转换功耗、负荷和日期类型。"""
+    # 从 '对象' 字段中提取 'BBU名称' 和 'NB'
+    dn = parse_dn(df_bup['对象'], ['BBU名称', 'gNB'], numeric=False)
+    df_bup['BBU名称'] = dn['BBU名称']
+    df_bup['NB'] = dn['gNB']
+
+    # 根据 BBU名称 确定 站型
+    df_bup['站型'] = df_bup['BBU名称'].apply(lambda x: '宏站' if 'D5H' in x else ('微站' if 'D5M' in x else ('室分' if 'D5S' in x else '未知')))
+
+    # 将指定列转换为整数
+    int_columns = ['gNB基站CPU平均负荷(R1056_001)[%]', 'gNB基站CPU峰值负荷(R1056_002)[%]']
+    df_bup[int_columns] = df_bup[int_columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
+
+    # 将 '开始时间' 转换为日期格式，无法解析的日期记为空值
+    df_bup['开始时间'] = parse_dates(df_bup['开始时间'])
+
+    # 将指定列转换为浮点数并保留四位小数
+    float_columns = ['BBU功耗[千瓦时]', 'BBU功耗(R1054_001)[W]']
+    df_bup[float_columns] = df_bup[float_columns].apply(lambda x: pd.to_numeric(x, errors='coerce').fillna(0).round(4))
+
+    # 按指定列表提取数据，删除日期无法解析的行（同一文件中的其他行照常保留）
+    return df_bup.loc[df_bup['开始时间'].notna(), BBU_POWER_COLUMNS]
+
+
+def process_rru_power(df_rup):
+    """清洗 DT_RRU功耗 报表：提取 NB 和 RRUID，并转换功耗和日期类型。"""
+    # 从 '对象' 字段中提取 NB 和 RRUID
+    dn = parse_dn(df_rup['对象'], ['gNB', 'invRRU'], numeric=False)
+    df_rup['NB'] = dn['gNB']
+    df_rup['RRUID'] = dn['invRRU']
+
+    # 将 'AAU功耗[千瓦时]' 列转换为浮点数并保留四位小数
+    df_rup['AAU功耗[千瓦时]'] = pd.to_numeric(df_rup['AAU功耗[千瓦时]'], errors='coerce').round(4).fillna(0)
+
+    # 将 '开始时间' 列转换为日期格式，无法解析的日期记为空值
+    df_rup['开始时间'] = parse_dates(df_rup['开始时间'])
+
+    # 按指定列表提取数据，删除日期无法解析的行（同一文件中的其他行照常保留）
+    return df_rup.loc[df_rup['开始时间'].notna(), RRU_POWER_COLUMNS]
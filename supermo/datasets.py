@@ -0,0 +1,145 @@
+"""进程内共享的只读数据集服务。
+
+各页面不再各自用 st.cache_data 读取并缓存表（st.cache_data 每次返回一份反序列化的副本），
+而是通过 dataset_service(directory) 取得同一个进程级服务：每张表的每一列只读取一次，
+页面拿到的是共享底层数组的列视图，不复制数据。列读入内存后即关闭文件（不使用内存映射，
+Data_org_v1 可以随时替换表文件），数值、日期等定长列的数组被设为只读，
+页面对返回的 DataFrame 赋值时 pandas 会另行复制，不会改动共享数据
+（pandas 的部分内部函数要求字符串等 object 列可写，这些列只约定只读）。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from supermo.store import VersionMismatch, load_table, versioned
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def dataset_service(directory):
+    """返回 directory 对应的进程级数据集服务，首次调用时创建。"""
+    with _services_lock:
+        service = _services.get(directory)
+        if service is None:
+            service = _services[directory] = DatasetService(directory)
+        return service
+
+
+def _freeze(series):
+    """将定长列的底层数组设为只读。"""
+    values = series.values
+    if isinstance(values, np.ndarray) and values.dtype != object and values.flags.writeable:
+        values.flags.writeable = False
+    return series
+
+
+class _VersionColumns:
+    """一个数据版本已加载的列。"""
+
+    def __init__(self):
+        self.columns = {}  # 表名 -> {列名: Series}
+        self.complete = set()  # 已读取全部列的表
+        self.nbytes = {}  # (表名, 列名) -> 内存占用，加载时计算一次
+        self.lock = threading.Lock()
+
+
+class DatasetService:
+    """
+    按列惰性加载、进程内共享的只读表。
+
+    每个数据版本的列分开保存，后台预热新版本时页面仍可读取旧版本；
+    旧版本由 retire 释放，或在版本数超过 max_versions 时按创建顺序释放最早的版本。
+    读取时检查数据目录的版本（见 supermo.store.versioned），目录正在写出或已不是所请求的版本时
+    抛出 VersionMismatch，不会把新文件中的列登记到旧版本下。
+
+    参数:
+    directory (str): 数据目录。
+    max_versions (int): 同时保留的数据版本数。
+    """
+
+    def __init__(self, directory, max_versions=2):
+        self.directory = directory
+        self.max_versions = max_versions
+        self._versions = OrderedDict()  # 数据版本 -> _VersionColumns
+        self._lock = threading.Lock()
+
+    def _store(self, version):
+        """返回数据版本 version 的列，首次使用时创建，超出 max_versions 时释放最早的版本。"""
+        with self._lock:
+            store = self._versions.get(version)
+            if store is None:
+                store = self._versions[version] = _VersionColumns()
+                while len(self._versions) > self.max_versions:
+                    self._versions.popitem(last=False)
+            return store
+
+    def _ensure(self, name, columns, version):
+        """读取数据版本 version 中 name 尚未加载的列；只锁定该版本，读取新版本时不影响旧版本的读者。"""
+        store = self._store(version)
+        with store.lock:
+            loaded = store.columns.setdefault(name, {})
+            frame = None
+            if columns is None:
+                if name not in store.complete:
+                    with versioned(self.directory, version):
+                        frame = load_table(self.directory, name)
+                    store.complete.add(name)
+            else:
+                missing = [column for column in columns if column not in loaded]
+                if missing:
+                    with versioned(self.directory, version):
+                        frame = load_table(self.directory, name, columns=missing)
+            if frame is not None:
+                for column in frame.columns:
+                    if column not in loaded:
+                        loaded[column] = _freeze(frame[column])
+                        store.nbytes[name, column] = loaded[column].memory_usage(index=False, deep=True)
+            return loaded
+
+    def frame(self, name, columns=None, version=None):
+        """
+        返回表的列视图。
+
+        参数:
+        name (str): 表名。
+        columns (list): 需要的列，默认整张表。
+        version (str): 数据版本（见 supermo.store.dataset_version），不同版本的列分别读取；
+            为 None 时不检查版本。
+
+        返回值:
+        pd.DataFrame: 与服务共享底层数组的 DataFrame，列顺序与 columns 一致。
+        """
+        loaded = self._ensure(name, columns, version)
+        columns = list(dict.fromkeys(columns)) if columns is not None else list(loaded)
+        # 分次读取的列行数不同说明读自不同的数据版本，不能按索引对齐后拼成一张表
+        lengths = {len(loaded[column]) for column in columns}
+        if len(lengths) > 1:
+            raise VersionMismatch(f'{self.directory}: {name} 的列读自不同的数据版本，行数为 {sorted(lengths)}')
+        return pd.DataFrame({column: loaded[column] for column in columns}, copy=False)
+
+    def retire(self, version):
+        """释放数据版本 version 已加载的列；页面仍持有的 DataFrame 不受影响。"""
+        with self._lock:
+            self._versions.pop(version, None)
+
+    def memory_report(self):
+        """
+        各版本各表已加载的行数、列数和内存占用。
+
+        返回值:
+        pd.DataFrame: 版本、表、行数、列数、内存(MB)。
+        """
+        with self._lock:
+            versions = list(self._versions.items())
+        rows = []
+        for version, store in versions:
+            # 不等待正在进行的读取，只统计已加载完的列
+            for name, loaded in list(store.columns.items()):
+                loaded = dict(loaded)
+                nbytes = sum(store.nbytes.get((name, column), 0) for column in loaded)
+                rows.append({'版本': version, '表': name, '行数': len(next(iter(loaded.values()))) if loaded else 0,
+                             '列数': len(loaded), '内存(MB)': round(nbytes / 1024 / 1024, 2)})
+        return pd.DataFrame(rows, columns=['版本', '表', '行数', '列数', '内存(MB)'])
@@ -0,0 +1,43 @@
+"""网管报表 '对象' 字段（DN）的向量化解析。
+
+'对象' 形如 'BBU名称(gNB=123,nrCellCfg=1)' 或 'BBU名称(gNB=123,invRRU=2)'，
+同一个对象在多日报表中反复出现，因此先对列做 factorize，只在去重后的取值上
+执行一次 str.extract，再按编码取回各行，代替逐行 re.match。
+"""
+import pandas as pd
+
+DN_FIELDS = ['BBU名称', 'gNB', 'nrCellCfg', 'invRRU']
+NUMERIC_FIELDS = ['gNB', 'nrCellCfg', 'invRRU']
+
+# 'BBU名称(gNB=…[,nrCellCfg=…][,invRRU=…])'，一次 extract 取出全部字段，报表中没有的字段为空
+DN_PATTERN = (
+    r'^(?P<BBU名称>.*?)\(gNB=(?P<gNB>\d+)'
+    r'(?:,nrCellCfg=(?P<nrCellCfg>\d+))?'
+    r'(?:,invRRU=(?P<invRRU>\d+))?'
+)
+
+
+def parse_dn(values, fields=None, numeric=True):
+    """
+    解析 '对象' 列。
+
+    参数:
+    values (pd.Series): '对象' 列。
+    fields (list): 需要返回的字段，默认 DN_FIELDS 全部字段。
+    numeric (bool): 为 True 时 gNB、nrCellCfg、invRRU 返回 Int32（可空）整数列，
+        为 False 时保留数字字符串，便于与以字符串为键的表合并。
+
+    返回值:
+    pd.DataFrame: 与 values 同索引、每个字段一列；无法解析的字段为空值。
+    """
+    fields = fields or DN_FIELDS
+    codes, uniques = pd.factorize(values)
+    parsed = pd.Series(uniques, dtype=object).str.extract(DN_PATTERN)[fields]
+    for field in fields:
+        if field in NUMERIC_FIELDS and numeric:
+            parsed[field] = pd.to_numeric(parsed[field]).astype('Int32')
+    # 缺失值的编码为 -1，在末尾追加一行空值供其取用
+    parsed = pd.concat([parsed, parsed.iloc[:0].reindex([len(parsed)])])
+    result = parsed.take(codes)
+    result.index = values.index
+    return result
@@ -0,0 +1,72 @@
+"""趋势图的服务端降采样。
+
+Altair 会把图表数据整体以 JSON 嵌入页面，长时间范围的小时粒度数据点数很多，
+绘图前用 Largest-Triangle-Three-Buckets（LTTB）把每张图的点数限制在 max_points 以内，
+并始终保留每个指标的最大值和最小值所在的行，保证图上标注的极值点仍在曲线上。
+"""
+import numpy as np
+
+# 每张趋势图的默认点数上限
+MAX_POINTS = 1000
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样。
+
+    参数:
+    x (np.ndarray): 单调递增的横坐标（数值）。
+    y (np.ndarray): 纵坐标。
+    threshold (int): 保留的点数，至少为 3。
+
+    返回值:
+    np.ndarray: 保留点的位置，升序，包含首尾两点。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    x = np.asarray(x, dtype=float)
+
+    # 除首尾两点外，其余点均分为 threshold - 2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一个桶的平均点作为三角形的第三个顶点
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(df, x_field, y_fields, max_points=MAX_POINTS):
+    """
+    对趋势图数据降采样。
+
+    参数:
+    df (pd.DataFrame): 按 x_field 排序的图表数据。
+    x_field (str): 横坐标列（时间或数值）。
+    y_fields (str | list): 一个或多个纵坐标列；多个指标共用一张图时取各自保留点的并集。
+    max_points (int): 每个指标保留的点数上限，None 表示不降采样。
+
+    返回值:
+    pd.DataFrame: 保留的行，顺序不变；各指标的最大值和最小值所在行总会保留。
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    y_fields = [y_fields] if isinstance(y_fields, str) else list(y_fields)
+    x = df[x_field].to_numpy()
+    x = x.astype('datetime64[ns]').astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) or x.dtype == object else x
+
+    keep = []
+    for field in y_fields:
+        y = df[field].to_numpy(dtype=float)
+        keep.append(lttb_indices(x, y, max_points))
+        if not np.isnan(y).all():
+            keep.append([np.nanargmax(y), np.nanargmin(y)])
+    return df.iloc[np.unique(np.concatenate(keep))]
@@ -0,0 +1,70 @@
+"""级联筛选框的层级索引。
+
+对工作频段/地市/县区/镇区/村区等层级的每一种“已选/全部”组合预先分组，
+任意部分选择下的下级选项和对应的小区行号都可以通过一次字典查找得到，
+不必每次重新对 gdf_RAC 做布尔掩码扫描。
+"""
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from supermo.rollup import ALL
+
+
+class HierarchyIndex:
+    """
+    层级筛选索引。
+
+    参数:
+    df (pd.DataFrame): 小区数据，每行一个小区（或小区-RRU）。
+    levels (list): 由上到下的层级列名。
+    id_column (str): 小区ID列名。
+    """
+
+    def __init__(self, df, levels, id_column='ID'):
+        self.levels = list(levels)
+        self.size = len(df)
+        self._ids = df[id_column].to_numpy()
+        self._rows = {}
+        self._options = {}
+
+        n = len(self.levels)
+        values = [df[level].to_numpy() for level in self.levels]
+        for mask in product((False, True), repeat=n):
+            fixed = [level for level, used in zip(self.levels, mask) if used]
+            if fixed:
+                groups = df.groupby(fixed, sort=False, observed=True).indices
+            else:
+                groups = {(): np.arange(self.size)}
+            for key, rows in groups.items():
+                key = key if isinstance(key, tuple) else (key,)
+                it = iter(key)
+                self._rows[tuple(next(it) if used else ALL for used in mask)] = rows
+
+        # 每个层级在上级任意选择下的可选项，保持数据中的出现顺序
+        for i in range(n):
+            for key, rows in self._rows.items():
+                if all(v == ALL for v in key[i:]):
+                    self._options[(i, key[:i])] = pd.unique(values[i][rows]).tolist()
+
+    def key(self, selection):
+        """将选择字典转换为索引键，未选择的层级为 '全部'。"""
+        return tuple(selection.get(level, ALL) for level in self.levels)
+
+    def options(self, level, selection):
+        """返回在上级层级的选择下，某一层级的可选项列表。"""
+        i = self.levels.index(level)
+        return self._options.get((i, self.key(selection)[:i]), [])
+
+    def rows(self, selection):
+        """返回与选择匹配的行号数组。"""
+        return self._rows.get(self.key(selection), np.empty(0, dtype=np.intp))
+
+    def ids(self, selection):
+        """返回与选择匹配的小区ID数组（去重）。"""
+        return pd.unique(self._ids[self.rows(selection)])
+
+    def is_filtered(self, selection):
+        """是否选择了任一层级。"""
+        return any(v != ALL for v in self.key(selection))
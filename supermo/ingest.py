@@ -0,0 +1,96 @@
+"""源 CSV 文件的读取与合并。
+
+文件较多时用进程池并行解析，逐文件的清洗（列重命名、类型转换）也在子进程中完成，
+主进程只负责合并已转换好类型的结果。传给 process 的清洗函数必须定义在模块顶层
+（如 supermo.cleaning 中的函数），以便 Windows 下的子进程能够导入。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from supermo.schema import apply_schema, fill_counters
+
+NA_VALUES = ["n/a", "na", "-"]
+
+
+def list_csv_files(directory, keyword, extension='.csv'):
+    """List CSV files in the specified directory that contain the keyword, case-insensitively."""
+    return [file for file in os.listdir(directory) if keyword.lower() in file.lower() and file.lower().endswith(extension)]
+
+
+def read_csv_file(file_path, columns=None, encoding='gbk', process=None):
+    """
+    读取并清洗单个 CSV 文件，供进程池调用。
+
+    参数:
+    file_path (str): 文件路径。
+    columns (list): 需要读取的列；为空时按网管报表格式跳过前两行表头说明。
+    encoding (str): 文件编码。
+    process (callable): 逐文件清洗函数，为空时只去掉列名中的空格。
+
+    返回值:
+    tuple: (DataFrame, None)；读取或清洗失败时为 (None, 错误信息)。
+    """
+    try:
+        df = pd.read_csv(file_path, encoding=encoding, usecols=columns, na_values=NA_VALUES) if columns else pd.read_csv(file_path, encoding=encoding, skiprows=2, header=0, na_values=NA_VALUES)
+        df.columns = df.columns.str.replace(' ', '')
+        if process is not None:
+            df = process(df)
+        return df, None
+    except Exception as e:
+        return None, str(e)
+
+
+def read_csv_files(paths, columns=None, encoding='gbk', process=None, workers=None):
+    """
+    读取多个 CSV 文件，文件多于一个时使用进程池并行解析。
+
+    参数:
+    paths (list): 文件路径列表。
+    columns, encoding, process: 同 read_csv_file。
+    workers (int): 进程数，默认取 CPU 核数与文件数的较小值；为 1 时在当前进程中顺序读取。
+
+    返回值:
+    list: 与 paths 顺序一致的 (路径, DataFrame, 错误信息) 列表。
+    """
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    n = len(paths)
+    if workers <= 1:
+        results = [read_csv_file(path, columns, encoding, process) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(read_csv_file, paths, [columns] * n, [encoding] * n, [process] * n))
+    return [(path, df, error) for path, (df, error) in zip(paths, results)]
+
+
+def read_and_process_files(directory, keyword, columns=None, encoding='gbk', manifest=None, process=None, workers=None, extension='.csv', name=None):
+    """
+    Read and process CSV files, returning a concatenated DataFrame.
+
+    When a FileManifest is given, only files that are not yet in the manifest are read,
+    and every file read successfully is registered with it. Files are parsed across a
+    process pool; process is applied to each file inside the workers.
+
+    When name is a registered table (e.g. 'df_KPI'), counters missing from some of the
+    files are filled with 0 after the concat and the columns are converted to their
+    registered types again.
+    """
+    files = list_csv_files(directory, keyword, extension)
+    paths = [os.path.join(directory, file) for file in files]
+    if manifest is not None:
+        paths = manifest.new_files(paths)
+    dfs = []
+    for file_path, df, error in read_csv_files(paths, columns, encoding, process, workers):
+        if error is not None:
+            print(f"Error reading file {os.path.basename(file_path)}: {error}")
+            continue
+        dfs.append(df)
+        if manifest is not None:
+            manifest.add(file_path)
+    if not dfs:
+        return pd.DataFrame()
+    df = pd.concat(dfs, ignore_index=True)
+    if name is not None:
+        df = apply_schema(fill_counters(df, name), name)
+    return df.drop_duplicates()
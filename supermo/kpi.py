@@ -0,0 +1,103 @@
+"""声明式 KPI 公式。
+
+每个 KPI 写成计数器（R、K 开头的列）的表达式，引擎据此推导需要读取的最小计数器集合，
+一次分组求和后批量计算所有比值。新增 KPI 只需在 KPIS 中登记，不会多读无关列。
+"""
+import re
+from typing import NamedTuple
+
+from supermo.schema import widen
+
+COUNTER_PATTERN = re.compile(r'\b[RK]\d{4}_\d{3}\b')
+
+
+class KPI(NamedTuple):
+    """KPI 定义：计数器表达式和显示单位。"""
+    expression: str
+    unit: str = ''
+
+
+KPIS = {
+    # 业务量
+    '数据业务流量': KPI('(R1012_001 + R1012_002) / 1000000000', 'TB'),
+    'VoNR语音话务量': KPI('(K1009_001 / 4) / 1000', '千Erl'),
+    # 数据业务性能
+    '无线接通率': KPI('(R1001_012 / R1001_001) * (R1034_012 / R1034_001) * (R1039_002 / R1039_001) * 100', '%'),
+    '无线掉线率': KPI('100 * ((R2004_003 - R2004_004) / (R2004_003 + R2004_006))', '%'),
+    '系统内切换成功率': KPI('100 * ((R2007_002 + R2007_004 + R2006_004 + R2006_008 + R2005_004 + R2005_008)'
+                    ' / (R2007_001 + R2007_003 + R2006_001 + R2006_005 + R2005_001 + R2005_005))', '%'),
+    # VoNR 语音性能
+    'VoNR无线接通率': KPI('100 * (R1034_013 / R1034_002) * (R1001_018 + R1001_015) / (R1001_007 + R1001_004)', '%'),
+    'VoNR语音掉线率': KPI('100 * ((R2035_003 - R2035_013) / (R2035_003 + R2035_026))', '%'),
+    'VoNR系统内切换成功率': KPI('100 * (R2005_063 + R2005_067 + R2006_071 + R2006_075 + R2007_036 + R2007_040)'
+                        ' / (R2005_060 + R2005_064 + R2006_068 + R2006_072 + R2007_033 + R2007_037)', '%'),
+    # 用户数与 PDCP 流量
+    '最大RRC连接用户数': KPI('R1504_002'),
+    '平均RRC连接用户数': KPI('R1504_001 / R1504_029'),
+    '下行PDCP层业务流量': KPI('R2032_012 / 1000 / 1000'),
+    '上行PDCP层业务流量': KPI('R2032_001 / 1000 / 1000'),
+    '总流量': KPI('(R1012_001 + R1012_002) / 1000000', 'MB'),
+}
+
+# Data_org_v1 中按基站汇总的业务量，流量以百万为单位
+BBU_TRAFFIC_KPIS = {
+    '数据业务流量': KPI('(R1012_001 + R1012_002) / 1000000', 'MB'),
+    'VoNR语音话务量': KPI('K1009_001 / 4', 'Erl'),
+}
+
+
+def resolve(kpis):
+    """将 KPI 名称列表或 {名称: KPI} 字典统一为 {名称: KPI} 字典。"""
+    if isinstance(kpis, dict):
+        return kpis
+    return {name: KPIS[name] for name in kpis}
+
+
+def counters_for(kpis):
+    """返回计算给定 KPI 所需的计数器列，按首次出现顺序去重。"""
+    counters = []
+    for kpi in resolve(kpis).values():
+        counters.extend(COUNTER_PATTERN.findall(kpi.expression))
+    return list(dict.fromkeys(counters))
+
+
+def evaluate_kpis(df, kpis, decimals=2):
+    """
+    在计数器列上批量计算 KPI，结果作为新列添加到 df。
+
+    参数:
+    df (pd.DataFrame): 包含所需计数器列的数据（可以是逐行数据或汇总数据）。
+    kpis (list | dict): KPI 名称列表或 {名称: KPI} 字典。
+    decimals (int): 结果保留的小数位数，None 表示不四舍五入。
+
+    返回值:
+    pd.DataFrame: 添加了 KPI 列的 df。
+    """
+    kpis = resolve(kpis)
+    # 计数器以紧凑类型存储，放宽后再计算，避免 uint32 相减回绕
+    df = widen(df, counters_for(kpis))
+    df = df.eval('\n'.join(f'{name} = {kpi.expression}' for name, kpi in kpis.items()))
+    if decimals is not None:
+        df[list(kpis)] = df[list(kpis)].round(decimals)
+    return df
+
+
+def aggregate_kpis(df, by, kpis, extra=None, decimals=2):
+    """
+    按 by 分组对所需计数器一次求和，再批量计算 KPI。
+
+    参数:
+    df (pd.DataFrame): 逐行计数器数据。
+    by (str | list): 分组列。
+    kpis (list | dict): KPI 名称列表或 {名称: KPI} 字典。
+    extra (dict): 额外的聚合方式，例如 {'cell_key': 'nunique'}。
+    decimals (int): 结果保留的小数位数，None 表示不四舍五入。
+
+    返回值:
+    pd.DataFrame: 分组列、计数器之和、额外聚合列和 KPI 列。
+    """
+    counters = counters_for(kpis)
+    agg = {counter: 'sum' for counter in counters}
+    agg.update(extra or {})
+    sums = widen(df, counters).groupby(by, sort=True).agg(agg).reset_index()
+    return evaluate_kpis(sums, kpis, decimals)
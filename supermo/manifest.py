@@ -0,0 +1,79 @@
+"""已整理文件清单，用于增量整理。
+
+清单以 JSON 保存在输出目录，记录每个已整理源文件的路径、大小、修改时间和内容哈希。
+大小和修改时间都未变的文件直接视为已整理；只有修改时间变化时再比较内容哈希。
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+MANIFEST_NAME = '_manifest.json'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-1 哈希。"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileManifest:
+    """
+    已整理文件清单。
+
+    read_and_process_files 通过 new_files 过滤出新文件，读取成功后用 add 登记；
+    登记的文件在 save 之后才写入清单，因此数据保存失败时下次仍会重新整理。
+
+    参数:
+    directory (str): 清单所在目录，通常为输出目录。
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.files = {}
+        self.pending = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.files = json.load(f)
+
+    @staticmethod
+    def key(path):
+        return os.path.normpath(os.path.abspath(path))
+
+    def is_ingested(self, path):
+        """判断文件是否已整理过且内容未变化。"""
+        record = self.files.get(self.key(path))
+        if record is None:
+            return False
+        stat = os.stat(path)
+        if record['size'] != stat.st_size:
+            return False
+        if record['mtime'] == stat.st_mtime_ns:
+            return True
+        return record['sha1'] == file_hash(path)
+
+    def new_files(self, paths):
+        """返回未整理过或内容已变化的文件。"""
+        return [path for path in paths if not self.is_ingested(path)]
+
+    def add(self, path):
+        """登记读取成功的文件，save 后生效。"""
+        stat = os.stat(path)
+        self.pending[self.key(path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha1': file_hash(path),
+            'ingested_at': datetime.now().isoformat(timespec='seconds'),
+        }
+
+    def save(self):
+        """将登记的文件写入清单。"""
+        self.files.update(self.pending)
+        self.pending = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.files, f, ensure_ascii=False, indent=1)
+        os.replace(self.path + '.tmp', self.path)
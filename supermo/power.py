@@ -0,0 +1,159 @@
+"""BBU 功耗事实表 df_BRP 的计算。
+
+RRU 侧按 [NB, 开始时间] 一次分组同时得到天线数量和 RRU 总功耗，与 KPI 话务量
+按同一键合并后只和 BBU 表连接一次；频段和 Model 在去重后的 BBU名称 上用
+向量化字符串操作得到，再按编码取回各行。
+
+增量整理时 BBU、RRU 和 KPI 报表可能在不同批次到达，rebuild_bbu_power 按已保存的
+df_BUP、df_RUP 和 df_KPI 重新计算新数据涉及的各日期，先到的报表在后续批次中补全。
+"""
+import numpy as np
+import pandas as pd
+
+from supermo.cells import KEY
+from supermo.cleaning import BBU_POWER_COLUMNS, RRU_POWER_COLUMNS
+from supermo.kpi import BBU_TRAFFIC_KPIS, aggregate_kpis, counters_for, evaluate_kpis
+from supermo.store import load_partitioned_dates
+
+KEYS = ['NB', '开始时间']
+
+# 与 Data_org_v1 原流程一致，逐行换算并保留两位小数后再求和的业务量（和不再取整）
+ROW_ROUNDED_TRAFFIC = ['VoNR语音话务量']
+
+# 频段映射
+FREQUENCY_MAP = {
+    '700M': 'L',
+    '2.6G': 'H',
+    '4.9G': 'HH'
+}
+
+
+def rru_power_by_bbu(rru_df, keys=KEYS):
+    """
+    按 BBU 和日期汇总 RRU：天线数量（不同 RRUID 数）和 RRU总功耗，一次分组完成。
+
+    返回值:
+    pd.DataFrame: 以 keys 为索引，包含 天线数量、RRU总功耗 两列。
+    """
+    return rru_df.groupby(list(keys), sort=False).agg(
+        天线数量=('RRUID', 'nunique'),
+        RRU总功耗=('AAU功耗[千瓦时]', 'sum'),
+    ).astype({'RRU总功耗': 'float64'})  # 没有RRU数据时（空表的列为 object）也是数值列
+
+
+def _per_name(names, func):
+    """在去重后的 BBU名称 上计算 func，再按编码取回各行。"""
+    codes, uniques = pd.factorize(names)
+    values = np.append(np.asarray(func(pd.Series(uniques, dtype=object)), dtype=object), np.nan)
+    return values[codes]
+
+
+def frequency_band(names):
+    """根据 BBU名称 确定频段：包含 '700M' 为 700M，否则为 2.6G。"""
+    return _per_name(names, lambda s: np.where(s.str.contains('700M', regex=False).fillna(False).to_numpy(bool), '700M', '2.6G'))
+
+
+def name_suffix(names):
+    """BBU名称 按 '-' 或 '–' 分割后的最后一段；没有分隔符时为空字符串。"""
+    return _per_name(names, lambda s: s.str.extract(r'[-–]([^-–]*)$')[0].fillna(''))
+
+
+def build_model(names, bands, antenna_count):
+    """
+    构建 Model 字段：'<BBU名称最后一段>-<频段代码>-S<天线数量>'。
+
+    参数:
+    names (pd.Series): BBU名称。
+    bands (array-like): 频段（700M/2.6G/4.9G）。
+    antenna_count (pd.Series): 天线数量（整数）。
+
+    返回值:
+    pd.Series: 与 names 同索引的 Model。
+    """
+    suffix = pd.Series(name_suffix(names), index=names.index)
+    band_code = pd.Series(bands, index=names.index).map(FREQUENCY_MAP).fillna('')
+    return suffix + '-' + band_code + '-S' + antenna_count.astype(str)
+
+
+def bbu_traffic(kpi_df, keys=KEYS):
+    """
+    按 BBU 和日期汇总业务量：数据业务流量由计数器之和换算为百万单位并保留两位小数，
+    ROW_ROUNDED_TRAFFIC 中的业务量逐行换算并保留两位小数后求和。
+
+    返回值:
+    pd.DataFrame: 以 keys 为索引，列与 BBU_TRAFFIC_KPIS 相同；没有KPI数据时为空表。
+    """
+    if kpi_df.empty:  # 没有KPI数据时（可能也没有计数器列）话务量为空值
+        index = pd.MultiIndex.from_arrays([[] for _ in keys], names=list(keys))
+        return pd.DataFrame({name: pd.Series(dtype='float64') for name in BBU_TRAFFIC_KPIS}, index=index)
+    summed = {name: kpi for name, kpi in BBU_TRAFFIC_KPIS.items() if name not in ROW_ROUNDED_TRAFFIC}
+    row_rounded = {name: BBU_TRAFFIC_KPIS[name] for name in ROW_ROUNDED_TRAFFIC}
+    traffic = aggregate_kpis(kpi_df, keys, summed).set_index(keys)[list(summed)]
+    rows = evaluate_kpis(kpi_df[list(keys) + counters_for(row_rounded)], row_rounded)
+    traffic = traffic.join(rows.groupby(list(keys), sort=True)[list(row_rounded)].sum())
+    return traffic[list(BBU_TRAFFIC_KPIS)]
+
+
+def calculate_antenna_and_power(bbu_df, rru_df, kpi_df):
+    """
+    在BBU DataFrame中计算天线数量、RRU总功耗、数据业务流量和VoNR语音话务量，并添加频段。
+
+    参数:
+    bbu_df (pd.DataFrame): BBU数据。
+    rru_df (pd.DataFrame): RRU数据。
+    kpi_df (pd.DataFrame): KPI数据。
+
+    返回值:
+    pd.DataFrame: 更新后的BBU DataFrame，包含天线数量、RRU总功耗、数据业务流量、VoNR语音话务量、频段、总功耗和 Model。
+    """
+    # 按照 ['NB', '开始时间'] 汇总数据业务流量（百万单位）和VoNR语音话务量，并保留两位小数
+    traffic = list(BBU_TRAFFIC_KPIS)
+    traffic_data = bbu_traffic(kpi_df)
+
+    # RRU 汇总与话务量按同一键合并后，只与BBU表连接一次
+    facts = rru_power_by_bbu(rru_df).join(traffic_data, how='outer')
+    bbu_df = bbu_df.join(facts, on=KEYS)
+
+    # 将天线数量中的空值替换为0
+    bbu_df['天线数量'] = bbu_df['天线数量'].fillna(0).astype(int)
+
+    # 计算频段
+    bbu_df['频段'] = frequency_band(bbu_df['BBU名称'])
+
+    # 四舍五入功耗数据
+    bbu_df['BBU功耗[千瓦时]'] = bbu_df['BBU功耗[千瓦时]'].round(4)
+    bbu_df['RRU总功耗'] = bbu_df['RRU总功耗'].round(4)
+    bbu_df['总功耗'] = (bbu_df['BBU功耗[千瓦时]'] + bbu_df['RRU总功耗']).round(4)
+
+    # 提取并构建 Model 字段
+    bbu_df['Model'] = build_model(bbu_df['BBU名称'], bbu_df['频段'], bbu_df['天线数量'])
+
+    # 保持原有列顺序
+    columns = [col for col in bbu_df.columns if col not in ['天线数量', 'RRU总功耗', '频段', '总功耗', 'Model'] + traffic]
+    bbu_df = bbu_df[columns + ['天线数量', 'RRU总功耗', '频段'] + traffic + ['总功耗', 'Model']]
+
+    # 检查并删除重复数据
+    return bbu_df.drop_duplicates()
+
+
+def rebuild_bbu_power(directory, dates, dim):
+    """
+    按已保存的 df_BUP、df_RUP 和 df_KPI 重新计算 dates 各日期的 df_BRP 行。
+
+    参数:
+    directory (str): 数据目录，df_BUP、df_RUP 和 df_KPI 已按开始时间分区保存。
+    dates (iterable): 新数据涉及的日期（BBU、RRU、KPI 报表中的开始时间）。
+    dim (pd.DataFrame): 小区维表，用于由 df_KPI 的 cell_key 取回 NB。
+
+    返回值:
+    pd.DataFrame: 这些日期中有BBU数据的 df_BRP 行；都没有BBU数据时为空表。
+    """
+    bbu_df = load_partitioned_dates(directory, 'df_BUP', dates, BBU_POWER_COLUMNS)
+    if bbu_df.empty:
+        return pd.DataFrame()
+    dates = bbu_df['开始时间'].unique()
+    rru_df = load_partitioned_dates(directory, 'df_RUP', dates, RRU_POWER_COLUMNS)
+    kpi_df = load_partitioned_dates(directory, 'df_KPI', dates, [KEY, '开始时间'] + counters_for(BBU_TRAFFIC_KPIS))
+    kpi_df = kpi_df[kpi_df[KEY] >= 0]  # 小区维表中没有的小区不属于任何BBU
+    kpi_df = kpi_df.assign(NB=dim['NB'].to_numpy()[kpi_df[KEY].to_numpy(dtype=np.int64)])
+    return calculate_antenna_and_power(bbu_df, rru_df, kpi_df)
@@ -0,0 +1,145 @@
+"""设备功耗的分布汇总。
+
+ThreePixel 原先每次运行都清洗整张 df_BRP、按 Model 分组求均值和最值，并用全部原始行
+绘制按 BBU名称 分组的箱线图。数据整理时改为按 Model 和按 BBU 各保存一个设备功耗的
+可合并分位数草图（supermo.sketch），页面对所选 Model 合并草图即可得到统计量和箱线图，
+耗时只与 Model、BBU 的个数有关，与功耗记录数无关。
+
+草图以表 power_sketch 保存在数据目录中，每组一行：维度（'Model' 或 'BBU名称'）、名称、Model、
+数量、总和、最小值、最大值、相对误差、桶、桶计数（int32 / int64 数组的字节）。
+BBU 行按 (BBU名称, Model) 分组，同一 BBU 在所选 Model 中有多行时合并；
+Model 行按 Model 在清洗后数据中首次出现的顺序排列。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from supermo.schema import widen
+from supermo.sketch import QuantileSketch, group_sketches
+from supermo.store import load_table, save_table, table_path, versioned
+
+POWER_SKETCH_NAME = 'power_sketch'
+POWER_COLUMN = '设备功耗'
+MODEL = 'Model'
+BBU = 'BBU名称'
+SUMMARY_COLUMNS = ['维度', '名称', MODEL, '数量', '总和', '最小值', '最大值', '相对误差']
+
+
+def device_power(df_brp):
+    """
+    清洗功耗表并计算设备功耗。
+
+    删除 Model 包含 'D5S' 的行，以及 BBU功耗(R1054_001)[W] 或 RRU总功耗 为 0 的行；
+    设备功耗 = BBU功耗[千瓦时] + RRU总功耗 / 天线数量 × 3（功耗列以 float32 存储，放宽后计算）。
+
+    参数:
+    df_brp (pd.DataFrame): 功耗表 df_BRP。
+
+    返回值:
+    pd.DataFrame: 清洗后的行，增加 设备功耗 列。
+    """
+    df = df_brp[~df_brp[MODEL].str.contains('D5S')]
+    df = df[(df['BBU功耗(R1054_001)[W]'] != 0) & (df['RRU总功耗'] != 0)]
+    df = widen(df, ['BBU功耗[千瓦时]', 'RRU总功耗', '天线数量'])
+    return df.assign(**{POWER_COLUMN: df['BBU功耗[千瓦时]'] + (df['RRU总功耗'] / df['天线数量']) * 3})
+
+
+class PowerDistribution:
+    """
+    按 Model 和 BBU 汇总的设备功耗草图。
+
+    参数:
+    summary (pd.DataFrame): 各组的 维度、名称、Model、数量、总和、最小值、最大值、相对误差。
+    sketches (list): 与 summary 各行对应的 QuantileSketch。
+    """
+
+    def __init__(self, summary, sketches):
+        self.summary = summary.reset_index(drop=True)
+        self.sketches = sketches
+
+    @classmethod
+    def from_power(cls, df_brp):
+        """由功耗表 df_BRP 清洗、计算设备功耗后构建。"""
+        df = device_power(df_brp)
+        values = df[POWER_COLUMN].to_numpy(np.float64)
+        rows, sketches = [], []
+        for dimension, keys in (('Model', [MODEL]), ('BBU名称', [BBU, MODEL])):
+            grouped = df.groupby(keys, sort=dimension != 'Model', observed=True)
+            names = grouped.size().index
+            codes = grouped.ngroup().fillna(-1).to_numpy(np.int64)  # 分组键为空的行为 -1
+            for code, sketch in sorted(group_sketches(values[codes >= 0], codes[codes >= 0]).items()):
+                name = names[code]
+                rows.append({'维度': dimension, '名称': name[0] if isinstance(name, tuple) else name,
+                             MODEL: name[-1] if isinstance(name, tuple) else name, '数量': sketch.count,
+                             '总和': sketch.total, '最小值': sketch.minimum, '最大值': sketch.maximum,
+                             '相对误差': sketch.alpha})
+                sketches.append(sketch)
+        summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).astype({'名称': object, MODEL: object})
+        return cls(summary, sketches)
+
+    @classmethod
+    def load(cls, directory, version=None):
+        """读取数据目录中的草图，不存在时返回 None；version 为数据版本，见 supermo.store.versioned。"""
+        with versioned(directory, version):
+            if not has_power_distribution(directory):
+                return None
+            table = load_table(directory, POWER_SKETCH_NAME, memory_map=False)
+        sketches = [QuantileSketch(np.frombuffer(keys, dtype=np.int32), np.frombuffer(counts, dtype=np.int64),
+                                   int(count), total, minimum, maximum, alpha)
+                    for keys, counts, count, total, minimum, maximum, alpha
+                    in zip(table['桶'], table['桶计数'], table['数量'], table['总和'], table['最小值'],
+                           table['最大值'], table['相对误差'])]
+        return cls(table[SUMMARY_COLUMNS], sketches)
+
+    def save(self, directory):
+        """保存草图，返回行数。"""
+        table = self.summary.assign(桶=[sketch.keys.astype(np.int32).tobytes() for sketch in self.sketches],
+                                    桶计数=[sketch.counts.astype(np.int64).tobytes() for sketch in self.sketches])
+        save_table(table, directory, POWER_SKETCH_NAME)
+        return len(table)
+
+    def models(self):
+        """清洗后数据中的 Model，按首次出现的顺序。"""
+        return self.summary.loc[self.summary['维度'] == 'Model', '名称'].tolist()
+
+    def _rows(self, dimension, models):
+        return self.summary[(self.summary['维度'] == dimension) & self.summary[MODEL].isin(models)]
+
+    def model_stats(self, models):
+        """
+        所选 Model 的设备功耗均值、最大值和最小值（精确值）。
+
+        返回值:
+        pd.DataFrame: Model、mean、max、min，按 Model 排序。
+        """
+        rows = self._rows('Model', models).sort_values('名称')
+        return pd.DataFrame({MODEL: rows['名称'].to_numpy(), 'mean': (rows['总和'] / rows['数量']).to_numpy(),
+                             'max': rows['最大值'].to_numpy(), 'min': rows['最小值'].to_numpy()})
+
+    def box_stats(self, models):
+        """
+        所选 Model 下各 BBU 的箱线图统计量，按 BBU名称 排序，可直接传给 Axes.bxp。
+
+        参数:
+        models (list): 所选 Model。
+
+        返回值:
+        list: 每个 BBU 一个 dict（见 QuantileSketch.box_stats）。
+        """
+        rows = self._rows('BBU名称', models)
+        stats = []
+        for name, group in rows.groupby('名称', sort=True):
+            sketch = QuantileSketch.merge_all([self.sketches[i] for i in group.index])
+            stats.append(sketch.box_stats(label=name))
+        return stats
+
+
+def has_power_distribution(directory):
+    """数据目录中是否已有设备功耗草图。"""
+    return os.path.exists(table_path(directory, POWER_SKETCH_NAME))
+
+
+def save_power_distribution(df_brp, directory):
+    """由功耗表构建并保存设备功耗草图，返回行数。"""
+    return PowerDistribution.from_power(df_brp).save(directory)
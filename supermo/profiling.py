@@ -0,0 +1,225 @@
+"""页面分阶段计时。
+
+页面把读取、筛选、合并、聚合、图表构建、序列化等步骤包在 profiler.span(名称) 中，
+每次运行记录各阶段的耗时、输入/输出行数和峰值内存（tracemalloc 统计的 Python/NumPy 分配，
+不含 Arrow 分配的内存）。开启方式：页面地址加 ?profile=1，或打开侧边栏的“阶段耗时”开关；
+开启后侧边栏显示计时表，并向 JSON Lines 日志追加一行，供离线分析。
+
+关闭时 span() 直接返回一个什么都不做的空阶段，不计时也不追踪内存，开销可以忽略。
+tracemalloc 是进程级的，多个会话同时开启计时时内存数字会相互影响，耗时不受影响。
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from datetime import datetime
+
+import pandas as pd
+
+PROFILE_LOG_ENV = 'SUPERMO_PROFILE_LOG'
+DEFAULT_LOG = 'supermo_profile.jsonl'
+QUERY_PARAM = 'profile'
+
+_tracing_users = 0
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class _NullSpan:
+    """关闭计时时使用的空阶段，所有操作都不做任何事。"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    一个计时阶段，作为上下文管理器使用；在块内给 rows_out 赋值记录输出行数。
+    页面脚本中跨越较长代码段的阶段也可以用 start() / stop() 标记首尾。
+
+    嵌套阶段的峰值内存会计入外层阶段。
+    """
+
+    def __init__(self, profiler, name, rows_in=None):
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+        self.peak_bytes = None
+        self.depth = 0
+        self._start = None
+        self._base = 0
+        self._peak = 0
+
+    def __enter__(self):
+        stack = self.profiler._stack
+        self.depth = len(stack)
+        if self.profiler.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._base = self._peak = current
+        stack.append(self)
+        self.profiler.spans.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        stack = self.profiler._stack
+        stack.pop()
+        if self.profiler.track_memory:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.peak_bytes = self._peak - self._base
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        return False
+
+    def start(self):
+        return self.__enter__()
+
+    def stop(self):
+        self.__exit__(None, None, None)
+
+    def record(self):
+        return {
+            '阶段': ('  ' * (self.depth - 1) + '└ ' if self.depth else '') + self.name,
+            '耗时(ms)': round(self.seconds * 1000, 2) if self.seconds is not None else None,
+            '输入行数': self.rows_in,
+            '输出行数': self.rows_out,
+            '峰值内存(MB)': round(self.peak_bytes / 1024 / 1024, 2) if self.peak_bytes is not None else None,
+        }
+
+
+class Profiler:
+    """
+    一次页面运行的阶段计时器。
+
+    参数:
+    page (str): 页面名称，写入日志。
+    enabled (bool): 是否计时；为 False 时 span() 返回空阶段。
+    track_memory (bool): 是否用 tracemalloc 统计峰值内存。
+    """
+
+    def __init__(self, page, enabled=True, track_memory=True):
+        self.page = page
+        self.enabled = enabled
+        self.track_memory = enabled and track_memory
+        self.run_id = uuid.uuid4().hex[:12]
+        self.spans = []
+        self.closed = False
+        self._stack = []
+        self._start = time.perf_counter()
+        self._release = None
+        if self.track_memory:
+            _start_tracing()
+            # 页面运行被中断（例如重新运行）时，计时器被回收后也会停止内存追踪
+            self._release = weakref.finalize(self, _stop_tracing)
+
+    def span(self, name, rows_in=None):
+        """返回名为 name 的计时阶段；rows_in 为输入行数。"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, rows_in)
+
+    def close(self):
+        """结束计时并停止内存追踪，返回总耗时（秒）。"""
+        self.closed = True
+        if self._release is not None:
+            self.track_memory = False
+            self._release()
+        return time.perf_counter() - self._start
+
+    def frame(self):
+        """各阶段记录，按开始顺序排列，嵌套阶段名前标有 └。"""
+        return pd.DataFrame([span.record() for span in self.spans],
+                            columns=['阶段', '耗时(ms)', '输入行数', '输出行数', '峰值内存(MB)']).astype({'输入行数': 'Int64', '输出行数': 'Int64'})
+
+    def write_log(self, total_seconds, path=None):
+        """向 JSON Lines 日志追加本次运行的记录；路径默认取环境变量 SUPERMO_PROFILE_LOG。"""
+        path = path or os.environ.get(PROFILE_LOG_ENV) or DEFAULT_LOG
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'page': self.page,
+            'run': self.run_id,
+            'total_ms': round(total_seconds * 1000, 2),
+            'stages': [{'name': span.name, 'depth': span.depth,
+                        'ms': round(span.seconds * 1000, 3) if span.seconds is not None else None,
+                        'rows_in': span.rows_in, 'rows_out': span.rows_out, 'peak_bytes': span.peak_bytes}
+                       for span in self.spans],
+        }
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=int) + '\n')
+
+
+def page_profiler(page):
+    """
+    创建页面的计时器：地址参数 ?profile=1 或侧边栏开关打开时启用。
+
+    返回值:
+    Profiler: 本次运行的计时器，页面末尾调用 report(profiler)。
+    """
+    import streamlit as st
+    requested = st.query_params.get(QUERY_PARAM, '').lower() in ('1', 'true', 'yes')
+    enabled = st.sidebar.toggle('阶段耗时', value=requested, help='记录本页各阶段的耗时、行数和峰值内存')
+    return Profiler(page, enabled)
+
+
+def fragment_profiler(profiler):
+    """
+    片段（st.fragment）中使用的计时器。
+
+    整页运行时片段沿用页面的计时器；片段单独重新运行时页面的计时器已经结束，
+    为这次片段运行创建新的计时器，片段末尾用 report(计时器, st) 在片段内显示。
+    """
+    if not profiler.closed:
+        return profiler
+    return Profiler(profiler.page, profiler.enabled)
+
+
+def report(profiler, container=None):
+    """显示计时表并写入日志；container 默认为侧边栏。未启用时什么都不做。"""
+    if not profiler.enabled:
+        return
+    import streamlit as st
+    total = profiler.close()
+    with (container or st.sidebar).expander('阶段耗时', expanded=True):
+        st.caption(f'本次运行共 {total * 1000:.0f} ms')
+        st.dataframe(profiler.frame(), hide_index=True)
+    profiler.write_log(total)
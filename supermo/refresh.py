@@ -0,0 +1,231 @@
+"""数据目录的后台刷新。
+
+页面原先每次运行都遍历数据目录计算 dataset_version：Data_org_v1 写出新数据后，
+第一个打开页面的用户要等新数据读取、层级索引构建完成，写出过程中打开页面还可能读到
+新旧混合的表；以旧版本为键的缓存也一直留在内存中。
+
+data_refresher(directory) 返回目录对应的进程级刷新器，由后台线程每隔 interval 秒检查一次版本。
+版本取自 Data_org_v1 最后一步写出的 _version.json（见 supermo.store.publish_version），
+整理过程中（表已写出、立方体、草图和位图还在计算）不会发现新版本；没有 _version.json 的
+旧数据目录退回按文件判断：没有正在写出的 .tmp 文件或目录，且连续两次检查版本相同。
+发现新版本后在后台依次调用各页面登记的预热函数读取新版本的数据、构建索引，全部完成后才把
+页面使用的版本切换为新版本，最后调用登记的淘汰函数清除以旧版本为键的缓存。
+页面通过 refresher.version() 取得当前版本，这个调用只读取一个属性，不会等待后台读取。
+
+按版本读取的函数在目录正在写出或版本已变化时抛出 VersionMismatch，页面运行中遇到时
+由 stop_on_update 提示并停止本次运行，不显示新旧混合的数据；预热中遇到时等新版本发布后再预热。
+预热出错时继续使用旧版本，目录再次变化后重试。
+
+st.cache_data 的 clear() 不带参数时会清空所有版本的条目，包括刚预热好的新版本；
+缓存函数在实际计算时用 VersionKeys 登记自己的参数，淘汰函数只清除旧版本的条目。
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from supermo.store import VersionMismatch, dataset_version, file_version, read_version_marker
+
+DEFAULT_INTERVAL = 10.0
+
+logger = logging.getLogger(__name__)
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+
+def data_refresher(directory, interval=DEFAULT_INTERVAL):
+    """返回 directory 对应的进程级刷新器，首次调用时创建。"""
+    with _refreshers_lock:
+        refresher = _refreshers.get(directory)
+        if refresher is None:
+            refresher = _refreshers[directory] = DataRefresher(directory, interval)
+        return refresher
+
+
+def writing(directory):
+    """数据目录中是否有正在写出的表（supermo.store 先写 .tmp 文件或 .tmp 目录再替换）。"""
+    for _, dirs, files in os.walk(directory):
+        if any(name.endswith('.tmp') for name in dirs + files):
+            return True
+    return False
+
+
+class DataRefresher:
+    """
+    数据目录的版本检查与后台预热。
+
+    参数:
+    directory (str): 数据目录。
+    interval (float): 后台检查的间隔（秒）。
+    """
+
+    def __init__(self, directory, interval=DEFAULT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.current = None  # 页面使用的版本
+        self.loading = None  # 正在后台预热的版本
+        self.refreshed_at = None
+        self.error = None
+        self._seen = None  # 上次检查到的版本
+        self._failed = None  # 预热出错的版本，目录再次变化前不重试
+        self._hooks = {}  # 名称 -> (预热函数, 淘汰函数)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name, warm=None, retire=None):
+        """
+        登记预热函数和淘汰函数；同名再次登记时替换（页面每次运行都会重新登记）。
+
+        参数:
+        name (str): 登记名，通常为页面名。
+        warm (callable): warm(version)，在后台读取新版本的数据、构建缓存。
+        retire (callable): retire(version)，切换后清除以旧版本为键的缓存。
+        """
+        with self._lock:
+            self._hooks[name] = (warm, retire)
+
+    def version(self):
+        """页面使用的数据版本。首次调用时同步计算版本并启动后台线程，之后直接返回已切换好的版本。"""
+        if self.current is None:
+            with self._lock:
+                if self.current is None:
+                    self.current = self._seen = dataset_version(self.directory)
+                    self.refreshed_at = datetime.now()
+        self.start()
+        return self.current
+
+    def start(self):
+        """启动后台检查线程（已在运行时不做任何事）。"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=f'data-refresh:{self.directory}', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """停止后台检查线程。"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('检查数据目录 %s 失败', self.directory)
+
+    def poll(self):
+        """
+        检查一次数据目录，发现已发布（或已稳定）的新版本时预热并切换。
+
+        返回值:
+        bool: 是否切换了版本。
+        """
+        marker = read_version_marker(self.directory)
+        if marker is not None:
+            # 以 Data_org_v1 发布的版本为准，正在写出时不切换
+            if marker.get('writing'):
+                return False
+            version = marker['version']
+        else:
+            if writing(self.directory):
+                self._seen = None
+                return False
+            version = file_version(self.directory)
+            stable, self._seen = version == self._seen, version
+            if not stable:
+                return False
+        if version == self.current or version == self._failed:
+            return False
+        return self.refresh(version)
+
+    def refresh(self, version):
+        """
+        预热 version 后切换到该版本，再淘汰旧版本的缓存。
+
+        返回值:
+        bool: 是否切换了版本；预热出错时保留旧版本并返回 False。
+        """
+        with self._lock:
+            hooks = list(self._hooks.items())
+        self.loading = version
+        try:
+            for name, (warm, _) in hooks:
+                if warm is not None:
+                    warm(version)
+        except VersionMismatch:
+            # 预热期间目录又开始写出，等下一次发布后预热新的版本
+            logger.info('预热数据版本 %s 时数据目录已开始更新', version)
+            return False
+        except Exception as e:
+            logger.exception('预热数据版本 %s 失败', version)
+            self.error = f'{name}: {e}'
+            self._failed = version
+            return False
+        finally:
+            self.loading = None
+
+        old, self.current = self.current, version
+        self.refreshed_at = datetime.now()
+        self.error = None
+        self._failed = None
+        if old is not None and old != version:
+            for name, (_, retire) in hooks:
+                if retire is None:
+                    continue
+                try:
+                    retire(old)
+                except Exception:
+                    logger.exception('%s 淘汰数据版本 %s 的缓存失败', name, old)
+        return True
+
+
+class VersionKeys:
+    """
+    按数据版本登记缓存条目，淘汰时只清除该版本的条目。
+
+    缓存函数在未命中（实际计算）时调用 add(version, 缓存函数.clear, *参数)，
+    淘汰函数调用 clear(旧版本) 逐个清除旧版本的条目，其他版本的条目保留。
+    """
+
+    def __init__(self):
+        self._entries = {}  # 版本 -> [(清除函数, 参数)]
+        self._lock = threading.Lock()
+
+    def add(self, version, clear, *args):
+        """登记 version 的一个缓存条目，淘汰时调用 clear(*args)。"""
+        with self._lock:
+            self._entries.setdefault(version, []).append((clear, args))
+
+    def clear(self, version):
+        """清除 version 登记的全部缓存条目。"""
+        with self._lock:
+            entries = self._entries.pop(version, [])
+        for clear, args in entries:
+            clear(*args)
+
+
+def show_status(refresher, container=None):
+    """后台正在加载新数据或加载失败时在侧边栏（或 container 中）显示提示。"""
+    import streamlit as st
+    container = container or st.sidebar
+    if refresher.loading is not None:
+        container.caption('检测到新数据，正在后台加载，加载完成后自动切换')
+    elif refresher.error is not None:
+        container.caption(f'新数据加载失败，仍显示旧数据：{refresher.error}')
+
+
+@contextmanager
+def stop_on_update(container=None):
+    """页面读取数据时遇到 VersionMismatch（数据目录正在更新）：提示后停止本次运行，新版本切换后再次操作即显示新数据。"""
+    import streamlit as st
+    try:
+        yield
+    except VersionMismatch:
+        (container or st).info('数据正在更新，更新完成后再次操作即可显示新数据')
+        st.stop()
@@ -0,0 +1,281 @@
+"""KPI 计数器汇总立方体。
+
+所有 KPI 都是可累加计数器之比，因此在数据整理阶段按
+开始时间 × 工作频段 × 地市 × 县区 × 镇区 × 村区 的各个层级预先求和，
+页面根据筛选项直接读取对应层级的汇总行，无需扫描小区级数据。
+
+除按日的汇总外，同时保存按周（周一开始）和按月再次求和的汇总（立方体目录下的 week、month
+子目录），只含计数器之和，比值 KPI 仍由和计算，结果精确。时间范围较长时页面按周或按月读取，
+读取的行数与短时间范围相当。
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from supermo.cells import KEY
+from supermo.schema import widen
+from supermo.store import load_partitioned, load_table, read_arrow, save_table, table_path, versioned
+
+ALL = '全部'
+TIME_COLUMN = '开始时间'
+BAND_LEVEL = '工作频段'
+REGION_LEVELS = ['地市', '县区', '镇区', '村区']
+LEVELS = [BAND_LEVEL] + REGION_LEVELS
+CUBE_NAME = 'kpi_cube'
+
+# 时间粒度，由细到粗
+GRANULARITIES = ['day', 'week', 'month']
+# 自动选择粒度时，时间范围内至少应有的点数
+MIN_POINTS = 20
+
+
+def counter_columns(df):
+    """返回 df_KPI 中的计数器列（R、K 开头）。"""
+    return [col for col in df.columns if col[:1] in ('R', 'K') and pd.api.types.is_numeric_dtype(df[col])]
+
+
+def grouping_levels(band, depth):
+    """返回某个汇总层级的分组列：是否按频段分组，以及地域层级深度。"""
+    return ([BAND_LEVEL] if band else []) + REGION_LEVELS[:depth]
+
+
+def grouping_name(levels):
+    """汇总层级对应的文件名。"""
+    return '_'.join(levels) if levels else ALL
+
+
+def cube_directory(directory, granularity='day'):
+    """汇总立方体某一时间粒度的目录。"""
+    cube_dir = os.path.join(directory, CUBE_NAME)
+    return cube_dir if granularity == 'day' else os.path.join(cube_dir, granularity)
+
+
+def period_start(dates, granularity):
+    """每个日期所在周期的第一天：'day' 为当天，'week' 为周一，'month' 为当月1日。"""
+    dates = pd.to_datetime(pd.Series(dates)).dt.normalize()
+    if granularity == 'week':
+        return dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+    if granularity == 'month':
+        return dates - pd.to_timedelta(dates.dt.day - 1, unit='D')
+    return dates
+
+
+def period_count(date_range, granularity):
+    """时间范围（包含两端）涉及的周期数。"""
+    return period_start(pd.date_range(date_range[0], date_range[1], freq='D'), granularity).nunique()
+
+
+def choose_granularity(date_range, min_points=MIN_POINTS):
+    """选择时间范围内点数不少于 min_points 的最粗粒度，范围较短时为 'day'。"""
+    for granularity in reversed(GRANULARITIES[1:]):
+        if period_count(date_range, granularity) >= min_points:
+            return granularity
+    return 'day'
+
+
+def resample_counters(df, granularity):
+    """
+    把每个开始时间的计数器之和按周期再次求和。
+
+    参数:
+    df (pd.DataFrame): 开始时间和计数器之和。
+    granularity (str): 'day'、'week' 或 'month'。
+
+    返回值:
+    pd.DataFrame: 开始时间（周期的第一天）和计数器之和，按开始时间排序。
+    """
+    if granularity == 'day':
+        return df
+    df = df.assign(**{TIME_COLUMN: period_start(df[TIME_COLUMN], granularity).to_numpy()})
+    return df.groupby(TIME_COLUMN, sort=True).sum().reset_index()
+
+
+def rollup_periods(part, granularity):
+    """把按日的汇总层级按周期再次求和，列和排序与按日的汇总相同。"""
+    counters = [col for col in part.columns if col != TIME_COLUMN and col not in LEVELS]
+    part = part.assign(**{TIME_COLUMN: period_start(part[TIME_COLUMN], granularity).to_numpy()})
+    part = part.groupby([TIME_COLUMN] + LEVELS, sort=False)[counters].sum().reset_index()
+    return part.sort_values(LEVELS + [TIME_COLUMN], ignore_index=True)
+
+
+def build_rollup_cube(df_kpi, df_rac, counters=None):
+    """
+    构建计数器汇总立方体。
+
+    参数:
+    df_kpi (pd.DataFrame): KPI数据，包含 cell_key、开始时间和计数器列。
+    df_rac (pd.DataFrame): 小区地域数据，包含 cell_key 和工作频段、地市、县区、镇区、村区。
+    counters (list): 需要汇总的计数器列，None 表示全部 R、K 开头的列。
+
+    返回值:
+    dict: 以汇总层级名为键、汇总结果为值的字典，未分组的层级填充为 '全部'。
+    """
+    # 只汇总 df_kpi 中存在的计数器
+    counters = [col for col in counters if col in df_kpi.columns] if counters else counter_columns(df_kpi)
+    merged = pd.merge(widen(df_kpi[[KEY, TIME_COLUMN] + counters], counters), df_rac[[KEY] + LEVELS], on=KEY, how='inner')
+    # 层级列在 gdf_RAC 中为 category，立方体中与 '全部' 一起保存为字符串
+    merged[LEVELS] = merged[LEVELS].astype(object)
+
+    # 最细层级：频段 + 村区，其余层级都由它继续汇总
+    finest = merged.groupby([TIME_COLUMN] + LEVELS, sort=False, observed=True)[counters].sum().reset_index()
+
+    cube = {}
+    for band in (True, False):
+        for depth in range(len(REGION_LEVELS) + 1):
+            levels = grouping_levels(band, depth)
+            if len(levels) == len(LEVELS):
+                part = finest
+            else:
+                part = finest.groupby([TIME_COLUMN] + levels, sort=False, observed=True)[counters].sum().reset_index()
+            for level in LEVELS:
+                if level not in levels:
+                    part[level] = ALL
+            cube[grouping_name(levels)] = part[[TIME_COLUMN] + LEVELS + counters].sort_values(LEVELS + [TIME_COLUMN], ignore_index=True)
+    return cube
+
+
+def save_rollup_cube(df_kpi, df_rac, directory, counters=None):
+    """构建汇总立方体并按汇总层级和时间粒度分别保存，返回各层级行数（周、月汇总的键带 'week/'、'month/' 前缀）。"""
+    cube = build_rollup_cube(df_kpi, df_rac, counters)
+    rows = {}
+    for granularity in GRANULARITIES:
+        for name, part in cube.items():
+            if granularity != 'day':
+                part = rollup_periods(part, granularity)
+            save_table(part, cube_directory(directory, granularity), name)
+            rows[name if granularity == 'day' else f'{granularity}/{name}'] = len(part)
+    return rows
+
+
+def update_rollup_cube(directory, df_rac, dates, counters=None, kpi_name='df_KPI'):
+    """
+    增量更新汇总立方体：只重新汇总指定日期的KPI数据，替换立方体中这些日期的行，
+    并重新汇总这些日期所在的周和月。
+
+    参数:
+    directory (str): 数据目录，需已保存分区表 df_KPI。
+    df_rac (pd.DataFrame): 小区地域数据。
+    dates (list): 需要重新汇总的开始时间。
+    counters (list): 需要汇总的计数器列，None 表示全部 R、K 开头的列。
+    kpi_name (str): KPI 分区表名。
+
+    返回值:
+    dict: 各汇总层级更新后的行数（周、月汇总的键带 'week/'、'month/' 前缀）。
+    """
+    dates = pd.to_datetime(pd.Series(list(dates))).dt.normalize().drop_duplicates()
+    if dates.empty:
+        return {}
+    df_kpi = load_partitioned(directory, kpi_name, date_range=(dates.min().date(), dates.max().date()))
+    df_kpi = df_kpi[df_kpi[TIME_COLUMN].isin(dates)]
+
+    cube_dir = cube_directory(directory)
+    rows = {}
+    for name, part in build_rollup_cube(df_kpi, df_rac, counters).items():
+        if os.path.exists(table_path(cube_dir, name)):
+            existing = load_table(cube_dir, name, memory_map=False)
+            existing = existing[~existing[TIME_COLUMN].isin(dates)]
+            part = pd.concat([existing, part], ignore_index=True).sort_values(LEVELS + [TIME_COLUMN], ignore_index=True)
+        save_table(part, cube_dir, name)
+        rows[name] = len(part)
+
+        # 周、月汇总只重新汇总涉及的周期；尚无该粒度的汇总时由全部按日汇总生成
+        for granularity in GRANULARITIES[1:]:
+            coarse_dir = cube_directory(directory, granularity)
+            if os.path.exists(table_path(coarse_dir, name)):
+                periods = period_start(dates, granularity).drop_duplicates()
+                affected = part[period_start(part[TIME_COLUMN], granularity).isin(periods).to_numpy()]
+                existing = load_table(coarse_dir, name, memory_map=False)
+                existing = existing[~existing[TIME_COLUMN].isin(periods)]
+                coarse = pd.concat([existing, rollup_periods(affected, granularity)], ignore_index=True)
+                coarse = coarse.sort_values(LEVELS + [TIME_COLUMN], ignore_index=True)
+            else:
+                coarse = rollup_periods(part, granularity)
+            save_table(coarse, coarse_dir, name)
+            rows[f'{granularity}/{name}'] = len(coarse)
+    return rows
+
+
+def has_rollup_cube(directory):
+    """判断目录中是否已有汇总立方体。"""
+    return os.path.isdir(os.path.join(directory, CUBE_NAME))
+
+
+def query_rollup_cube(directory, selection, date_range=None, counters=None, granularity='day', version=None):
+    """
+    按筛选项读取汇总立方体，返回每个开始时间（或周期）的计数器之和。
+
+    若筛选的地域层级是连续前缀（例如只选了地市和县区），直接读取对应层级的汇总行；
+    否则读取最细层级并在所选行上再次求和。
+
+    按周或按月读取时，完整落在时间范围内的周期取自周、月汇总，首尾不完整的周期只对范围内的日期
+    由按日汇总求和，结果与先按日期筛选再按周期求和一致。没有周、月汇总的旧立方体由按日汇总求和。
+
+    参数:
+    directory (str): 数据目录。
+    selection (dict): 各层级的选择值，未选择的层级为 '全部'。
+    date_range (tuple): (开始日期, 结束日期)，包含两端；None 表示全部日期。
+    counters (list): 需要的计数器列，None 表示全部。
+    granularity (str): 时间粒度，'day'、'week' 或 'month'。
+    version (str): 数据版本，读取时目录正在写出或版本已变化则抛出 VersionMismatch（见 supermo.store.versioned）。
+
+    返回值:
+    pd.DataFrame: 开始时间（周期的第一天）和计数器之和，按开始时间排序。
+    """
+    with versioned(directory, version):
+        if granularity == 'day':
+            return _query_cube(cube_directory(directory), selection, date_range, counters)
+        coarse_dir = cube_directory(directory, granularity)
+        if not os.path.isdir(coarse_dir):
+            return resample_counters(_query_cube(cube_directory(directory), selection, date_range, counters), granularity)
+        if date_range is None:
+            return _query_cube(coarse_dir, selection, None, counters)
+
+        # 完整周期：第一天不早于范围开始，且下一周期的第一天不晚于范围结束的次日
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+        first_full = period_start([start], granularity)[0]
+        if first_full < start:
+            first_full = period_start([first_full + pd.Timedelta(days=31 if granularity == 'month' else 7)], granularity)[0]
+        stop = period_start([end + pd.Timedelta(days=1)], granularity)[0]
+        if first_full >= stop:
+            return resample_counters(_query_cube(cube_directory(directory), selection, date_range, counters), granularity)
+
+        one_day = pd.Timedelta(days=1)
+        pieces = [_query_cube(coarse_dir, selection, (first_full.date(), (stop - one_day).date()), counters)]
+        for edge in ((start, first_full - one_day), (stop, end)):
+            if edge[0] <= edge[1]:
+                daily = _query_cube(cube_directory(directory), selection, (edge[0].date(), edge[1].date()), counters)
+                pieces.append(resample_counters(daily, granularity))
+        pieces = [piece for piece in pieces if len(piece)] or pieces[:1]
+        return pd.concat(pieces, ignore_index=True).sort_values(TIME_COLUMN, ignore_index=True)
+
+
+def _query_cube(cube_dir, selection, date_range, counters):
+    """在一个时间粒度的立方体目录中按筛选项和时间范围读取，按开始时间求和。"""
+    selected = [level for level in LEVELS if selection.get(level, ALL) != ALL]
+    band = BAND_LEVEL in selected
+    depth = sum(1 for level in REGION_LEVELS if level in selected)
+    if selected == grouping_levels(band, depth):
+        name = grouping_name(selected)
+    else:
+        name = grouping_name(LEVELS)
+
+    columns = [TIME_COLUMN] + selected + (list(dict.fromkeys(counters)) if counters else [])
+    table = read_arrow(cube_dir, name, columns if counters else None)
+
+    mask = None
+    for level in selected:
+        condition = pc.equal(table.column(level), pa.scalar(selection[level]))
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if date_range is not None:
+        dates = table.column(TIME_COLUMN)
+        condition = pc.and_(pc.greater_equal(dates, pa.scalar(date_range[0], pa.date32())),
+                            pc.less_equal(dates, pa.scalar(date_range[1], pa.date32())))
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if mask is not None:
+        table = table.filter(mask)
+
+    df = table.to_pandas(date_as_object=False)
+    counters = [col for col in df.columns if col != TIME_COLUMN and col not in LEVELS]
+    return df.groupby(TIME_COLUMN, sort=True)[counters].sum().reset_index()
@@ -0,0 +1,218 @@
+"""表结构登记：df_KPI、gdf_RAC、df_BRP 各列的紧凑类型。
+
+清洗后的计数器是 int64/float64，地域、频段、型号等列是 object 字符串，百余个计数器、
+数百万行时占用的内存是实际需要的数倍。这里为每张表登记各列的存储类型：计数器尽量用
+uint32/float32，重复度高的字符串列用 category。
+
+apply_schema 在写出（supermo.store 保存表时）和读取（load_table / load_partitioned，
+包括登记之前写出的旧数据）时执行。每列先检查数据能否无损放入紧凑类型：整数检查取值范围，
+浮点数检查按登记的小数位转换后的误差；放不下时改用登记的宽类型，宽类型也放不下
+（或没有宽类型）时抛出 OverflowError，不会静默截断；整数列含有缺失值时抛出 ValueError。
+
+计数器集合不同的报表合并后，缺少某个计数器的行为缺失值，由 fill_counters 按 0 补齐
+（与逐行清洗时把空计数器记为 0 一致）。
+
+紧凑类型只用于存储和传递。计算前由 widen 放宽为 int64/float64：uint32 相减会回绕，
+float32 累加会损失精度；float32 放宽时按登记的小数位舍入，恢复原来的十进制值，
+计算结果与以 float64 保存时一致。
+"""
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class Column(NamedTuple):
+    """列类型：dtype 为紧凑类型，wide 为数据放不下时改用的类型，decimals 为浮点列需保留的小数位。"""
+    dtype: str
+    wide: str = None
+    decimals: int = None
+
+
+COUNTER = Column('uint32', 'int64')
+LABEL = Column('category')
+KEY = Column('int32')
+
+SCHEMAS = {
+    'df_KPI': {
+        'cell_key': KEY,
+    },
+    'gdf_RAC': {
+        'cell_key': KEY,
+        '工作频段': LABEL,
+        '省份': LABEL,
+        '地市': LABEL,
+        '县区': LABEL,
+        '镇区': LABEL,
+        '村区': LABEL,
+    },
+    'df_BRP': {
+        '站型': LABEL,
+        '频段': LABEL,
+        'Model': LABEL,
+        'BBU功耗[千瓦时]': Column('float32', 'float64', decimals=4),
+        'BBU功耗(R1054_001)[W]': Column('float32', 'float64', decimals=4),
+        'gNB基站CPU平均负荷(R1056_001)[%]': Column('uint8', 'int64'),
+        'gNB基站CPU峰值负荷(R1056_002)[%]': Column('uint8', 'int64'),
+        '天线数量': Column('uint16', 'int64'),
+        'RRU总功耗': Column('float32', 'float64', decimals=4),
+    },
+}
+
+# 按列名模式登记的列：df_KPI 的计数器
+PATTERNS = {
+    'df_KPI': [
+        (re.compile(r'R\d{4}_\d{3}'), COUNTER),
+        (re.compile(r'K\d{4}_\d{3}'), Column('float32', 'float64', decimals=2)),
+    ],
+}
+
+
+def column_type(name, column):
+    """返回表 name 中列 column 的登记类型，未登记时返回 None。"""
+    spec = SCHEMAS.get(name, {}).get(column)
+    if spec is None and isinstance(column, str):
+        for pattern, candidate in PATTERNS.get(name, []):
+            if pattern.fullmatch(column):
+                return candidate
+    return spec
+
+
+def registered_decimals(column):
+    """列在任一表中登记的小数位，未登记时返回 None。"""
+    for name in SCHEMAS:
+        spec = column_type(name, column)
+        if spec is not None and spec.decimals is not None:
+            return spec.decimals
+    return None
+
+
+def fits(values, dtype, decimals=None):
+    """
+    判断数值数组能否无损转换为 dtype。
+
+    整数类型要求没有缺失值、都是整数且在取值范围内；float32 要求不溢出，
+    且转换误差小于 decimals 位小数舍入单位的二十分之一（未指定小数位时要求完全相等）。
+    """
+    dtype = np.dtype(dtype)
+    if values.dtype.kind not in 'biuf':
+        return False
+    if len(values) == 0:
+        return True
+    if dtype.kind in 'iu':
+        if values.dtype.kind == 'f' and (np.isnan(values).any() or (values != np.round(values)).any()):
+            return False
+        info = np.iinfo(dtype)
+        return values.min() >= info.min and values.max() <= info.max
+    if dtype.itemsize >= 8:
+        return True
+    converted = values.astype(dtype)
+    finite = np.isfinite(values)
+    if (np.isfinite(converted) != finite).any():
+        return False
+    error = np.abs(converted[finite].astype(np.float64) - values[finite])
+    return error.max(initial=0) <= (0.05 * 10.0 ** -decimals if decimals is not None else 0)
+
+
+def convert(series, spec, label=None):
+    """
+    按登记类型转换一列：放得下时用紧凑类型，否则用宽类型；已是目标类型时原样返回。
+
+    参数:
+    series (pd.Series): 待转换的列。
+    spec (Column): 登记的列类型。
+    label (str): 出错信息中的列名，默认为 series.name。
+
+    返回值:
+    pd.Series: 转换后的列。
+    """
+    if spec.dtype == 'category':
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_extension_array_dtype(series.dtype):
+        raise TypeError(f'{label or series.name}: 应为数值列，实际为 {series.dtype}')
+    values = series.to_numpy()
+    for dtype in (spec.dtype, spec.wide):
+        if dtype is None:
+            continue
+        if series.dtype == np.dtype(dtype):
+            return series
+        if fits(values, dtype, spec.decimals):
+            return series.astype(dtype)
+    types = ' / '.join(dtype for dtype in (spec.dtype, spec.wide) if dtype)
+    if values.dtype.kind == 'f' and np.isnan(values).any():
+        raise ValueError(f'{label or series.name}: 含有缺失值，不能转换为 {types}')
+    raise OverflowError(f'{label or series.name}: 数据超出 {types} 的范围')
+
+
+def fill_counters(df, name):
+    """把表 name 中按模式登记的计数器列（PATTERNS）的缺失值填为 0，用于合并计数器集合不同的报表或分区之后；没有缺失值时返回 df 本身。"""
+    columns = [column for column in df.columns
+               if isinstance(column, str) and any(pattern.fullmatch(column) for pattern, _ in PATTERNS.get(name, []))]
+    missing = [column for column in columns if df[column].isna().any()]
+    if not missing:
+        return df
+    df = df.copy(deep=False)
+    for column in missing:
+        df[column] = df[column].fillna(0)
+    return df
+
+
+def apply_schema(df, name):
+    """
+    按表 name 的登记类型转换 df 的列；未登记的表和列保持不变。
+
+    参数:
+    df (pd.DataFrame): 表数据。
+    name (str): 表名，例如 'df_KPI'。
+
+    返回值:
+    pd.DataFrame: 转换后的数据；没有需要转换的列时返回 df 本身。
+    """
+    if name not in SCHEMAS:
+        return df
+    changes = {}
+    for column in df.columns:
+        spec = column_type(name, column)
+        if spec is not None:
+            series = df[column]
+            converted = convert(series, spec, f'{name}.{column}')
+            if converted is not series:
+                changes[column] = converted
+    if not changes:
+        return df
+    df = df.copy(deep=False)
+    for column, series in changes.items():
+        df[column] = series
+    return df
+
+
+def widen(df, columns):
+    """
+    把 columns 中的紧凑数值列放宽为 int64/float64 后用于计算；都已是宽类型时返回 df 本身。
+    登记了小数位的 float32 列放宽后按小数位舍入。
+
+    参数:
+    df (pd.DataFrame): 数据。
+    columns (list): 参与计算的列，不在 df 中的列忽略。
+
+    返回值:
+    pd.DataFrame: 放宽后的数据，其余列与 df 共享。
+    """
+    changes = {}
+    for column in columns:
+        if column not in df.columns:
+            continue
+        dtype = df[column].dtype
+        if dtype.kind in 'iu' and dtype != np.int64:
+            changes[column] = df[column].astype(np.int64)
+        elif dtype.kind == 'f' and dtype != np.float64:
+            decimals = registered_decimals(column)
+            series = df[column].astype(np.float64)
+            changes[column] = series.round(decimals) if decimals is not None else series
+    if not changes:
+        return df
+    df = df.copy(deep=False)
+    for column, series in changes.items():
+        df[column] = series
+    return df
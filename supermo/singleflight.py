@@ -0,0 +1,130 @@
+"""跨会话合并相同的计算。
+
+多个用户同时打开同一页面、选择同样的筛选项时，每个会话都会各自筛选、求和并构建图表，
+早间出报表时 CPU 集中冲高。SingleFlight 按键（筛选条件与数据版本的指纹）合并并发的相同计算：
+同一个键同时只有一个会话在计算，其余会话等待并共用它的结果；同时进行的计算数不超过 max_workers，
+超出的计算排队等待空闲名额。
+
+计算抛出的普通异常同样交给等待的会话；页面重新运行等打断计算的 BaseException
+（Streamlit 的 RerunException / StopException）只属于发起计算的会话，等待的会话改为自己重新计算。
+计算函数中不要再调用同一个 SingleFlight，否则名额用尽时会相互等待。
+"""
+import threading
+import time
+
+import pandas as pd
+
+
+class _Call:
+    """一次进行中的计算。"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+
+class SingleFlight:
+    """
+    按键合并并发计算，并限制同时进行的计算数。
+
+    参数:
+    max_workers (int): 同时进行的计算数上限，None 表示不限制。
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.computes = 0  # 实际执行的计算
+        self.waits = 0  # 等待其他会话计算结果的次数
+        self.errors = 0
+        self.compute_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.queue_seconds = 0.0  # 等待计算名额的时间
+        self.peak = 0  # 同时进行的计算数峰值
+        self._running = 0
+        self._calls = {}  # 键 -> _Call
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers) if max_workers else None
+
+    def run(self, key, compute):
+        """
+        返回 compute() 的结果；同一个键已有计算进行中时等待并返回它的结果。
+
+        参数:
+        key (hashable): 计算的键。
+        compute (callable): 无参数的计算函数。
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                return self._compute(key, call, compute)
+            start = time.perf_counter()
+            call.done.wait()
+            with self._lock:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - start
+            if call.abandoned:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _compute(self, key, call, compute):
+        start = time.perf_counter()
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self.queue_seconds += time.perf_counter() - start
+            self._running += 1
+            self.peak = max(self.peak, self._running)
+        start = time.perf_counter()
+        try:
+            call.result = compute()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.computes += 1
+                self.errors += call.error is not None
+                self.compute_seconds += time.perf_counter() - start
+                del self._calls[key]
+            if self._slots is not None:
+                self._slots.release()
+            call.done.set()
+
+    def in_flight(self):
+        """进行中（含排队）的计算数。"""
+        with self._lock:
+            return len(self._calls)
+
+
+def flight_report(caches):
+    """
+    各共享缓存的命中、等待和计算次数。
+
+    参数:
+    caches (dict): 名称 -> 带 hits 属性和 flight（SingleFlight）属性的缓存，例如 ChartSpecCache。
+
+    返回值:
+    pd.DataFrame: 缓存、命中、等待、计算、出错、计算耗时(ms)、等待耗时(ms)、排队耗时(ms)、并发峰值。
+    """
+    rows = []
+    for name, cache in caches.items():
+        flight = cache.flight
+        rows.append({'缓存': name, '命中': cache.hits, '等待': flight.waits, '计算': flight.computes,
+                     '出错': flight.errors, '计算耗时(ms)': round(flight.compute_seconds * 1000, 1),
+                     '等待耗时(ms)': round(flight.wait_seconds * 1000, 1),
+                     '排队耗时(ms)': round(flight.queue_seconds * 1000, 1), '并发峰值': flight.peak})
+    return pd.DataFrame(rows, columns=['缓存', '命中', '等待', '计算', '出错', '计算耗时(ms)', '等待耗时(ms)',
+                                       '排队耗时(ms)', '并发峰值'])
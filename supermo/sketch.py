@@ -0,0 +1,189 @@
+"""可合并的分位数草图。
+
+数值按对数分桶计数（与 DDSketch 相同的分桶方式）：桶 k 覆盖 (γ^(k-1), γ^k]，γ = (1+α)/(1-α)，
+桶内的值以 2γ^k/(γ+1) 代表，与桶内任一值的相对误差不超过 α。两个草图合并只需把相同桶的计数相加，
+因此按小区、BBU 等细粒度预先保存的草图可以对任意子集合并，再求分位数和箱线图统计量，
+结果与直接用全部原始数据计算的相对误差不超过 α。
+计数、总和、最小值、最大值单独精确保存，均值和最值没有误差。
+
+桶号按数值顺序排列：正数为 OFFSET + k，负数为 -(OFFSET + k(|x|))，绝对值不超过 MIN_VALUE 的数记入桶 0。
+"""
+import numpy as np
+
+ALPHA = 0.005
+MIN_VALUE = 1e-9
+OFFSET = 1 << 20
+
+
+def _gamma(alpha):
+    return (1 + alpha) / (1 - alpha)
+
+
+def bucket_keys(values, alpha=ALPHA):
+    """数值所在的桶号（int32），values 应为有限值。"""
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    small = magnitude <= MIN_VALUE
+    k = np.ceil(np.log(np.where(small, 1.0, magnitude)) / np.log(_gamma(alpha))).astype(np.int64) + OFFSET
+    return np.where(small, 0, np.where(values > 0, k, -k)).astype(np.int32)
+
+
+def bucket_values(keys, alpha=ALPHA):
+    """桶的代表值。"""
+    keys = np.asarray(keys, dtype=np.int64)
+    gamma = _gamma(alpha)
+    value = 2 * gamma ** (np.abs(keys) - OFFSET).astype(np.float64) / (gamma + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * value)
+
+
+def bucket_bounds(keys, alpha=ALPHA):
+    """桶覆盖的数值范围 (下界, 上界)。"""
+    keys = np.asarray(keys, dtype=np.int64)
+    gamma = _gamma(alpha)
+    k = (np.abs(keys) - OFFSET).astype(np.float64)
+    low, high = gamma ** (k - 1), gamma ** k
+    lower = np.where(keys == 0, -MIN_VALUE, np.where(keys > 0, low, -high))
+    upper = np.where(keys == 0, MIN_VALUE, np.where(keys > 0, high, -low))
+    return lower, upper
+
+
+class QuantileSketch:
+    """
+    分位数草图。
+
+    参数:
+    keys (np.ndarray): 升序的桶号（int32）。
+    counts (np.ndarray): 各桶的计数（int64）。
+    count (int): 数值个数。
+    total (float): 数值总和。
+    minimum (float): 最小值。
+    maximum (float): 最大值。
+    alpha (float): 相对误差。
+    """
+
+    def __init__(self, keys, counts, count, total, minimum, maximum, alpha=ALPHA):
+        self.keys = keys
+        self.counts = counts
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+        self.alpha = alpha
+
+    @classmethod
+    def from_values(cls, values, alpha=ALPHA):
+        """由一组数值构建草图，忽略 NaN 和无穷值。"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        keys, counts = np.unique(bucket_keys(values, alpha), return_counts=True)
+        if len(values) == 0:
+            return cls(keys, counts.astype(np.int64), 0, 0.0, np.nan, np.nan, alpha)
+        return cls(keys, counts.astype(np.int64), len(values), float(values.sum()), float(values.min()),
+                   float(values.max()), alpha)
+
+    @classmethod
+    def merge_all(cls, sketches, alpha=ALPHA):
+        """合并多个草图（相对误差须相同）；没有草图时返回空草图。"""
+        sketches = [sketch for sketch in sketches if sketch.count]
+        if not sketches:
+            return cls(np.empty(0, np.int32), np.empty(0, np.int64), 0, 0.0, np.nan, np.nan, alpha)
+        if any(sketch.alpha != sketches[0].alpha for sketch in sketches):
+            raise ValueError('只能合并相对误差相同的草图')
+        keys, inverse = np.unique(np.concatenate([sketch.keys for sketch in sketches]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([sketch.counts for sketch in sketches]),
+                             minlength=len(keys)).astype(np.int64)
+        return cls(keys, counts, sum(sketch.count for sketch in sketches), sum(sketch.total for sketch in sketches),
+                   min(sketch.minimum for sketch in sketches), max(sketch.maximum for sketch in sketches),
+                   sketches[0].alpha)
+
+    def merge(self, other):
+        """与另一个草图合并，返回新草图。"""
+        return QuantileSketch.merge_all([self, other], self.alpha)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def values(self):
+        """各桶的代表值，限制在 [最小值, 最大值] 之间。"""
+        return np.clip(bucket_values(self.keys, self.alpha), self.minimum, self.maximum)
+
+    def quantile(self, q):
+        """
+        分位数（按秩线性插值，与 numpy.percentile 的默认方法一致）。
+
+        参数:
+        q (float or array-like): 0 到 1 之间的分位点。
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if not self.count:
+            return np.full(q.shape, np.nan)[()]
+        values = self.values()
+        ends = np.cumsum(self.counts)
+        rank = q * (self.count - 1)
+        lower, upper = np.floor(rank), np.ceil(rank)
+        low = values[np.searchsorted(ends, lower, side='right')]
+        high = values[np.searchsorted(ends, upper, side='right')]
+        return (low + (high - low) * (rank - lower))[()]
+
+    def box_stats(self, label=None, whis=1.5):
+        """
+        箱线图统计量，格式与 matplotlib.cbook.boxplot_stats 相同，可直接传给 Axes.bxp。
+
+        须线末端为四分位距 whis 倍范围内最远的值：与范围相交的桶取代表值（跨越范围边界的桶限制在边界上），
+        完全在范围外的桶的代表值作为异常点（每桶一个点）。四分位数的误差会使范围边界略有偏移，
+        紧贴边界的数值可能被画成须线末端而不是异常点（或相反）。
+        """
+        q1, med, q3 = self.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        low, high = q1 - whis * iqr, q3 + whis * iqr
+        values = self.values()
+        lower, upper = bucket_bounds(self.keys, self.alpha)
+        outside = (np.minimum(upper, self.maximum) < low) | (np.maximum(lower, self.minimum) > high)
+        inside = np.clip(values[~outside], low, high)
+        whislo = min(inside.min(initial=q1), q1)
+        whishi = max(inside.max(initial=q3), q3)
+        return {
+            'label': label,
+            'mean': self.mean,
+            'iqr': iqr,
+            'q1': q1,
+            'med': med,
+            'q3': q3,
+            'whislo': whislo,
+            'whishi': whishi,
+            'fliers': values[outside],
+            'cilo': med - 1.57 * iqr / np.sqrt(self.count),
+            'cihi': med + 1.57 * iqr / np.sqrt(self.count),
+        }
+
+
+def group_sketches(values, groups, alpha=ALPHA):
+    """
+    按分组一次构建各组的草图。
+
+    参数:
+    values (array-like): 数值，NaN 和无穷值不计入。
+    groups (array-like): 与 values 等长的分组编码（非负整数）。
+
+    返回值:
+    dict: 分组编码 -> QuantileSketch。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups, dtype=np.int64)
+    finite = np.isfinite(values)
+    values, groups = values[finite], groups[finite]
+    keys = bucket_keys(values, alpha)
+    order = np.lexsort((keys, groups))
+    values, groups, keys = values[order], groups[order], keys[order]
+
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]) if len(groups) else np.empty(0, np.int64)
+    ends = np.r_[starts[1:], len(groups)]
+    sketches = {}
+    for start, end in zip(starts, ends):
+        group_values = values[start:end]
+        bucket, counts = np.unique(keys[start:end], return_counts=True)
+        sketches[int(groups[start])] = QuantileSketch(bucket, counts.astype(np.int64), end - start,
+                                                      float(group_values.sum()), float(group_values.min()),
+                                                      float(group_values.max()), alpha)
+    return sketches
@@ -0,0 +1,120 @@
+"""小区到村级行政区的空间归属。
+
+空间索引建立在二进制边界存储的原始精度层上（见 supermo.boundaries），
+各坐标的归属结果缓存在输出目录，边界文件未变化时直接复用；坐标按 COORD_DECIMALS
+位小数取整作为缓存键，重新整理时只有新增或移动过的 RRU 需要做空间查询。
+落在多边形边界上或不在任何多边形内的坐标单独标记，供整理时报告。
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+
+from supermo.boundaries import FULL, REGIONS, ensure_boundary_store, load_boundaries
+
+CACHE_NAME = '_region_cache.pkl'
+COORD_DECIMALS = 6
+COORD_COLUMNS = ['Longitude', 'Latitude']
+
+# 归属状态
+STATUS = '归属'
+INSIDE = '区域内'
+EDGE = '边界上'
+OUTSIDE = '区域外'
+
+
+def coordinate_keys(df):
+    """按 COORD_DECIMALS 取整后的经纬度，作为归属缓存的键。"""
+    return pd.DataFrame({column: pd.to_numeric(df[column], errors='coerce').round(COORD_DECIMALS).to_numpy()
+                         for column in COORD_COLUMNS})
+
+
+class BoundaryIndex:
+    """
+    村级边界的空间索引和坐标归属缓存。
+
+    参数:
+    boundaries (gpd.GeoDataFrame): 村级边界，包含 REGIONS 列和多边形。
+    source (list): 边界文件签名，见 supermo.boundaries.source_signature。
+    """
+
+    def __init__(self, boundaries, source=None):
+        self.source = source
+        self.crs = boundaries.crs
+        self.regions = pd.DataFrame(boundaries[REGIONS]).reset_index(drop=True)
+        self.tree = STRtree(np.asarray(boundaries.geometry.values))
+        self.assignments = pd.DataFrame(columns=COORD_COLUMNS + REGIONS + [STATUS])
+        self._dirty = False
+
+    @classmethod
+    def load(cls, directory, path):
+        """
+        从输出目录的边界存储建立索引，并载入与当前边界文件对应的归属缓存。
+
+        参数:
+        directory (str): 输出目录。
+        path (str): 边界 GeoJSON 文件路径，未转换或已变化时先转换为边界存储。
+        """
+        source = ensure_boundary_store(path, directory)
+        index = cls(load_boundaries(directory, FULL), source)
+        cache_path = os.path.join(directory, CACHE_NAME)
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if cache['source'] == source:
+                index.assignments = cache['assignments']
+        return index
+
+    def save(self, directory):
+        """归属缓存有变化时写回输出目录。"""
+        if not self._dirty:
+            return
+        cache_path = os.path.join(directory, CACHE_NAME)
+        with open(cache_path + '.tmp', 'wb') as f:
+            pickle.dump({'source': self.source, 'assignments': self.assignments}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_path + '.tmp', cache_path)
+        self._dirty = False
+
+    def _query(self, keys):
+        """对缓存中没有的坐标做空间查询，返回与 assignments 同结构的结果。"""
+        points = shapely.points(keys['Longitude'].to_numpy(), keys['Latitude'].to_numpy())
+        point_idx, polygon_idx = self.tree.query(points, predicate='within')
+        inside = keys.iloc[point_idx].reset_index(drop=True)
+        inside = pd.concat([inside, self.regions.iloc[polygon_idx].reset_index(drop=True)], axis=1)
+        inside[STATUS] = INSIDE
+
+        rest = np.setdiff1d(np.arange(len(keys)), point_idx)
+        touching = np.unique(self.tree.query(points[rest], predicate='intersects')[0])
+        others = keys.iloc[rest].reset_index(drop=True)
+        others[STATUS] = OUTSIDE
+        others.loc[touching, STATUS] = EDGE
+        return pd.concat([inside, others], ignore_index=True)
+
+    def assign(self, df):
+        """
+        按坐标为每行确定行政区。
+
+        参数:
+        df (pd.DataFrame): 包含 Longitude、Latitude 列的数据。
+
+        返回值:
+        pd.DataFrame: df 的各列加上取整坐标对应的 REGIONS 和归属状态；
+            一个坐标落在多个多边形内时有多行，边界上和区域外的坐标 REGIONS 为空。
+        """
+        keys = coordinate_keys(df).dropna().drop_duplicates()
+        known = keys.merge(self.assignments[COORD_COLUMNS].drop_duplicates(), how='left', indicator=True)
+        new_keys = known.loc[known['_merge'] == 'left_only', COORD_COLUMNS]
+        if not new_keys.empty:
+            self.assignments = pd.concat([self.assignments, self._query(new_keys)], ignore_index=True)
+            self._dirty = True
+
+        rows = df.reset_index(drop=True)
+        rounded = coordinate_keys(rows)
+        merged = pd.concat([rows, rounded.add_prefix('_')], axis=1).merge(
+            self.assignments.rename(columns={column: '_' + column for column in COORD_COLUMNS}),
+            on=['_' + column for column in COORD_COLUMNS], how='left')
+        merged[STATUS] = merged[STATUS].fillna(OUTSIDE)
+        return merged.drop(columns=['_' + column for column in COORD_COLUMNS])
@@ -0,0 +1,132 @@
+"""基于 DuckDB 的嵌入式查询后端。
+
+把地域筛选、时间范围、KPI 与小区表的连接以及计数器求和下推为一条 SQL，
+由 DuckDB 在进程内多线程向量化执行，直接扫描 Arrow 文件，
+不在 pandas 中生成完整的连接结果。duckdb 为可选依赖，未安装时 available() 返回 False，
+页面继续使用 pandas 路径。
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from supermo.cells import KEY
+from supermo.kpi import COUNTER_PATTERN, KPIS
+from supermo.rollup import ALL
+from supermo.schema import registered_decimals
+from supermo.store import (PARTITION_COLUMN, TABLE_SUFFIX, partition_dir, read_partition_meta,
+                           select_partitions, table_path, versioned)
+
+try:
+    import duckdb
+except ImportError:  # 可选依赖
+    duckdb = None
+
+
+def available():
+    """是否可以使用 DuckDB 查询后端。"""
+    return duckdb is not None
+
+
+def quote(identifier):
+    """SQL 标识符加双引号。"""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def kpi_expression(name):
+    """KPI 公式对应的逐行 SQL 表达式，计数器取自 KPI 表（别名 k），以 DOUBLE 计算避免紧凑整数类型溢出。"""
+    return COUNTER_PATTERN.sub(lambda m: f'CAST(k.{quote(m.group())} AS DOUBLE)', KPIS[name].expression)
+
+
+def column_value(column, field_type):
+    """求和前的列值：float32 计数器按登记的小数位舍入为 DOUBLE，与 supermo.schema.widen 一致。"""
+    decimals = registered_decimals(column) if pa.types.is_float32(field_type) else None
+    if decimals is None:
+        return f'k.{quote(column)}'
+    return f'ROUND(CAST(k.{quote(column)} AS DOUBLE), {decimals})'
+
+
+def arrow_dataset(directory, name, date_range=None):
+    """
+    打开表对应的 Arrow 文件；分区表只包含与日期范围相交的分区。
+    与 supermo.store 一致不使用内存映射，查询结束后不再占用文件，Data_org_v1 可以替换。
+
+    返回值:
+    pyarrow.dataset.Dataset: 表的数据集，多个分区的字段取并集。
+    """
+    local = fs.LocalFileSystem(use_mmap=False)
+    if os.path.exists(table_path(directory, name)):
+        paths = [table_path(directory, name)]
+    else:
+        meta = read_partition_meta(directory, name)
+        paths = [os.path.join(partition_dir(directory, name), key + TABLE_SUFFIX)
+                 for key in select_partitions(meta, date_range)]
+    schemas = []
+    for path in paths:
+        with local.open_input_file(path) as source:
+            schemas.append(pa.ipc.open_file(source).schema)
+    schema = pa.unify_schemas(schemas, promote_options='permissive') if paths else None
+    return ds.dataset(paths, schema=schema, format='ipc', filesystem=local)
+
+
+def query_counter_sums(directory, selection, date_range=None, counters=(), aggregates=None,
+                       how='inner', kpi_name='df_KPI', rac_name='gdf_RAC', version=None):
+    """
+    一条 SQL 完成筛选、连接和按开始时间求和。
+
+    与 pandas 路径一致，KPI 行按 cell_key 与小区表的每一行连接（同一小区在小区表中
+    出现多次时按出现次数重复计入）；how='left' 时保留小区表中没有的 KPI 行。
+
+    参数:
+    directory (str): 数据目录。
+    selection (dict): 小区表各列的选择值，'全部' 表示不筛选。
+    date_range (tuple): (开始日期, 结束日期)，包含两端；None 表示全部日期。
+    counters (list): 需要求和的计数器列。
+    aggregates (dict): 额外的聚合列 {列名: SQL 聚合表达式}，
+        例如 {'cell_key': 'COUNT(DISTINCT cell_key)'}。
+    how (str): 'inner' 或 'left'。
+    version (str): 数据版本，读取时目录正在写出或版本已变化则抛出 VersionMismatch（见 supermo.store.versioned）。
+
+    返回值:
+    pd.DataFrame: 开始时间、计数器之和及额外聚合列，按开始时间排序；日期范围内没有分区时为空表。
+    """
+    with versioned(directory, version):
+        kpi = arrow_dataset(directory, kpi_name, date_range)
+        if not kpi.files:
+            return pd.DataFrame({PARTITION_COLUMN: pd.Series(dtype='datetime64[ns]'),
+                                 **{column: pd.Series(dtype='float64') for column in [*counters, *(aggregates or {})]}})
+        rac = arrow_dataset(directory, rac_name)
+        selected = {level: value for level, value in selection.items() if value != ALL}
+
+        types = {field.name: field.type for field in kpi.schema}
+        sums = [f'CAST(SUM({column_value(c, types[c])}) AS {"BIGINT" if pa.types.is_integer(types[c]) else "DOUBLE"}) AS {quote(c)}'
+                for c in counters]
+        sums += [f'{expression} AS {quote(column)}' for column, expression in (aggregates or {}).items()]
+
+        conditions, params = [], []
+        for level, value in selected.items():
+            conditions.append(f'r.{quote(level)} = ?')
+            params.append(value)
+        if date_range is not None:
+            conditions.append(f'k.{quote(PARTITION_COLUMN)} BETWEEN ? AND ?')
+            params.extend(date_range)
+
+        columns = [f'k.{quote(PARTITION_COLUMN)}'] + sums
+        join = 'LEFT JOIN' if how == 'left' and not selected else 'JOIN'
+        sql = (f'SELECT {", ".join(columns)} '
+               f'FROM kpi k {join} (SELECT {quote(KEY)}{"".join(", " + quote(level) for level in selected)} FROM rac) r '
+               f'USING ({quote(KEY)}) '
+               + (f'WHERE {" AND ".join(conditions)} ' if conditions else '')
+               + 'GROUP BY 1 ORDER BY 1')
+
+        con = duckdb.connect()
+        try:
+            con.register('kpi', kpi)
+            con.register('rac', rac)
+            df = con.execute(sql, params).df()
+        finally:
+            con.close()
+        df[PARTITION_COLUMN] = pd.to_datetime(df[PARTITION_COLUMN])
+        return df
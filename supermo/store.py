@@ -0,0 +1,490 @@
+"""列式数据存储：Data_org_v1 与看板页面之间的数据交接。
+
+表以 Arrow IPC (Feather V2) 文件保存，不压缩，读取时只加载所需列，
+数值列无需解析即可直接使用。CSV 仅作为可选导出保留。
+
+表先写到 .tmp 文件再替换原文件。Windows 下文件在内存映射释放前不能被替换或删除，
+而页面（DatasetService 同时保留两个版本）会长时间持有读到的列，所以读取默认不使用
+内存映射，读完即关闭文件；读者恰好正在打开文件时，替换和删除短暂重试。
+
+Data_org_v1 一次整理要写出多张表、汇总立方体、草图和位图，中间状态不能被页面当作新版本读取。
+整理开始时 begin_write 在 _version.json 中标记“正在写出”，全部写完后 publish_version 发布新版本；
+dataset_version 返回已发布的版本，按版本读取的函数用 versioned 在读取前后检查版本，
+目录正在写出或已发布新版本时抛出 VersionMismatch。没有 _version.json 的目录（旧数据目录）
+按表文件的大小和修改时间计算版本。
+
+df_KPI 按开始时间分区保存（每月或每日一个文件），分区的日期范围记录在
+_partitions.json 中，读取时只打开与所选时间范围相交的分区。
+
+df_KPI、gdf_RAC、df_BRP 的列类型在写出和读取时都按 supermo.schema 的登记转换为紧凑类型。
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from supermo.schema import apply_schema, fill_counters
+
+TABLE_SUFFIX = '.arrow'
+DATE_COLUMNS = ['开始时间', '结束时间']
+DATA_DIR_ENV = 'SUPERMO_DATA_DIR'
+REPLACE_RETRIES = 10
+VERSION_FILE = '_version.json'
+
+
+class VersionMismatch(RuntimeError):
+    """数据目录正在写出，或已发布了与读者请求的版本不同的新版本。"""
+
+
+def data_directory(default):
+    """页面的数据目录：设置了环境变量 SUPERMO_DATA_DIR 时使用该目录（如基准测试的合成数据），否则为 default。"""
+    return os.environ.get(DATA_DIR_ENV) or default
+
+
+def table_path(directory, name):
+    """返回表文件路径。"""
+    return os.path.join(directory, name + TABLE_SUFFIX)
+
+
+def _retry(func, *args):
+    """执行文件替换或删除；文件正被其他进程打开（Windows 下为 PermissionError）时稍后重试。"""
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            return func(*args)
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+def replace(source, target):
+    """用 source 替换 target，见 _retry。"""
+    _retry(os.replace, source, target)
+
+
+def file_version(directory):
+    """由目录下所有表文件的路径、大小和修改时间计算的版本标识，任一表重新写出后即改变。"""
+    entries = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith(TABLE_SUFFIX) or file == PARTITION_META:
+                stat = os.stat(os.path.join(root, file))
+                entries.append(f'{os.path.relpath(os.path.join(root, file), directory)}:{stat.st_size}:{stat.st_mtime_ns}')
+    return hashlib.sha1('\n'.join(sorted(entries)).encode('utf-8')).hexdigest()[:16]
+
+
+def read_version_marker(directory):
+    """读取 _version.json，不存在时返回 None。"""
+    path = os.path.join(directory, VERSION_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_version_marker(directory, marker):
+    """写入 _version.json（先写临时文件再替换）。"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, VERSION_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(marker, f, ensure_ascii=False, indent=1)
+    replace(path + '.tmp', path)
+
+
+def begin_write(directory):
+    """
+    标记数据目录正在写出，Data_org_v1 在写出任何表之前调用；保留上次发布的版本。
+
+    写出中断时标记保留到下一次整理成功发布为止，期间页面只使用已缓存的旧版本数据。
+    """
+    marker = read_version_marker(directory)
+    version = marker['version'] if marker is not None else file_version(directory)
+    write_version_marker(directory, {'version': version, 'writing': True, 'started': datetime.now().isoformat()})
+
+
+def publish_version(directory):
+    """
+    发布数据目录的新版本，Data_org_v1 在最后一步（所有表、立方体、草图和位图都写完后）调用。
+
+    返回值:
+    str: 新版本标识。
+    """
+    version = file_version(directory)
+    write_version_marker(directory, {'version': version, 'writing': False, 'published': datetime.now().isoformat()})
+    return version
+
+
+def dataset_version(directory):
+    """
+    返回数据目录已发布的版本标识，可作为缓存键使用。
+
+    目录正在写出时仍为上次发布的版本；没有 _version.json 的目录为 file_version。
+    """
+    marker = read_version_marker(directory)
+    return marker['version'] if marker is not None else file_version(directory)
+
+
+def check_version(directory, version):
+    """目录正在写出，或已发布的版本不是 version 时抛出 VersionMismatch；version 为 None 时不检查。"""
+    if version is None:
+        return
+    marker = read_version_marker(directory)
+    if marker is not None and marker.get('writing'):
+        raise VersionMismatch(f'{directory}: 数据正在写出')
+    current = marker['version'] if marker is not None else file_version(directory)
+    if current != version:
+        raise VersionMismatch(f'{directory}: 数据版本已由 {version} 变为 {current}')
+
+
+@contextmanager
+def versioned(directory, version):
+    """
+    按版本读取：读取前后各检查一次版本（见 check_version），读取中途目录开始写出或发布新版本时
+    抛出 VersionMismatch，不返回新旧混合的结果。读取出错时先检查版本，版本已变化时报告版本变化。
+    """
+    check_version(directory, version)
+    try:
+        yield
+    except Exception:
+        check_version(directory, version)
+        raise
+    check_version(directory, version)
+
+
+def to_arrow(df, name=None):
+    """将 DataFrame 转换为带明确类型的 Arrow 表，日期列统一为 date32，已登记的表按登记类型转换各列。"""
+    df = pd.DataFrame(df)  # GeoDataFrame 等子类按普通 DataFrame 处理
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce').dt.normalize()
+    df = apply_schema(df, name)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for column in DATE_COLUMNS:
+        if column in table.column_names:
+            i = table.schema.get_field_index(column)
+            table = table.set_column(i, column, table.column(i).cast(pa.date32()))
+    return table
+
+
+def save_table(df, directory, name, export_csv=False):
+    """
+    保存 DataFrame 为列式表文件。
+
+    参数:
+    df (pd.DataFrame): 待保存的数据。
+    directory (str): 输出目录。
+    name (str): 表名，例如 'df_KPI'。
+    export_csv (bool): 是否同时导出 UTF-8-SIG 编码的 CSV 文件。
+
+    返回值:
+    str: 表文件路径。
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, name)
+    tmp_path = path + '.tmp'
+    feather.write_feather(to_arrow(df, name), tmp_path, compression='uncompressed')
+    replace(tmp_path, path)
+    if export_csv:
+        df.to_csv(os.path.join(directory, name + '.csv'), index=False, encoding='utf-8-sig')
+    return path
+
+
+def table_equals(df, directory, name):
+    """判断 DataFrame 与已保存的表内容是否相同，表不存在时返回 False。"""
+    if not os.path.exists(table_path(directory, name)):
+        return False
+    return to_arrow(df, name).equals(read_arrow(directory, name, memory_map=False))
+
+
+def normalize_dates(df):
+    """将日期列统一转换为 datetime64，便于与已保存的数据合并去重。"""
+    df = df.copy()
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce').dt.normalize()
+    return df
+
+
+def append_table(df, directory, name, keys):
+    """
+    将新数据追加到已保存的表，按 keys 去重，同键时保留新数据。
+
+    参数:
+    df (pd.DataFrame): 新数据。
+    directory (str): 数据目录。
+    name (str): 表名。
+    keys (list): 唯一键列，例如 ['NB', '开始时间']。
+
+    返回值:
+    pd.DataFrame: 追加去重后的完整表。
+    """
+    df = normalize_dates(df)
+    if os.path.exists(table_path(directory, name)):
+        existing = load_table(directory, name, memory_map=False)
+        df = pd.concat([existing, df], ignore_index=True).drop_duplicates(subset=keys, keep='last')
+        df = fill_counters(df, name)  # 新旧数据的计数器集合可能不同
+    save_table(df, directory, name)
+    return df
+
+
+def read_arrow(directory, name, columns=None, memory_map=False):
+    """读取表，只加载所需列，返回 Arrow 表。默认不使用内存映射，读完即关闭文件。"""
+    columns = list(dict.fromkeys(columns)) if columns else None
+    return feather.read_table(table_path(directory, name), columns=columns, memory_map=memory_map)
+
+
+def load_table(directory, name, columns=None, memory_map=False):
+    """
+    读取表为 DataFrame。
+
+    优先读取列式表文件，其次读取同名分区表，最后回退读取同名 CSV 文件。
+
+    参数:
+    directory (str): 数据目录。
+    name (str): 表名，例如 'gdf_RAC'。
+    columns (list): 需要读取的列，None 表示全部列。
+    memory_map (bool): 是否以内存映射方式读取；被映射的文件在 Windows 下不能被替换，只用于不会再写出的文件。
+
+    返回值:
+    pd.DataFrame: 读取的数据，日期列为 datetime64 类型，已登记的表各列为登记类型。
+    """
+    if os.path.exists(table_path(directory, name)):
+        table = read_arrow(directory, name, columns, memory_map)
+        return apply_schema(table.to_pandas(date_as_object=False, split_blocks=True), name)
+    if read_partition_meta(directory, name) is not None:
+        return load_partitioned(directory, name, columns)
+    columns = list(dict.fromkeys(columns)) if columns else None
+    df = pd.read_csv(os.path.join(directory, name + '.csv'), encoding='utf-8-sig', usecols=columns)
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return apply_schema(df, name)
+
+
+# ---------------------------------------------------------------------------
+# 按日期分区的表（df_KPI）
+# ---------------------------------------------------------------------------
+
+PARTITION_COLUMN = '开始时间'
+PARTITION_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m'}
+PARTITION_META = '_partitions.json'
+
+
+def partition_dir(directory, name):
+    """返回分区表目录。"""
+    return os.path.join(directory, name)
+
+
+def read_partition_meta(directory, name):
+    """读取分区元数据，不存在时返回 None。"""
+    path = os.path.join(partition_dir(directory, name), PARTITION_META)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_partition_meta(directory, name, meta):
+    """写入分区元数据。"""
+    path = os.path.join(partition_dir(directory, name), PARTITION_META)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    replace(path + '.tmp', path)
+
+
+def write_partition(directory, name, key, df, meta):
+    """写入单个分区文件，并更新元数据中该分区的日期范围和行数。"""
+    path = os.path.join(partition_dir(directory, name), key + TABLE_SUFFIX)
+    table = to_arrow(df, name)
+    feather.write_feather(table, path + '.tmp', compression='uncompressed')
+    replace(path + '.tmp', path)
+    dates = table.column(PARTITION_COLUMN)
+    meta['partitions'][key] = {
+        'min': pc.min(dates).as_py().isoformat(),
+        'max': pc.max(dates).as_py().isoformat(),
+        'rows': table.num_rows,
+    }
+
+
+def save_partitioned(df, directory, name, by='month', export_csv=False):
+    """
+    按开始时间分区保存表，每个分区一个列式文件。
+
+    分区先写到临时目录 <name>.tmp，全部写完后再替换原分区目录；写出中途出错时原有分区保持不变。
+
+    参数:
+    df (pd.DataFrame): 待保存的数据，需包含开始时间列。
+    directory (str): 输出目录。
+    name (str): 表名，例如 'df_KPI'。
+    by (str): 分区粒度，'day' 或 'month'。
+    export_csv (bool): 是否同时导出 UTF-8-SIG 编码的 CSV 文件。
+
+    返回值:
+    dict: 分区元数据。
+    """
+    table_dir = partition_dir(directory, name)
+    staging = table_dir + '.tmp'
+    if os.path.exists(staging):  # 上次写出中断留下的临时目录
+        _retry(shutil.rmtree, staging)
+    os.makedirs(partition_dir(staging, name))
+
+    meta = {'by': by, 'partitions': {}}
+    keys = pd.to_datetime(df[PARTITION_COLUMN]).dt.strftime(PARTITION_FORMATS[by])
+    try:
+        for key, part in df.groupby(keys, sort=True):
+            write_partition(staging, name, key, part, meta)
+        write_partition_meta(staging, name, meta)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # 原分区目录先移入临时目录，新分区目录再移到原位置，最后删除整个临时目录
+    if os.path.exists(table_dir):
+        replace(table_dir, os.path.join(staging, name + '.old'))
+    replace(partition_dir(staging, name), table_dir)
+    _retry(shutil.rmtree, staging)
+
+    if export_csv:
+        df.to_csv(os.path.join(directory, name + '.csv'), index=False, encoding='utf-8-sig')
+    return meta
+
+
+def append_partitioned(df, directory, name, keys, by='month'):
+    """
+    将新数据追加到分区表，只重写涉及的分区，分区内按 keys 去重，同键时保留新数据。
+
+    参数:
+    df (pd.DataFrame): 新数据，需包含开始时间列。
+    directory (str): 数据目录。
+    name (str): 表名，例如 'df_KPI'。
+    keys (list): 唯一键列，例如 ['cell_key', '开始时间']。
+    by (str): 表尚不存在时使用的分区粒度。
+
+    返回值:
+    list: 重写的分区名。
+    """
+    meta = read_partition_meta(directory, name)
+    if meta is None:
+        return sorted(save_partitioned(df, directory, name, by=by)['partitions'])
+
+    df = normalize_dates(df)
+    touched = []
+    keys_by_partition = df[PARTITION_COLUMN].dt.strftime(PARTITION_FORMATS[meta['by']])
+    for key, part in df.groupby(keys_by_partition, sort=True):
+        if key in meta['partitions']:
+            path = os.path.join(partition_dir(directory, name), key + TABLE_SUFFIX)
+            existing = feather.read_table(path, memory_map=False).to_pandas(date_as_object=False)
+            part = pd.concat([existing, part], ignore_index=True).drop_duplicates(subset=keys, keep='last')
+            part = fill_counters(part, name)  # 新报表增加或缺少计数器时，另一部分的行记为 0
+        write_partition(directory, name, key, part, meta)
+        touched.append(key)
+    write_partition_meta(directory, name, meta)
+    return touched
+
+
+def partition_date_bounds(directory, name, version=None):
+    """根据分区元数据返回表的最早和最晚日期，无需读取数据；不是分区表或没有分区时返回 None。version 见 versioned。"""
+    with versioned(directory, version):
+        meta = read_partition_meta(directory, name)
+    if meta is None or not meta['partitions']:
+        return None
+    partitions = meta['partitions'].values()
+    return (
+        date.fromisoformat(min(p['min'] for p in partitions)),
+        date.fromisoformat(max(p['max'] for p in partitions)),
+    )
+
+
+def select_partitions(meta, date_range=None):
+    """返回与日期范围有交集的分区名列表。"""
+    keys = sorted(meta['partitions'])
+    if date_range is None:
+        return keys
+    start, end = (d.isoformat() for d in date_range)
+    return [k for k in keys if meta['partitions'][k]['max'] >= start and meta['partitions'][k]['min'] <= end]
+
+
+def read_partitioned_arrow(directory, name, columns=None, date_range=None):
+    """
+    只读取与日期范围相交的分区，并在分区内按日期过滤，返回 Arrow 表。
+
+    参数:
+    directory (str): 数据目录。
+    name (str): 表名。
+    columns (list): 需要读取的列，None 表示全部列。
+    date_range (tuple): (开始日期, 结束日期)，包含两端；None 表示全部日期。
+    """
+    meta = read_partition_meta(directory, name)
+    columns = list(dict.fromkeys(columns)) if columns else None
+    read_columns = columns
+    if columns and date_range is not None and PARTITION_COLUMN not in columns:
+        read_columns = columns + [PARTITION_COLUMN]
+
+    tables = []
+    for key in select_partitions(meta, date_range):
+        path = os.path.join(partition_dir(directory, name), key + TABLE_SUFFIX)
+        present = read_columns
+        if read_columns:
+            # 较早的分区可能没有之后的报表新增的计数器，只读取分区中存在的列，合并时其余列为空值
+            with pa.OSFile(path) as source:
+                names = set(pa.ipc.open_file(source).schema.names)
+            present = [column for column in read_columns if column in names]
+        table = feather.read_table(path, columns=present, memory_map=False)
+        info = meta['partitions'][key]
+        if date_range is not None and (info['min'] < date_range[0].isoformat() or info['max'] > date_range[1].isoformat()):
+            dates = table.column(PARTITION_COLUMN)
+            mask = pc.and_(pc.greater_equal(dates, pa.scalar(date_range[0], pa.date32())),
+                           pc.less_equal(dates, pa.scalar(date_range[1], pa.date32())))
+            table = table.filter(mask)
+        tables.append(table)
+
+    if not tables:
+        return None
+    # 个别分区的计数器可能因数据超出紧凑类型的范围而保存为宽类型，合并时统一放宽
+    table = pa.concat_tables(tables, promote_options='permissive')
+    return table.select(columns) if columns else table
+
+
+def load_partitioned(directory, name, columns=None, date_range=None):
+    """读取分区表为 DataFrame，参数同 read_partitioned_arrow；已登记的表各列为登记类型。"""
+    table = read_partitioned_arrow(directory, name, columns, date_range)
+    if table is None:
+        return pd.DataFrame(columns=columns)
+    return apply_schema(fill_counters(table.to_pandas(date_as_object=False, split_blocks=True), name), name)
+
+
+def load_partitioned_dates(directory, name, dates, columns=None):
+    """
+    读取分区表中 dates 各日期的行，只打开包含这些日期的分区；表不存在时返回空表。
+
+    参数:
+    directory (str): 数据目录。
+    name (str): 表名。
+    dates (iterable): 日期，可以不连续、有重复。
+    columns (list): 需要读取的列，None 表示全部列。
+
+    返回值:
+    pd.DataFrame: 这些日期的行。
+    """
+    meta = read_partition_meta(directory, name)
+    dates = pd.Series(pd.to_datetime(pd.Series(list(dates), dtype=object)).dt.normalize().dropna().unique())
+    if meta is None or dates.empty:
+        return pd.DataFrame(columns=columns)
+    read_columns = list(dict.fromkeys(columns + [PARTITION_COLUMN])) if columns else None
+    frames = []
+    for _, group in dates.groupby(dates.dt.strftime(PARTITION_FORMATS[meta['by']])):
+        df = load_partitioned(directory, name, read_columns, date_range=(group.min().date(), group.max().date()))
+        if not df.empty:
+            frames.append(df[df[PARTITION_COLUMN].isin(group)])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    return df[columns] if columns else df
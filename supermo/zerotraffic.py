@@ -0,0 +1,238 @@
+"""逐小区逐日的零流量位图。
+
+数据整理时为每个开始时间保存两张按 cell_key 排列的位图：当天数据业务流量为 0 的小区，
+以及当天有 KPI 数据的小区。任意地域筛选下每天的零流量小区数和小区数都是位图与所选小区掩码
+按位与后的 popcount，不必在页面上合并逐行数据再做 nunique；“连续 N 天零流量”的小区
+也可以直接在位图上逐日扫描得到。
+
+位图以表 zero_traffic 保存在数据目录中，每天一行：开始时间、小区数（位数）、零流量、有数据
+（numpy.packbits 打包的字节）。小区维表追加新小区后，旧日期的位图在读取时按新小区数补零。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from supermo.cells import KEY
+from supermo.kpi import counters_for, evaluate_kpis
+from supermo.store import load_partitioned, load_table, save_table, table_path, versioned
+
+ZERO_TRAFFIC_NAME = 'zero_traffic'
+TRAFFIC_KPI = '数据业务流量'
+TIME_COLUMN = '开始时间'
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(a):
+        """每个字节中为 1 的位数。"""
+        return np.bitwise_count(a)
+else:  # numpy < 2.0
+    _POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(a):
+        """每个字节中为 1 的位数。"""
+        return _POPCOUNT[a]
+
+
+def _nbytes(cells):
+    return (cells + 7) // 8
+
+
+class ZeroTrafficBitmap:
+    """
+    零流量位图。
+
+    参数:
+    dates (array-like): 升序的开始时间，每天一行位图。
+    zero (np.ndarray): uint8 数组 (天数, 字节数)，当天零流量的小区。
+    present (np.ndarray): uint8 数组 (天数, 字节数)，当天有数据的小区。
+    cells (int): 位图覆盖的小区数（cell_key 取值 0 .. cells-1）。
+    """
+
+    def __init__(self, dates, zero, present, cells):
+        self.dates = pd.DatetimeIndex(dates)
+        self.zero = zero
+        self.present = present
+        self.cells = cells
+
+    @classmethod
+    def from_kpi(cls, df_kpi, cells=None):
+        """
+        由 df_KPI 构建位图；同一小区同一天有多行时，任一行流量为 0 即记为零流量。
+
+        参数:
+        df_kpi (pd.DataFrame): 包含 cell_key、开始时间和数据业务流量所需计数器的 KPI 数据。
+        cells (int): 小区数，默认为最大 cell_key + 1。
+        """
+        df_kpi = df_kpi[df_kpi[KEY] >= 0]
+        keys = df_kpi[KEY].to_numpy(np.int64)
+        traffic = evaluate_kpis(df_kpi[counters_for([TRAFFIC_KPI])], [TRAFFIC_KPI], decimals=None)[TRAFFIC_KPI]
+        zero_rows = (traffic == 0).to_numpy()
+        dates, day = np.unique(pd.to_datetime(df_kpi[TIME_COLUMN]).dt.normalize().to_numpy(), return_inverse=True)
+        cells = int(cells or keys.max(initial=-1) + 1)
+
+        present = np.zeros((len(dates), cells), dtype=bool)
+        present[day, keys] = True
+        zero = np.zeros_like(present)
+        zero[day[zero_rows], keys[zero_rows]] = True
+        return cls(dates, np.packbits(zero, axis=1), np.packbits(present, axis=1), cells)
+
+    @classmethod
+    def load(cls, directory, version=None):
+        """读取数据目录中的位图，不存在时返回 None；version 为数据版本，见 supermo.store.versioned。"""
+        with versioned(directory, version):
+            if not has_zero_traffic(directory):
+                return None
+            table = load_table(directory, ZERO_TRAFFIC_NAME, memory_map=False)
+        cells = int(table['小区数'].max()) if len(table) else 0
+        width = _nbytes(cells)
+
+        def stack(column):
+            rows = np.zeros((len(table), width), dtype=np.uint8)
+            for i, data in enumerate(table[column]):
+                row = np.frombuffer(data, dtype=np.uint8)
+                rows[i, :len(row)] = row
+            return rows
+
+        return cls(table[TIME_COLUMN], stack('零流量'), stack('有数据'), cells)
+
+    def save(self, directory):
+        """保存位图，返回天数。"""
+        table = pd.DataFrame({
+            TIME_COLUMN: self.dates,
+            '小区数': np.full(len(self.dates), self.cells, dtype=np.int64),
+            '零流量': [row.tobytes() for row in self.zero],
+            '有数据': [row.tobytes() for row in self.present],
+        })
+        save_table(table, directory, ZERO_TRAFFIC_NAME)
+        return len(table)
+
+    def widen(self, cells):
+        """扩展到 cells 个小区，新小区的位为 0。"""
+        if cells <= self.cells:
+            return self
+        pad = ((0, 0), (0, _nbytes(cells) - self.zero.shape[1]))
+        return ZeroTrafficBitmap(self.dates, np.pad(self.zero, pad), np.pad(self.present, pad), cells)
+
+    def replace_days(self, other):
+        """用 other 中的日期替换本位图中的同一天，返回合并后的位图。"""
+        cells = max(self.cells, other.cells)
+        old, new = self.widen(cells), other.widen(cells)
+        keep = ~old.dates.isin(new.dates)
+        dates = old.dates[keep].append(new.dates)
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        zero = np.concatenate([old.zero[keep], new.zero])[order]
+        present = np.concatenate([old.present[keep], new.present])[order]
+        return ZeroTrafficBitmap(dates[order], zero, present, cells)
+
+    def mask(self, keys=None):
+        """所选小区的打包掩码；keys 为 None 时选择全部小区。"""
+        selected = np.zeros(self.cells, dtype=bool)
+        if keys is None:
+            selected[:] = True
+        else:
+            keys = np.asarray(keys, dtype=np.int64)
+            selected[keys[(keys >= 0) & (keys < self.cells)]] = True
+        return np.packbits(selected)
+
+    def daily_counts(self, keys=None):
+        """
+        所选小区每天的零流量小区数和有数据的小区数。
+
+        参数:
+        keys (np.ndarray): 所选小区的 cell_key，None 表示全部小区。
+
+        返回值:
+        pd.DataFrame: 开始时间、零流量小区数、小区数。
+        """
+        mask = self.mask(keys)
+        return pd.DataFrame({
+            TIME_COLUMN: self.dates,
+            '零流量小区数': popcount(self.zero & mask).sum(axis=1, dtype=np.int64),
+            '小区数': popcount(self.present & mask).sum(axis=1, dtype=np.int64),
+        })
+
+    def zero_runs(self, min_days, keys=None, date_range=None):
+        """
+        查找连续零流量天数不少于 min_days 的小区。
+
+        按自然日计算，缺少数据的日期会中断连续天数。每个小区只返回时间范围内最长的一段。
+
+        参数:
+        min_days (int): 最少连续零流量天数。
+        keys (np.ndarray): 所选小区的 cell_key，None 表示全部小区。
+        date_range (tuple): (开始日期, 结束日期)，包含两端；None 表示全部日期。
+
+        返回值:
+        pd.DataFrame: cell_key、连续零流量天数、开始日期、结束日期，按天数从多到少排序。
+        """
+        columns = [KEY, '连续零流量天数', '开始日期', '结束日期']
+        dates = self.dates
+        if date_range is not None:
+            inside = (dates >= pd.Timestamp(date_range[0])) & (dates <= pd.Timestamp(date_range[1]))
+            rows = np.flatnonzero(inside)
+        else:
+            rows = np.arange(len(dates))
+        if len(rows) == 0:
+            return pd.DataFrame(columns=columns)
+
+        selected = np.flatnonzero(np.unpackbits(self.mask(keys), count=self.cells))
+        calendar = pd.date_range(dates[rows[0]], dates[rows[-1]], freq='D')
+        row_of_day = dict(zip(calendar.get_indexer(dates[rows]), rows))
+
+        run = np.zeros(len(selected), dtype=np.int32)
+        best = np.zeros(len(selected), dtype=np.int32)
+        best_end = np.zeros(len(selected), dtype=np.int32)
+        for i in range(len(calendar)):
+            row = row_of_day.get(i)
+            if row is None:
+                run[:] = 0
+                continue
+            zero = np.unpackbits(self.zero[row], count=self.cells)[selected].astype(bool)
+            run = np.where(zero, run + 1, 0)
+            longer = run > best
+            best[longer] = run[longer]
+            best_end[longer] = i
+
+        hit = best >= min_days
+        result = pd.DataFrame({
+            KEY: selected[hit].astype(np.int32),
+            '连续零流量天数': best[hit],
+            '开始日期': calendar[best_end[hit] - best[hit] + 1].date,
+            '结束日期': calendar[best_end[hit]].date,
+        }, columns=columns)
+        return result.sort_values(['连续零流量天数', KEY], ascending=[False, True], ignore_index=True)
+
+
+def has_zero_traffic(directory):
+    """数据目录中是否已有零流量位图。"""
+    return os.path.exists(table_path(directory, ZERO_TRAFFIC_NAME))
+
+
+def save_zero_traffic(df_kpi, directory):
+    """由全部 KPI 数据构建并保存零流量位图，返回天数。"""
+    return ZeroTrafficBitmap.from_kpi(df_kpi).save(directory)
+
+
+def update_zero_traffic(directory, dates, kpi_name='df_KPI'):
+    """
+    增量更新零流量位图：只重新计算指定日期，替换位图中这些日期的行。
+
+    参数:
+    directory (str): 数据目录，需已保存分区表 df_KPI。
+    dates (list): 需要重新计算的开始时间。
+    kpi_name (str): KPI 分区表名。
+
+    返回值:
+    int: 更新后的天数。
+    """
+    dates = pd.to_datetime(pd.Series(list(dates))).dt.normalize().drop_duplicates()
+    existing = ZeroTrafficBitmap.load(directory)
+    if dates.empty:
+        return len(existing.dates) if existing is not None else 0
+    columns = [KEY, TIME_COLUMN] + counters_for([TRAFFIC_KPI])
+    df_kpi = load_partitioned(directory, kpi_name, columns=columns, date_range=(dates.min().date(), dates.max().date()))
+    df_kpi = df_kpi[df_kpi[TIME_COLUMN].isin(dates)]
+    bitmap = ZeroTrafficBitmap.from_kpi(df_kpi)
+    if existing is not None:
+        bitmap = existing.replace_days(bitmap)
+    return bitmap.save(directory)